@@ -1,18 +1,54 @@
-from typing import Protocol
+import math
+from dataclasses import replace
+from typing import Protocol, Any, NamedTuple
 
 import numpy
-from pandas import DataFrame
-from robingame.utils import SparseMatrix
 
 from . import physics
-from .language import choose_new_name
-from .physics import calculate_x_y_acceleration, calculate_distances
-
-CoordFloat2D = tuple[float, float]
+from .constants import GRAVITATIONAL_CONSTANT
+from .diagnostics import Telemetry, measure, merger_heat
+from .mergelog import MergeLog
+from .names import NameTable
+from .spatial import Rect, SpatialIndex
+
+BodyID = int  # persistent for the lifetime of a body; never reused
+
+
+def forget_mergers(merged_into: dict[BodyID, BodyID], next_id: BodyID):
+    """
+    Drop the merged ID -> merged-into ID redirects to bodies with IDs from `next_id` on, e.g.
+    on restoring a snapshot from before those mergers. Redirects are added as the mergers
+    happen, and IDs are handed out in increasing order, so these are always the newest ones;
+    the dict works as an append-only log that snapshots only need to remember the length of.
+    """
+    while merged_into and next(reversed(merged_into.values())) >= next_id:
+        merged_into.popitem()
+
+
+class BodyArrays(NamedTuple):
+    """
+    All bodies as parallel 1d arrays, for vectorised consumers like the frontend. These may be
+    views of the automaton's own storage, so treat them as read-only, and don't keep them
+    across iterations.
+    """
+
+    id: numpy.array
+    x: numpy.array
+    y: numpy.array
+    u: numpy.array
+    v: numpy.array
+    mass: numpy.array
+    radius: numpy.array
+    name_id: numpy.array
+    tracer: numpy.array
 
 
 class Automaton(Protocol):
     total_mass: float  # calculated every iteration
+    names: NameTable  # bodies only store an ID into this table
+    iteration: int  # number of completed iterations
+    version: int  # changes whenever the bodies change, so drawings can be reused until then
+    telemetry: Telemetry  # conservation diagnostics, sampled during iterate()
 
     def iterate(self):
         ...
@@ -25,11 +61,54 @@ class Automaton(Protocol):
         radius: float,
         u: float = 0,
         v: float = 0,
-        name: str = "",
-    ):
+        name: str | None = "",
+        tracer: bool = False,
+    ) -> BodyID:
+        """
+        Pass name=None to have a name generated when the body is first labelled.
+        Tracers are accelerated by the other bodies, but don't attract anything themselves.
+        Returns the ID of the new body.
+        """
+
+    def add_bodies(
+        self,
+        x: numpy.array,
+        y: numpy.array,
+        mass: numpy.array,
+        radius: numpy.array,
+        u: numpy.array = 0,
+        v: numpy.array = 0,
+        tracer: bool = False,
+    ) -> numpy.array:
+        """
+        Add many unnamed bodies at once. Returns the IDs of the new bodies.
+        """
+
+    def bodies(self) -> dict[BodyID, physics.Body]:
+        ...
+
+    def arrays(self) -> BodyArrays:
         ...
 
-    def bodies(self) -> dict[CoordFloat2D, physics.Body]:
+    def query_rect(self, rect: Rect) -> numpy.array:
+        """
+        Indices into arrays() of the bodies that overlap a rectangle (x, y, width, height).
+        Should cost about as much as the number of bodies found, not the number of bodies.
+        """
+
+    def get_body(self, body_id: BodyID) -> physics.Body | None:
+        """
+        Look up a body by ID. If the body has merged into another one since, return the body
+        it ended up in. Return None if it is gone entirely.
+        """
+
+    def snapshot(self) -> Any:
+        """
+        The current state, to be passed to `restore`. The backend takes one every iteration, so
+        it should share whatever the automaton doesn't change in place.
+        """
+
+    def restore(self, snapshot: Any):
         ...
 
     def world_size(self) -> tuple[float, float]:
@@ -40,37 +119,115 @@ class Automaton(Protocol):
 
 
 class GravityAutomatonSparseMatrix:
-    contents: SparseMatrix[CoordFloat2D, physics.Body]
+    """
+    Pure-python automaton. Bodies are stored in a dict keyed by their ID, so two bodies can
+    share a position, and following a body between iterations is a single dict lookup.
+    """
 
-    def __init__(self):
-        self.contents = SparseMatrix()
+    contents: dict[BodyID, physics.Body]
+    iteration: int = 0
+    version: int = 0
+    heat: float = 0  # energy lost in mergers
+
+    def __init__(
+        self,
+        telemetry: Telemetry = None,
+        absorb_tracers: bool = True,
+        swept_collisions: bool = False,
+        merge_at_contact: bool = False,
+        merge_log: MergeLog = None,
+    ):
+        """
+        :param telemetry: collects conservation diagnostics; defaults to every 10 iterations
+        :param absorb_tracers: remove tracers that hit a massive body
+        :param swept_collisions: merge bodies that touched at any point during the step, not
+            just the ones that overlap at the end of it, so fast bodies can't pass through
+            each other
+        :param merge_at_contact: with swept collisions, merge bodies as they were when they
+            first touched, instead of where they ended up
+        :param merge_log: if given, record every merger in it. Mergers that are undone by
+            restoring a snapshot are removed from it again.
+        """
+        self.merge_log = merge_log
+        self.absorb_tracers = absorb_tracers
+        self.swept_collisions = swept_collisions
+        self.merge_at_contact = merge_at_contact
+        self.contents = {}
+        self.names = NameTable()
+        self.telemetry = telemetry or Telemetry()
+        self._next_id = 0
+        self._merged_into: dict[BodyID, BodyID] = {}
+        self._spatial_index = SpatialIndex()
 
     def iterate(self):
         """
         1. Apply the rules of gravitation attraction between each pair of objects
         2. Move every object according to the laws of motion
         """
-        # 1
-        for xy1, body1 in self.contents.items():
-            for xy2, body2 in self.contents.items():
-                if body1 is body2:
-                    continue  # bodies can't affect themselves
-                physics.gravitational_attraction(body1, xy1, body2, xy2)
+        bodies = [body for body in self.contents.values() if not body.tracer]
+        tracers = [body for body in self.contents.values() if body.tracer]
+        sampling = self.telemetry.due(self.iteration)
+        if sampling:
+            state = [(b.x, b.y, b.u, b.v, b.mass) for b in bodies]  # before velocities change
+            potential = 0.0
+
+        # 1 same as physics.gravitational_attraction, inlined: this loop runs N**2 / 2 times, so
+        # it creates no objects besides floats, and keeps body1's values in local variables.
+        # Each pair is visited once, and both bodies are updated.
+        n = len(bodies)
+        sqrt = math.sqrt
+        for i in range(n):
+            body1 = bodies[i]
+            x1, y1, m1 = body1.x, body1.y, body1.mass
+            u1 = v1 = 0.0
+            for j in range(i + 1, n):
+                body2 = bodies[j]
+                dx = body2.x - x1
+                dy = body2.y - y1
+                dist2 = dx * dx + dy * dy
+                strength = GRAVITATIONAL_CONSTANT / (dist2 * sqrt(dist2))  # G / R**3
+                m2 = body2.mass
+                u1 += dx * strength * m2
+                v1 += dy * strength * m2
+                body2.u -= dx * strength * m1
+                body2.v -= dy * strength * m1
+                if sampling:
+                    potential -= GRAVITATIONAL_CONSTANT * m1 * m2 / sqrt(dist2)
+            body1.u += u1
+            body1.v += v1
+        # tracers are only accelerated, by a = G * m2 / R**2, so their own mass doesn't matter
+        for tracer in tracers:
+            x1, y1 = tracer.x, tracer.y
+            u1 = v1 = 0.0
+            for body in bodies:
+                dx = body.x - x1
+                dy = body.y - y1
+                dist2 = dx * dx + dy * dy
+                strength = GRAVITATIONAL_CONSTANT * body.mass / (dist2 * sqrt(dist2))
+                u1 += dx * strength
+                v1 += dy * strength
+            tracer.u += u1
+            tracer.v += v1
+
+        if sampling:
+            x, y, u, v, mass = numpy.array(state).reshape(-1, 5).T
+            self.telemetry.record(measure(self.iteration, x, y, u, v, mass, potential, self.heat))
 
         # 2
-        new = SparseMatrix()
-        for (x, y), body in self.contents.items():
-            x += body.u
-            y += body.v
-            new[(x, y)] = body
-        self.contents = new
+        for body in self.contents.values():
+            body.x += body.u
+            body.y += body.v
 
         # 3 collisions
         while self.do_collisions():
             pass
+        if self.absorb_tracers:
+            self.do_tracer_absorption()
 
         # calculate total mass once per iteration
         self.total_mass = sum(body.mass for body in self.contents.values())
+        self.iteration += 1
+        self.version += 1
 
     def do_collisions(self) -> bool:
         """
@@ -78,135 +235,108 @@ class GravityAutomatonSparseMatrix:
         Do one round of collision processing.
         Return True if collisions were processed.
         """
-        for xy1, body1 in self.contents.items():
-            for xy2, body2 in self.contents.items():
-                if body1 is body2:
-                    continue  # bodies can't affect themselves
-
-                dist = physics.euclidian_distance(xy1, xy2)
-                if dist < body1.radius + body2.radius:
-                    m1, m2 = body1.mass, body2.mass
-                    x1, y1 = xy1
-                    x2, y2 = xy2
-                    new_x = (x1 * m1 + x2 * m2) / (m1 + m2)
-                    new_y = (y1 * m1 + y2 * m2) / (m1 + m2)
-                    new_u = (m1 * body1.u + m2 * body2.u) / (m1 + m2)
-                    new_v = (m1 * body1.v + m2 * body2.v) / (m1 + m2)
-                    new_radius = numpy.sqrt(body1.radius**2 + body2.radius**2)
-                    new_body = physics.Body(
-                        mass=body1.mass + body2.mass,
-                        radius=new_radius,
-                        u=new_u,
-                        v=new_v,
-                    )
-                    self.contents.pop((x1, y1))
-                    self.contents.pop((x2, y2))
-                    self.contents[(new_x, new_y)] = new_body
+        bodies = [body for body in self.contents.values() if not body.tracer]
+        if self.swept_collisions:
+            return self.do_swept_collision(bodies)
+        n = len(bodies)
+        for i in range(n):
+            body1 = bodies[i]
+            x1, y1, r1 = body1.x, body1.y, body1.radius
+            for j in range(i + 1, n):
+                body2 = bodies[j]
+                dx = body2.x - x1
+                dy = body2.y - y1
+                reach = r1 + body2.radius
+                if dx * dx + dy * dy < reach * reach:
+                    self._merge(body1, body2)
                     return True
         return False
 
-    def add_body(
-        self,
-        x: float,
-        y: float,
-        mass: float,
-        radius: float,
-        u: float = 0,
-        v: float = 0,
-        name: str = "",
-    ):
-        self.contents[(x, y)] = physics.Body(mass=mass, radius=radius, u=u, v=v, name=name)
-
-    def bodies(self) -> dict[CoordFloat2D, physics.Body]:
-        return self.contents
-
-    def world_size(self) -> tuple[float, float]:
-        return self.contents.size
-
-    def world_limits(self) -> tuple[tuple[float, float], tuple[float, float]]:
-        return self.contents.limits
-
-
-class GravityAutomatonDataFrame:
-    contents: DataFrame
-    total_mass: float = 1
-
-    def __init__(self):
-        self.contents = DataFrame(columns="x y mass radius u v name".split())
-
-    def iterate(self):
+    def do_swept_collision(self, bodies: list[physics.Body]) -> bool:
         """
-        1. Apply the rules of gravitation attraction between each pair of objects
-        2. Move every object according to the laws of motion
+        Merge the pair of bodies that touched first during the last step, if any.
+        Return True if a collision was processed.
         """
-
-        x = self.contents.x.values
-        y = self.contents.y.values
-        mass = self.contents.mass.values
-        acc_x, acc_y = calculate_x_y_acceleration(x, y, mass)
-
-        # update velocities
-        self.contents.u += acc_x
-        self.contents.v += acc_y
-        # update positions
-        self.contents.x += self.contents.u
-        self.contents.y += self.contents.v
-
-        # do collisions
-        while self.do_collisions():
-            pass
-
-        # calculate total mass once per iteration
-        self.total_mass = self.contents.mass.sum()
-
-    def do_collisions(self) -> bool:
+        earliest = None
+        n = len(bodies)
+        for i in range(n):
+            body1 = bodies[i]
+            for j in range(i + 1, n):
+                body2 = bodies[j]
+                t = physics.contact_time(
+                    dx=body2.x - body1.x,
+                    dy=body2.y - body1.y,
+                    du=body2.u - body1.u,
+                    dv=body2.v - body1.v,
+                    distance=body1.radius + body2.radius,
+                )
+                if t is not None and (earliest is None or t < earliest[0]):
+                    earliest = (t, body1, body2)
+        if earliest is None:
+            return False
+        t, body1, body2 = earliest
+        self._merge(body1, body2, t if self.merge_at_contact else 1.0)
+        return True
+
+    def _merge(self, body1: physics.Body, body2: physics.Body, t: float = 1.0):
         """
-        fixme: refactor
-        Do one round of collision processing.
-        Return True if collisions were processed.
+        Replace two bodies with one, conserving mass and momentum.
+
+        :param t: time during the last step at which to merge them (0 = start, 1 = now). The
+            bodies are moved back along their velocities to where they were then, merged, and
+            the merged body is moved forward again for the rest of the step.
         """
-        DX, DY, DIST = calculate_distances(self.contents.x.values, self.contents.y.values)
-        radii = self.contents.radius.values
-        R1R2 = radii.reshape(-1, 1) + radii.reshape(1, -1)
-        ZERO_DIAGONAL = numpy.ones_like(R1R2) - numpy.eye(len(R1R2))
-        R1R2 = R1R2 * ZERO_DIAGONAL
-        colliding = DIST < R1R2
-        iis, jjs = colliding.nonzero()
-        for i, j in zip(iis, jjs):
-            m_i = self.contents.mass[i]
-            m_j = self.contents.mass[j]
-            x_i = self.contents.x[i]
-            x_j = self.contents.x[j]
-            y_i = self.contents.y[i]
-            y_j = self.contents.y[j]
-            u_i = self.contents.u[i]
-            u_j = self.contents.u[j]
-            v_i = self.contents.v[i]
-            v_j = self.contents.v[j]
-            r_i = self.contents.radius[i]
-            r_j = self.contents.radius[j]
-            name_i = self.contents.name[i]
-            name_j = self.contents.name[j]
-            new_x = (x_i * m_i + x_j * m_j) / (m_i + m_j)
-            new_y = (y_i * m_i + y_j * m_j) / (m_i + m_j)
-            new_u = (m_i * u_i + m_j * u_j) / (m_i + m_j)
-            new_v = (m_i * v_i + m_j * v_j) / (m_i + m_j)
-            new_radius = numpy.sqrt(r_i**2 + r_j**2)
-            new_name = choose_new_name(name_i, name_j, m_i, m_j)
-            self.contents.drop(i, inplace=True)
-            self.contents.drop(j, inplace=True)
-            self.add_body(
-                x=new_x,
-                y=new_y,
-                mass=m_i + m_j,
-                radius=new_radius,
-                u=new_u,
-                v=new_v,
-                name=new_name,
+        rewind = 1 - t
+        x1, y1 = body1.x - rewind * body1.u, body1.y - rewind * body1.v
+        x2, y2 = body2.x - rewind * body2.u, body2.y - rewind * body2.v
+        m1, m2 = body1.mass, body2.mass
+        self.heat += merger_heat(
+            dx=x2 - x1,
+            dy=y2 - y1,
+            du=body2.u - body1.u,
+            dv=body2.v - body1.v,
+            mass1=m1,
+            mass2=m2,
+        )
+        new_u = (m1 * body1.u + m2 * body2.u) / (m1 + m2)
+        new_v = (m1 * body1.v + m2 * body2.v) / (m1 + m2)
+        new_x = (x1 * m1 + x2 * m2) / (m1 + m2) + rewind * new_u
+        new_y = (y1 * m1 + y2 * m2) / (m1 + m2) + rewind * new_v
+        new_radius = numpy.sqrt(body1.radius**2 + body2.radius**2)
+        new_body = physics.Body(
+            mass=body1.mass + body2.mass,
+            radius=new_radius,
+            x=new_x,
+            y=new_y,
+            u=new_u,
+            v=new_v,
+            name_id=self.names.merge(body1.name_id, body2.name_id, m1, m2),
+            id=self._new_id(),
+        )
+        self.contents.pop(body1.id)
+        self.contents.pop(body2.id)
+        self.contents[new_body.id] = new_body
+        self._merged_into[body1.id] = new_body.id
+        self._merged_into[body2.id] = new_body.id
+        if self.merge_log is not None:
+            self.merge_log.record(
+                self.iteration, body1.id, body2.id, m1, m2, new_x, new_y, new_u, new_v, new_body.id
             )
-            return True
 
-        return False
+    def do_tracer_absorption(self):
+        """
+        Remove tracers that are inside a massive body. Unlike a merger, the massive body is left
+        unchanged.
+        """
+        bodies = [body for body in self.contents.values() if not body.tracer]
+        for tracer in [body for body in self.contents.values() if body.tracer]:
+            x1, y1 = tracer.x, tracer.y
+            for body in bodies:
+                dx = body.x - x1
+                dy = body.y - y1
+                if dx * dx + dy * dy < body.radius * body.radius:
+                    self.contents.pop(tracer.id)
+                    break
 
     def add_body(
         self,
@@ -216,30 +346,85 @@ class GravityAutomatonDataFrame:
         radius: float,
         u: float = 0,
         v: float = 0,
-        name: str = "",
-    ):
-        """
-        Add a body to the automaton. This makes a full copy of the contents dataframe,
-        so it's quite slow. Use sparingly.
-        """
-        self.contents = DataFrame(
+        name: str | None = "",
+        tracer: bool = False,
+    ) -> BodyID:
+        body_id = self._new_id()
+        self.contents[body_id] = physics.Body(
+            mass=mass,
+            radius=radius,
+            x=x,
+            y=y,
+            u=u,
+            v=v,
+            name_id=self.names.get_id(name),
+            id=body_id,
+            tracer=tracer,
+        )
+        self.version += 1
+        return body_id
+
+    def add_bodies(
+        self,
+        x: numpy.array,
+        y: numpy.array,
+        mass: numpy.array,
+        radius: numpy.array,
+        u: numpy.array = 0,
+        v: numpy.array = 0,
+        tracer: bool = False,
+    ) -> numpy.array:
+        columns = numpy.broadcast_arrays(x, y, mass, radius, u, v)
+        return numpy.array(
             [
-                *self.contents.to_dict(orient="records"),
-                dict(x=x, y=y, mass=mass, radius=radius, u=u, v=v, name=name),
-            ]
+                self.add_body(x, y, mass, radius, u, v, tracer=tracer)
+                for x, y, mass, radius, u, v in zip(*(column.tolist() for column in columns))
+            ],
+            dtype=int,
         )
 
-    def bodies(self) -> dict[CoordFloat2D, physics.Body]:
-        return {
-            (body.x, body.y): physics.Body(
-                mass=body.mass,
-                radius=body.radius,
-                u=body.u,
-                v=body.v,
-                name=body["name"],  # .name is reserved; it's the name of the series.
-            )
-            for ii, body in self.contents.iterrows()
-        }
+    def _new_id(self) -> BodyID:
+        body_id = self._next_id
+        self._next_id += 1
+        return body_id
+
+    def bodies(self) -> dict[BodyID, physics.Body]:
+        return self.contents
+
+    def arrays(self) -> BodyArrays:
+        bodies = self.contents.values()
+        dtypes = dict(id=int, name_id=int, tracer=bool)
+        return BodyArrays(
+            **{
+                field: numpy.array(
+                    [getattr(body, field) for body in bodies], dtype=dtypes.get(field, float)
+                )
+                for field in BodyArrays._fields
+            }
+        )
+
+    def query_rect(self, rect: Rect) -> numpy.array:
+        return self._spatial_index.query(rect, self.version, self.arrays)
+
+    def get_body(self, body_id: BodyID) -> physics.Body | None:
+        while body_id in self._merged_into:
+            body_id = self._merged_into[body_id]
+        return self.contents.get(body_id)
+
+    def snapshot(self) -> tuple[dict[BodyID, physics.Body], BodyID, int, float]:
+        # the bodies are changed in place, so they have to be copied
+        contents = {body_id: replace(body) for body_id, body in self.contents.items()}
+        return contents, self._next_id, self.iteration, self.heat
+
+    def restore(self, snapshot: tuple[dict[BodyID, physics.Body], BodyID, int, float]):
+        # the mergers since the snapshot never happened, so their IDs mustn't lead anywhere
+        contents, self._next_id, self.iteration, self.heat = snapshot
+        self.contents = {body_id: replace(body) for body_id, body in contents.items()}
+        forget_mergers(self._merged_into, self._next_id)
+        if self.merge_log is not None:
+            self.merge_log.rollback(self._next_id)
+        self.telemetry.rollback(self.iteration)
+        self.version += 1
 
     def world_size(self) -> tuple[float, float]:
         xlim, ylim = self.world_limits()
@@ -248,9 +433,17 @@ class GravityAutomatonDataFrame:
         return width, height
 
     def world_limits(self) -> tuple[tuple[float, float], tuple[float, float]]:
-        if self.contents.empty:
+        if not self.contents:
             return (0, 0), (0, 0)
-        else:
-            xlim = self.contents.x.min(), self.contents.x.max()
-            ylim = self.contents.y.min(), self.contents.y.max()
-            return xlim, ylim
+        xs = [body.x for body in self.contents.values()]
+        ys = [body.y for body in self.contents.values()]
+        return (min(xs), max(xs)), (min(ys), max(ys))
+
+
+def __getattr__(name: str):
+    # the DataFrame automaton needs pandas, which is slow to import; only load it when used
+    if name == "GravityAutomatonDataFrame":
+        from .dataframe import GravityAutomatonDataFrame
+
+        return GravityAutomatonDataFrame
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,13 @@
 from collections import deque
+from typing import Any
 
 from robingame.objects import Entity
-from robingame.utils import SparseMatrix
 
 from .automaton import Automaton
+from .interpolation import Interpolation, interpolation
+from .profiler import Profiler
 from .timer import Timer
+from .trails import Trails
 
 
 class Backend(Entity):
@@ -15,34 +18,74 @@ class Backend(Entity):
     Contains Automaton
     Implements update/iterate disconnect
     Implements history
+    Records trails
+    Ticks the profiler
+    Remembers the previous positions, so viewers can interpolate between updates
     """
 
     automaton: Automaton
+    trails: Trails | None
+    profiler: Profiler | None = None  # profiles frames on demand
 
     ticks_per_update: int = 1
     iterations_per_update: int = 1
     paused: bool = False
-    history: deque[SparseMatrix]
+    history: deque[Any]  # automaton snapshots
     _update_time = 0
+    _interpolation: Interpolation | None = None
 
-    def __init__(self, automaton: Automaton):
+    def __init__(self, automaton: Automaton, trails: Trails = None, profiler: Profiler = None):
         super().__init__()
         self.automaton = automaton
+        self.trails = trails
+        self.profiler = profiler
         self.history = deque(maxlen=50)
 
     def update(self):
+        if self.profiler:
+            self.profiler.tick()  # the backend updates once per frame, before the viewers
         with Timer() as timer:
             super().update()
-            if not self.paused and self.tick % self.ticks_per_update == 0:
+            if self.paused:
+                self._interpolation = None  # it would move the bodies backwards on unpausing
+            elif self.tick % self.ticks_per_update == 0:
+                before = self.automaton.arrays() if self.ticks_per_update > 1 else None
+                if before is not None:
+                    # copy, in case the automaton updates its arrays in place
+                    before = before._replace(x=before.x.copy(), y=before.y.copy())
                 for _ in range(self.iterations_per_update):
                     # delegate iteration to the automaton
                     self.iterate()
+                if before is not None:
+                    after = self.automaton.arrays()
+                    self._interpolation = interpolation(before, after, self.automaton.version)
+                else:
+                    self._interpolation = None
         self._update_time = timer.time
 
+    @property
+    def interpolation(self) -> Interpolation | None:
+        """
+        How to draw the bodies this tick: `fraction` of the way from where they were before the
+        last update to where they are now. 0 in the tick that updated, rising by
+        1 / ticks_per_update each tick after. None if the bodies should be drawn as they are.
+        """
+        previous = self._interpolation
+        if self.paused or self.ticks_per_update == 1 or previous is None:
+            return None
+        if previous.version != self.automaton.version:
+            return None  # e.g. the bodies have been edited since the update
+        ticks = self.ticks_per_update
+        return previous._replace(fraction=self.tick % ticks / ticks)
+
     def iterate(self):
-        self.history.append(self.automaton.contents)
+        self.history.append(self.automaton.snapshot())
         self.automaton.iterate()
+        if self.trails:
+            self.trails.record(self.automaton.arrays(), self.automaton.iteration)
 
     def back_one(self):
         if self.history:
-            self.automaton.contents = self.history.pop()
+            self.automaton.restore(self.history.pop())
+            if self.trails:
+                self.trails.clear()  # the trails describe a future that no longer happens
@@ -0,0 +1,83 @@
+"""
+Time each phase of an iteration, with and without Morton reordering of the bodies:
+
+    python -m gravity.benchmark --scene swirling --bodies 5000 --solver particle-mesh \\
+        --steps 50 --reorder-every 0 1 10
+
+Every setting starts from the same bodies. The table shows milliseconds per step spent on
+forces (including moving the bodies), collisions, and reordering.
+"""
+
+import argparse
+import random
+
+from . import headless
+from .dataframe import GravityAutomatonDataFrame
+
+PHASES = ["forces", "collisions", "escapes", "reorder"]
+
+
+def benchmark(
+    steps: int,
+    reorder_every: list[int] = (0, 10),
+    seed: int = 0,
+    warmup: int = 1,
+    **params,
+) -> dict[int, dict[str, float]]:
+    """
+    :param steps: number of timed iterations per setting
+    :param reorder_every: the settings to compare; 0 means never reorder
+    :param seed: random seed for the spawn function
+    :param warmup: untimed iterations first, e.g. to compile the kernels
+    :param params: keyword arguments for headless.create_automaton
+    :return: for each setting, milliseconds per step spent in each phase, and in total
+    """
+    results = {}
+    for every in reorder_every:
+        random.seed(seed)
+        automaton: GravityAutomatonDataFrame = headless.create_automaton(
+            automaton="dataframe", reorder_every=every, **params
+        )
+        for _ in range(warmup):
+            automaton.iterate()
+        automaton.phase_times.clear()
+        seconds = headless.run(automaton, steps, verbose=False)
+        results[every] = {
+            phase: automaton.phase_times[phase] * 1e3 / steps for phase in PHASES
+        } | dict(total=seconds * 1e3 / steps)
+    return results
+
+
+def format_table(results: dict[int, dict[str, float]]) -> str:
+    columns = [*PHASES, "total"]
+    lines = ["reorder every " + "".join(f"{column:>12}" for column in columns)]
+    for every, times in results.items():
+        label = str(every) if every else "never"
+        lines.append(f"{label:>13} " + "".join(f"{times[column]:12.3f}" for column in columns))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scene", choices=headless.SCENES, default="swirling")
+    parser.add_argument("--bodies", type=int, default=2000)
+    parser.add_argument("--solver", default="auto")
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--reorder-every", type=int, nargs="+", default=[0, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = benchmark(
+        args.steps,
+        args.reorder_every,
+        seed=args.seed,
+        scene=args.scene,
+        bodies=args.bodies,
+        solver=args.solver,
+    )
+    print(f"milliseconds per step, {args.bodies} bodies, {args.scene}, solver {args.solver}")
+    print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Colour lookup tables, embedded so that colouring bodies doesn't need matplotlib (which takes
+about half a second to import).
+"""
+
+import numpy
+
+# matplotlib's cividis, as 256 RGB triplets
+_CIVIDIS = bytes.fromhex(
+    "00224d00234f00235000245200255400265500265700275900285b00285c00295e002a60002a62002b64002c6600"
+    "2c67002d69002e6b002f6d002f6f0030700030700031700031700432700833700b33700e347011356f14366f1636"
+    "6f18376f1a386f1c386e1d396e1f3a6e213b6e223b6e243c6e253d6d273d6d283e6d2a3f6d2b3f6d2c406d2e416c"
+    "2f426c30426c31436c32446c34446c35456c36466c37466c38476c39486c3a486b3b496b3d4a6b3e4b6b3f4b6b40"
+    "4c6b414d6b424d6b434e6b444f6b454f6b46506b47516b48516b49526b4a536b4b546c4c546c4d556c4e566c4e56"
+    "6c4f576c50586c51586c52596c535a6c545a6c555b6d565c6d575d6d585d6d595e6d595f6d5a5f6d5b606e5c616e"
+    "5d616e5e626e5f636e60646e61646f61656f62666f63666f64676f656870666970676970686a70686b71696b716a"
+    "6c716b6d716c6d726d6e726e6f726e70736f70737071737172737273747373747474757475757575757676767777"
+    "767878767978777979777a7a777b7b777c7b787d7c787e7d787f7d78807e78817f78828078838078848178858278"
+    "8583788683788784788885788986788a86788b87788c88788d89788e89788f8a77908b77918c77928c77938d7794"
+    "8e77958f77968f779790769891769992769a93769b93769c94769d95759e96759f9675a09775a19874a29974a39a"
+    "74a49a74a59b73a69c73a79d73a89e73a99e72aa9f72aba072aca171ada271aea271afa370b0a470b1a570b2a66f"
+    "b3a66fb4a76fb5a86eb6a96eb7aa6db8ab6db9ab6dbaac6cbbad6cbcae6bbdaf6bbeb06abfb06ac1b169c2b269c3"
+    "b368c4b468c5b567c6b567c7b666c8b765c9b865cab964cbba64ccbb63cdbc62cebc62cfbd61d0be60d2bf60d3c0"
+    "5fd4c15ed5c25ed6c35dd7c35cd8c45bd9c55adac65adbc759dcc858dec957dfca56e0cb55e1cc54e2cc53e3cd52"
+    "e4ce51e5cf50e6d04fe8d14ee9d24dead34cebd44becd54aedd648eed747efd846f1d944f2da43f3da42f4db40f5"
+    "dc3ff6dd3df8de3bf9df3afae038fbe136fde234fde333fde534fde636fde737"
+)
+
+
+class Colormap:
+    """
+    Maps floats in [0, 1] onto colours, like a matplotlib colormap with N entries: values
+    outside the range are clipped to the ends.
+    """
+
+    def __init__(self, table: bytes):
+        self.table = numpy.frombuffer(table, dtype=numpy.uint8).reshape(-1, 3)
+
+    def __call__(self, value: float | numpy.ndarray) -> numpy.array:
+        """
+        :return: uint8 RGB values; shape (3,) for a float, or (N, 3) for an array
+        """
+        return self.table[self.index(value)]
+
+    def index(self, value: float | numpy.ndarray) -> numpy.array:
+        """
+        :return: row of the table that each value (between 0 and 1) maps to
+        """
+        n = len(self.table)
+        return numpy.clip((numpy.asarray(value) * n).astype(int), 0, n - 1)
+
+
+cividis = Colormap(_CIVIDIS)
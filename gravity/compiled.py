@@ -0,0 +1,135 @@
+"""
+numba-compiled versions of kernels in physics.py. Importing this module imports numba, which
+takes a while, so kernels.py only imports it on first use.
+"""
+
+import numba
+import numpy
+
+from .constants import GRAVITATIONAL_CONSTANT
+
+
+@numba.njit(cache=True, fastmath=True, parallel=True)
+def x_y_acceleration(x, y, mass, n_chunks):
+    """
+    Visit each unordered pair once and apply equal and opposite accelerations. Each chunk
+    of work accumulates into its own row to avoid races between threads. Row i is paired
+    with row n - 1 - i so that every chunk gets about the same number of pairs.
+    """
+    n = len(x)
+    acc_x = numpy.zeros((n_chunks, n))
+    acc_y = numpy.zeros((n_chunks, n))
+    potential = numpy.zeros(n_chunks)
+    for chunk in numba.prange(n_chunks):
+        for k in range(chunk, (n + 1) // 2, n_chunks):
+            for row in range(2):
+                i = k if row == 0 else n - 1 - k
+                if row == 1 and i == k:
+                    continue  # middle row of an odd number of bodies
+                for j in range(i + 1, n):
+                    dx = x[j] - x[i]
+                    dy = y[j] - y[i]
+                    dist2 = dx * dx + dy * dy
+                    if dist2 == 0.0:
+                        continue  # coincident bodies
+                    inverse_dist = 1.0 / numpy.sqrt(dist2)
+                    strength = GRAVITATIONAL_CONSTANT * inverse_dist / dist2
+                    acc_x[chunk, i] += mass[j] * dx * strength
+                    acc_y[chunk, i] += mass[j] * dy * strength
+                    acc_x[chunk, j] -= mass[i] * dx * strength
+                    acc_y[chunk, j] -= mass[i] * dy * strength
+                    potential[chunk] -= mass[i] * mass[j] * inverse_dist
+    return acc_x.sum(axis=0), acc_y.sum(axis=0), GRAVITATIONAL_CONSTANT * potential.sum()
+
+
+@numba.njit(cache=True, fastmath=True)
+def collisions(x, y, radius):
+    n = len(x)
+    capacity = 16
+    ii = numpy.empty(capacity, dtype=numpy.int64)
+    jj = numpy.empty(capacity, dtype=numpy.int64)
+    count = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            reach = radius[i] + radius[j]
+            if dx * dx + dy * dy < reach * reach:
+                if count == capacity:
+                    capacity *= 2
+                    ii = numpy.concatenate((ii, numpy.empty_like(ii)))
+                    jj = numpy.concatenate((jj, numpy.empty_like(jj)))
+                ii[count] = i
+                jj[count] = j
+                count += 1
+    return ii[:count], jj[:count]
+
+
+@numba.njit(cache=True, fastmath=True)
+def swept_collisions(x, y, u, v, radius):
+    n = len(x)
+    capacity = 16
+    ii = numpy.empty(capacity, dtype=numpy.int64)
+    jj = numpy.empty(capacity, dtype=numpy.int64)
+    times = numpy.empty(capacity)
+    count = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            du = u[j] - u[i]
+            dv = v[j] - v[i]
+            x0 = x[j] - x[i] - du
+            y0 = y[j] - y[i] - dv
+            reach = radius[i] + radius[j]
+            c = x0 * x0 + y0 * y0 - reach * reach
+            if c <= 0.0:
+                t = 0.0
+            else:
+                a = du * du + dv * dv
+                b = 2.0 * (x0 * du + y0 * dv)
+                discriminant = b * b - 4.0 * a * c
+                if a == 0.0 or b >= 0.0 or discriminant < 0.0:
+                    continue
+                t = (-b - numpy.sqrt(discriminant)) / (2.0 * a)
+                if t > 1.0:
+                    continue
+            if count == capacity:
+                capacity *= 2
+                ii = numpy.concatenate((ii, numpy.empty_like(ii)))
+                jj = numpy.concatenate((jj, numpy.empty_like(jj)))
+                times = numpy.concatenate((times, numpy.empty_like(times)))
+            ii[count] = i
+            jj[count] = j
+            times[count] = t
+            count += 1
+    return ii[:count], jj[:count], times[:count]
+
+
+@numba.njit(cache=True, fastmath=True, parallel=True)
+def tracer_acceleration(x, y, source_x, source_y, source_mass):
+    n = len(x)
+    acc_x = numpy.zeros(n)
+    acc_y = numpy.zeros(n)
+    for i in numba.prange(n):
+        for j in range(len(source_x)):
+            dx = source_x[j] - x[i]
+            dy = source_y[j] - y[i]
+            dist2 = dx * dx + dy * dy
+            if dist2 == 0.0:
+                continue  # tracer exactly on a source
+            strength = GRAVITATIONAL_CONSTANT * source_mass[j] / (dist2 * numpy.sqrt(dist2))
+            acc_x[i] += dx * strength
+            acc_y[i] += dy * strength
+    return acc_x, acc_y
+
+
+@numba.njit(cache=True, fastmath=True, parallel=True)
+def tracer_hits(x, y, source_x, source_y, source_radius):
+    hits = numpy.full(len(x), -1)
+    for i in numba.prange(len(x)):
+        for j in range(len(source_x)):
+            dx = source_x[j] - x[i]
+            dy = source_y[j] - y[i]
+            if dx * dx + dy * dy < source_radius[j] * source_radius[j]:
+                hits[i] = j
+                break
+    return hits
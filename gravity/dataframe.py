@@ -0,0 +1,619 @@
+"""
+The vectorised, pandas-backed automaton. It lives in its own module so that importing
+gravity.automaton doesn't import pandas; `gravity.automaton.GravityAutomatonDataFrame` still
+works, and loads this module on first use.
+"""
+
+from collections import defaultdict
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from . import physics, kernels, kepler
+from .automaton import BodyArrays, BodyID, forget_mergers
+from .constants import GRAVITATIONAL_CONSTANT
+from .diagnostics import Telemetry, measure, merger_heat, total_momentum
+from .escape import EscapePolicy, SystemCentre
+from .mergelog import MergeLog
+from .morton import morton_order
+from .names import NameTable, NO_NAME
+from .solvers import Solver, get_solver
+from .spatial import Rect, SpatialIndex
+from .timer import Timer
+
+COLUMNS = "id x y mass radius u v name_id tracer".split()
+INTEGRATORS = ["euler", "wisdom-holman"]
+# contents, archive, escaped energy, escaped momentum, next ID, iteration, heat
+Snapshot = tuple[DataFrame, DataFrame, float, numpy.array, BodyID, int, float]
+
+
+def _values(frame: DataFrame, columns: str = "x y u v mass") -> list[numpy.array]:
+    return [frame[column].values for column in columns.split()]
+
+
+class GravityAutomatonDataFrame:
+    """
+    Vectorised automaton. Each body is a row in the contents dataframe; the row position
+    ("slot") changes whenever bodies are added or removed, so we keep an id -> slot lookup
+    array up to date to find bodies by their persistent ID.
+    """
+
+    contents: DataFrame
+    total_mass: float = 1
+    solver: Solver
+    iteration: int = 0
+    version: int = 0
+    heat: float = 0  # energy lost in mergers
+    direct_steps: int = 0  # Wisdom-Holman steps that fell back to direct integration
+
+    def __init__(
+        self,
+        solver: str | Solver = "auto",
+        accuracy: float = 0.0,
+        telemetry: Telemetry = None,
+        absorb_tracers: bool = True,
+        escape: EscapePolicy = None,
+        swept_collisions: bool = False,
+        merge_at_contact: bool = False,
+        integrator: str = "euler",
+        timestep: float = 1.0,
+        reorder_every: int = 0,
+        merge_log: MergeLog = None,
+    ):
+        """
+        :param solver: name of a solver in solvers.SOLVERS, or "auto" to pick one based on the
+            number of bodies.
+        :param accuracy: acceptable relative force error for the auto solver
+        :param telemetry: collects conservation diagnostics; defaults to every 10 iterations
+        :param absorb_tracers: remove tracers that hit a massive body
+        :param escape: move bodies that have escaped the system into the archive. None
+            disables this.
+        :param swept_collisions: merge bodies that touched at any point during the step, not
+            just the ones that overlap at the end of it, so fast bodies can't pass through
+            each other
+        :param merge_at_contact: with swept collisions, merge bodies as they were when they
+            first touched, instead of where they ended up
+        :param integrator: "euler" integrates every body directly. "wisdom-holman" moves
+            bodies along their Kepler orbits around the heaviest body, and only integrates the
+            other bodies' pulls; for systems with one dominant mass it is accurate with much
+            longer timesteps. See gravity.kepler.
+        :param timestep: time that passes in each iteration
+        :param reorder_every: sort the bodies along a Z-order curve every this many iterations,
+            so that bodies that are close in space are close in memory; 0 disables this. See
+            gravity.morton.
+        :param merge_log: if given, record every merger in it. Mergers that are undone by
+            restoring a snapshot are removed from it again.
+        """
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"unknown integrator {integrator!r}; choose from {INTEGRATORS}")
+        self.solver = get_solver(solver, accuracy)
+        self.integrator = integrator
+        self.timestep = timestep
+        self.reorder_every = reorder_every
+        self.merge_log = merge_log
+        self.telemetry = telemetry or Telemetry()
+        self.absorb_tracers = absorb_tracers
+        self.escape = escape
+        self.swept_collisions = swept_collisions
+        self.merge_at_contact = merge_at_contact
+        self.contents = DataFrame(columns=COLUMNS)
+        self.archive = DataFrame(columns=[*COLUMNS, "escaped_at"])  # escaped bodies
+        self.escaped_energy = 0.0  # energy carried off by archived bodies
+        # (momentum_x, momentum_y, angular momentum) carried off by archived bodies
+        self.escaped_momentum = numpy.zeros(3)
+        self._centre: SystemCentre | None = None
+        self.names = NameTable()
+        self._next_id = 0
+        self._slots = numpy.full(0, -1)  # id -> slot; -1 if the body no longer exists
+        self._merged_into: dict[BodyID, BodyID] = {}
+        self._spatial_index = SpatialIndex()
+        self.phase_times: defaultdict[str, float] = defaultdict(float)  # seconds, summed
+
+    def iterate(self):
+        """
+        1. Apply the rules of gravitation attraction between each pair of objects
+        2. Move every object according to the laws of motion
+        3. Merge colliding objects
+        4. Every now and then, sort the objects by position
+
+        The time spent in each phase is added up in phase_times.
+        """
+        with Timer() as timer:
+            if self.integrator == "wisdom-holman":
+                self._wisdom_holman_step()
+            else:
+                self._euler_step()
+        self.phase_times["forces"] += timer.time
+
+        # do collisions
+        with Timer() as timer:
+            while self.do_collisions():
+                pass
+            if self.absorb_tracers:
+                self.do_tracer_absorption()
+        self.phase_times["collisions"] += timer.time
+        if self.escape:
+            with Timer() as timer:
+                self.do_escapes()
+            self.phase_times["escapes"] += timer.time
+        if self.reorder_every and (self.iteration + 1) % self.reorder_every == 0:
+            with Timer() as timer:
+                self.reorder()
+            self.phase_times["reorder"] += timer.time
+
+        # calculate total mass once per iteration
+        self.total_mass = self.contents.mass.sum()
+        self.iteration += 1
+        self.version += 1
+
+    def _euler_step(self):
+        tracer = self.contents.tracer.values.astype(bool)
+        if tracer.any():
+            # the solver only sees the massive bodies; tracers are O(N * M) on top of that
+            massive = ~tracer
+            c = self.contents
+            x, y, mass = c.x.values, c.y.values, c.mass.values
+            acc_x = numpy.empty(len(c))
+            acc_y = numpy.empty(len(c))
+            acc_x[massive], acc_y[massive] = self._massive_accelerations(c[massive])
+            acc_x[tracer], acc_y[tracer] = kernels.calculate_tracer_acceleration(
+                x[tracer], y[tracer], x[massive], y[massive], mass[massive]
+            )
+        else:
+            acc_x, acc_y = self._massive_accelerations(self.contents)
+
+        # update velocities, then positions. Into a new dataframe: snapshots share the old one
+        dt = self.timestep
+        x, y, u, v = _values(self.contents, "x y u v")
+        u = u + acc_x * dt
+        v = v + acc_y * dt
+        self.contents = self.contents.assign(x=x + u * dt, y=y + v * dt, u=u, v=v)
+
+    def _wisdom_holman_step(self):
+        c = self.contents
+        if len(c) < 2:
+            self._euler_step()  # nothing to orbit
+            return
+        tracer = c.tracer.values.astype(bool)
+        x, y, u, v, mass = _values(c)
+        mass = numpy.where(tracer, 0.0, mass)
+        sampling = self.telemetry.due(self.iteration)
+        m0 = mass.max()
+
+        def accelerations(qx, qy, m):
+            # the first call is the perturbation check, over the bodies around the central one
+            # in heliocentric coordinates. The sample is recorded from that pass: the potential
+            # is theirs plus the central body's, which is cheap to add.
+            nonlocal sampling
+            if not sampling:
+                return self._accelerations(qx, qy, m)
+            sampling = False
+            acc_x, acc_y, potential = self._accelerations(qx, qy, m, return_potential=True)
+            potential -= GRAVITATIONAL_CONSTANT * m0 * (m / numpy.hypot(qx, qy)).sum()
+            massive = ~tracer
+            self._record_sample(
+                x[massive], y[massive], u[massive], v[massive], mass[massive], potential
+            )
+            return acc_x, acc_y
+
+        x, y, u, v, direct = kepler.wisdom_holman_step(
+            x, y, u, v, mass, self.timestep, accelerations
+        )
+        self.direct_steps += direct
+        self.contents = c.assign(x=x, y=y, u=u, v=v)
+
+    def _accelerations(
+        self, x: numpy.array, y: numpy.array, mass: numpy.array, return_potential: bool = False
+    ):
+        """
+        Run the solver over the bodies that have mass. Bodies without mass (e.g. tracers) are
+        accelerated by the others, but don't attract anything.
+
+        :param return_potential: also return the potential energy of the bodies that have mass
+        :return acc_x, acc_y[, potential]:
+        """
+        attracts = mass > 0
+        solve = (
+            self.solver.accelerations_and_potential
+            if return_potential
+            else self.solver.accelerations
+        )
+        if attracts.all():
+            return solve(x, y, mass)
+        acc_x, acc_y = numpy.zeros(len(x)), numpy.zeros(len(x))
+        potential = 0.0
+        if attracts.any():
+            x_m, y_m, mass_m = x[attracts], y[attracts], mass[attracts]
+            solved = solve(x_m, y_m, mass_m)
+            acc_x[attracts], acc_y[attracts] = solved[:2]
+            potential = solved[2] if return_potential else 0.0
+            acc_x[~attracts], acc_y[~attracts] = kernels.calculate_tracer_acceleration(
+                x[~attracts], y[~attracts], x_m, y_m, mass_m
+            )
+        return (acc_x, acc_y, potential) if return_potential else (acc_x, acc_y)
+
+    def _massive_accelerations(self, bodies: DataFrame) -> tuple[numpy.array, numpy.array]:
+        """
+        Run the solver over some bodies, recording telemetry if a sample is due.
+        """
+        x = bodies.x.values
+        y = bodies.y.values
+        mass = bodies.mass.values
+        if self.telemetry.due(self.iteration):
+            acc_x, acc_y, potential = self.solver.accelerations_and_potential(x, y, mass)
+            self._record_sample(x, y, bodies.u.values, bodies.v.values, mass, potential)
+            return acc_x, acc_y
+        return self.solver.accelerations(x, y, mass)
+
+    def _record_sample(self, x, y, u, v, mass, potential: float):
+        self.telemetry.record(
+            measure(
+                self.iteration,
+                x,
+                y,
+                u,
+                v,
+                mass,
+                potential,
+                self.heat + self.escaped_energy,
+                self.escaped_momentum,
+            )
+        )
+
+    def do_collisions(self) -> bool:
+        """
+        Do one round of collision processing. Every body can take part in at most one merger
+        per round, so all the mergers in a round can be applied with a single rebuild of the
+        contents dataframe. Bodies that collide with several others get merged over multiple
+        rounds. Tracers never merge.
+        With swept collisions, pairs are merged in the order in which they touched.
+        Return True if collisions were processed.
+        """
+        c = self.contents
+        tracer = c.tracer.values.astype(bool)
+        (massive,) = (~tracer).nonzero()
+        x, y, u, v, radius = (values[massive] for values in _values(c, "x y u v radius"))
+        if self.swept_collisions:
+            dt = self.timestep
+            iis, jjs, times = kernels.calculate_swept_collisions(x, y, u * dt, v * dt, radius)
+        else:
+            iis, jjs = kernels.calculate_collisions(x, y, radius)
+            times = numpy.ones(len(iis))
+        iis, jjs = massive[iis], massive[jjs]
+        if not len(iis):
+            return False
+
+        # pick disjoint pairs
+        merging = set()
+        pairs = []
+        for i, j, t in zip(iis.tolist(), jjs.tolist(), times.tolist()):
+            if i not in merging and j not in merging:
+                merging.update((i, j))
+                pairs.append((i, j, t))
+        ii, jj, t = numpy.array(pairs).T
+        ii, jj = ii.astype(int), jj.astype(int)
+
+        # move each pair back to where it touched, if merging at contact
+        rewind = (1 - t) * self.timestep if self.merge_at_contact else numpy.zeros(len(ii))
+        x, y, u, v, mass = _values(c)
+        x_i, y_i = x[ii] - rewind * u[ii], y[ii] - rewind * v[ii]
+        x_j, y_j = x[jj] - rewind * u[jj], y[jj] - rewind * v[jj]
+        m_i, m_j = mass[ii], mass[jj]
+        new_mass = m_i + m_j
+        self.heat += merger_heat(x_j - x_i, y_j - y_i, u[jj] - u[ii], v[jj] - v[ii], m_i, m_j)
+        new_u = (u[ii] * m_i + u[jj] * m_j) / new_mass
+        new_v = (v[ii] * m_i + v[jj] * m_j) / new_mass
+        new_x = (x_i * m_i + x_j * m_j) / new_mass + rewind * new_u
+        new_y = (y_i * m_i + y_j * m_j) / new_mass + rewind * new_v
+        new_ids = numpy.arange(self._next_id, self._next_id + len(ii))
+        self._next_id += len(ii)
+        merged = DataFrame(
+            dict(
+                id=new_ids,
+                x=new_x,
+                y=new_y,
+                mass=new_mass,
+                radius=numpy.sqrt(c.radius.values[ii] ** 2 + c.radius.values[jj] ** 2),
+                u=new_u,
+                v=new_v,
+                name_id=[
+                    self.names.merge(name_i, name_j, mass_i, mass_j)
+                    for name_i, name_j, mass_i, mass_j in zip(
+                        c.name_id.values[ii].tolist(),
+                        c.name_id.values[jj].tolist(),
+                        m_i.tolist(),
+                        m_j.tolist(),
+                    )
+                ],
+                tracer=False,
+            )
+        )
+        self._merged_into.update(zip(c.id.values[ii].tolist(), new_ids.tolist()))
+        self._merged_into.update(zip(c.id.values[jj].tolist(), new_ids.tolist()))
+        if self.merge_log is not None:
+            self.merge_log.record_many(
+                self.iteration,
+                parent1=c.id.values[ii],
+                parent2=c.id.values[jj],
+                mass1=m_i,
+                mass2=m_j,
+                x=new_x,
+                y=new_y,
+                u=new_u,
+                v=new_v,
+                child=new_ids,
+            )
+
+        survivors = numpy.ones(len(c), dtype=bool)
+        survivors[ii] = survivors[jj] = False
+        self.contents = pandas.concat([c[survivors], merged], ignore_index=True)
+        self._reindex()
+        return True
+
+    def do_tracer_absorption(self):
+        """
+        Remove tracers that are inside a massive body. Unlike a merger, the massive body is left
+        unchanged.
+        """
+        c = self.contents
+        tracer = c.tracer.values.astype(bool)
+        if not tracer.any():
+            return
+        massive = ~tracer
+        hits = kernels.calculate_tracer_hits(
+            c.x.values[tracer],
+            c.y.values[tracer],
+            c.x.values[massive],
+            c.y.values[massive],
+            c.radius.values[massive],
+        )
+        if (hits >= 0).any():
+            survivors = numpy.ones(len(c), dtype=bool)
+            survivors[tracer.nonzero()[0][hits >= 0]] = False
+            self.contents = c[survivors].reset_index(drop=True)
+            self._reindex()
+
+    def do_escapes(self):
+        """
+        Move escaped bodies from the contents into the archive, and (if the policy allows it)
+        archived bodies that have come back into the contents. The archive is only checked
+        every `escape.every` iterations; in between, archived bodies are moved cheaply by
+        treating the whole system as a point mass.
+        """
+        if self._centre is not None and not self.archive.empty and self.escape.readmit:
+            a = self.archive
+            x, y, u, v = (values.copy() for values in _values(a, "x y u v"))
+            dt = self.timestep
+            self._centre = self._centre._replace(
+                x=self._centre.x + self._centre.u * dt, y=self._centre.y + self._centre.v * dt
+            )
+            self.escape.advance(self._centre, x, y, u, v, dt)
+            self.archive = a.assign(x=x, y=y, u=u, v=v)
+        if not self.escape.due(self.iteration):
+            return
+
+        c = self.contents
+        massive = ~c.tracer.values.astype(bool)
+        x, y, u, v, mass = _values(c)
+        self._centre = centre = self.escape.centre(
+            x[massive], y[massive], u[massive], v[massive], mass[massive]
+        )
+        changed = False
+        if self.escape.readmit and not self.archive.empty:
+            a = self.archive
+            returned = self.escape.returned(centre, a.x.values, a.y.values)
+            if returned.any():
+                back = a[returned]
+                # the telemetry only measures massive bodies, even if a tracer has a mass
+                measured = back[~back.tracer.values.astype(bool)]
+                self.escaped_energy -= self.escape.energy(centre, *_values(measured))
+                self.escaped_momentum -= total_momentum(*_values(measured))
+                self.archive = a[~returned]
+                c = pandas.concat([c, back[COLUMNS]], ignore_index=True)
+                changed = True
+
+        escaped = self.escape.escaped(centre, *_values(c))
+        if escaped.any():
+            gone = c[escaped]
+            measured = gone[~gone.tracer.values.astype(bool)]
+            self.escaped_energy += self.escape.energy(centre, *_values(measured))
+            self.escaped_momentum += total_momentum(*_values(measured))
+            gone = gone.assign(escaped_at=self.iteration)
+            self.archive = gone if self.archive.empty else pandas.concat([self.archive, gone])
+            c = c[~escaped]
+            changed = True
+
+        if changed:
+            self.contents = c.reset_index(drop=True)
+            self._reindex()
+
+    def add_body(
+        self,
+        x: float,
+        y: float,
+        mass: float,
+        radius: float,
+        u: float = 0,
+        v: float = 0,
+        name: str | None = "",
+        tracer: bool = False,
+    ) -> BodyID:
+        """
+        Add a body to the automaton. This makes a full copy of the contents dataframe,
+        so it's quite slow. Use sparingly, or use add_bodies.
+        """
+        name_id = self.names.get_id(name)
+        body_id = self._next_id
+        self._next_id += 1
+        self.contents = DataFrame(
+            [
+                *self.contents.to_dict(orient="records"),
+                dict(
+                    id=body_id,
+                    x=float(x),
+                    y=float(y),
+                    mass=float(mass),
+                    radius=float(radius),
+                    u=float(u),
+                    v=float(v),
+                    name_id=name_id,
+                    tracer=tracer,
+                ),
+            ]
+        )
+        self._reindex()
+        self.version += 1
+        return body_id
+
+    def add_bodies(
+        self,
+        x: numpy.array,
+        y: numpy.array,
+        mass: numpy.array,
+        radius: numpy.array,
+        u: numpy.array = 0,
+        v: numpy.array = 0,
+        tracer: bool = False,
+    ) -> numpy.array:
+        """
+        Add many unnamed bodies with a single copy of the contents dataframe.
+        Returns the IDs of the new bodies.
+        """
+        ids = numpy.arange(self._next_id, self._next_id + len(x))
+        self._next_id += len(x)
+        new = DataFrame(
+            dict(x=x, y=y, mass=mass, radius=radius, u=u, v=v), index=ids, dtype=float
+        ).reset_index(names="id")
+        new["name_id"] = NO_NAME
+        new["tracer"] = tracer
+        if self.contents.empty:
+            self.contents = new
+        else:
+            self.contents = pandas.concat([self.contents, new], ignore_index=True)
+        self._reindex()
+        self.version += 1
+        return ids
+
+    def reorder(self):
+        """
+        Sort the bodies along a Z-order curve. Only the row order changes; IDs and names move
+        with their rows, and the id -> slot lookup is rebuilt.
+        """
+        c = self.contents
+        order = morton_order(c.x.values, c.y.values)
+        self.contents = c.take(order).reset_index(drop=True)
+        self._reindex()
+        self.version += 1  # arrays() and the spatial index are in the old order
+
+    def _reindex(self):
+        """
+        Rebuild the id -> slot lookup. Call this whenever rows are added, removed or reordered.
+        """
+        ids = self.contents.id.values.astype(int)
+        self._slots = numpy.full(self._next_id, -1)
+        self._slots[ids] = numpy.arange(len(ids))
+
+    def slot(self, body_id: BodyID) -> int:
+        """
+        Row position of a body in the contents dataframe, or -1 if it no longer exists.
+        """
+        while body_id in self._merged_into:
+            body_id = self._merged_into[body_id]
+        return int(self._slots[body_id]) if 0 <= body_id < len(self._slots) else -1
+
+    def get_body(self, body_id: BodyID) -> physics.Body | None:
+        slot = self.slot(body_id)
+        if slot < 0:
+            return None
+        row = self.contents.iloc[slot]
+        return physics.Body(
+            mass=row.mass,
+            radius=row.radius,
+            x=row.x,
+            y=row.y,
+            u=row.u,
+            v=row.v,
+            name_id=int(row.name_id),  # iloc upcasts the whole row
+            id=int(row.id),
+            tracer=bool(row.tracer),
+        )
+
+    def bodies(self) -> dict[BodyID, physics.Body]:
+        columns = [self.contents[column].tolist() for column in COLUMNS]
+        return {
+            int(body_id): physics.Body(
+                mass=mass,
+                radius=radius,
+                x=x,
+                y=y,
+                u=u,
+                v=v,
+                name_id=int(name_id),
+                id=int(body_id),
+                tracer=bool(tracer),
+            )
+            for body_id, x, y, mass, radius, u, v, name_id, tracer in zip(*columns)
+        }
+
+    def arrays(self) -> BodyArrays:
+        c = self.contents
+        return BodyArrays(
+            id=c.id.values.astype(int),
+            x=c.x.values,
+            y=c.y.values,
+            u=c.u.values,
+            v=c.v.values,
+            mass=c.mass.values,
+            radius=c.radius.values,
+            name_id=c.name_id.values.astype(int),
+            tracer=c.tracer.values.astype(bool),
+        )
+
+    def query_rect(self, rect: Rect) -> numpy.array:
+        return self._spatial_index.query(rect, self.version, self.arrays)
+
+    def snapshot(self) -> Snapshot:
+        # contents and archive are never changed in place, only replaced, so they can be shared
+        return (
+            self.contents,
+            self.archive,
+            self.escaped_energy,
+            self.escaped_momentum.copy(),
+            self._next_id,
+            self.iteration,
+            self.heat,
+        )
+
+    def restore(self, snapshot: Snapshot):
+        (
+            self.contents,
+            self.archive,
+            self.escaped_energy,
+            escaped_momentum,
+            self._next_id,
+            self.iteration,
+            self.heat,
+        ) = snapshot
+        self.escaped_momentum = escaped_momentum.copy()
+        # the mergers since the snapshot never happened, so their IDs mustn't lead anywhere
+        forget_mergers(self._merged_into, self._next_id)
+        if self.merge_log is not None:
+            self.merge_log.rollback(self._next_id)
+        self.telemetry.rollback(self.iteration)
+        self._reindex()
+        self.version += 1
+
+    def world_size(self) -> tuple[float, float]:
+        xlim, ylim = self.world_limits()
+        width = xlim[1] - xlim[0] + 1
+        height = ylim[1] - ylim[0] + 1
+        return width, height
+
+    def world_limits(self) -> tuple[tuple[float, float], tuple[float, float]]:
+        if self.contents.empty:
+            return (0, 0), (0, 0)
+        else:
+            xlim = self.contents.x.min(), self.contents.x.max()
+            ylim = self.contents.y.min(), self.contents.y.max()
+            return xlim, ylim
@@ -0,0 +1,182 @@
+"""
+Conservation diagnostics. If a solver, timestep or other performance setting breaks the physics,
+it shows up here as drift in the total energy, momentum or angular momentum.
+
+Everything here is O(N); the potential energy is expensive (O(N**2)) so it comes from the
+automaton's force pass rather than being calculated separately.
+"""
+
+from collections import deque
+from typing import NamedTuple
+
+import numpy
+
+from .constants import GRAVITATIONAL_CONSTANT
+
+
+class Diagnostics(NamedTuple):
+    iteration: int
+    kinetic_energy: float
+    potential_energy: float
+    heat: float  # cumulative energy lost in mergers, or carried off by escaped bodies
+    momentum_x: float
+    momentum_y: float
+    angular_momentum: float  # about the origin
+    momentum_scale: float  # sum of |momentum| of every body; for relative errors
+    angular_momentum_scale: float  # sum of |angular momentum| of every body
+
+    @property
+    def energy(self) -> float:
+        """Total energy, including what has been turned into heat by mergers"""
+        return self.kinetic_energy + self.potential_energy + self.heat
+
+
+def measure(
+    iteration: int,
+    x: numpy.array,
+    y: numpy.array,
+    u: numpy.array,
+    v: numpy.array,
+    mass: numpy.array,
+    potential_energy: float,
+    heat: float = 0.0,
+    escaped_momentum: numpy.array = (0.0, 0.0, 0.0),
+) -> Diagnostics:
+    """
+    :param heat: energy lost in mergers, or carried off by bodies that are no longer simulated
+    :param escaped_momentum: (momentum_x, momentum_y, angular_momentum) carried off by bodies
+        that are no longer simulated; added to the totals, so that removing bodies doesn't
+        show up as drift
+    """
+    momentum_x = mass * u
+    momentum_y = mass * v
+    angular_momentum = x * momentum_y - y * momentum_x
+    escaped_x, escaped_y, escaped_angular = escaped_momentum
+    return Diagnostics(
+        iteration=iteration,
+        kinetic_energy=float(0.5 * (mass * (u**2 + v**2)).sum()),
+        potential_energy=float(potential_energy),
+        heat=float(heat),
+        momentum_x=float(momentum_x.sum() + escaped_x),
+        momentum_y=float(momentum_y.sum() + escaped_y),
+        angular_momentum=float(angular_momentum.sum() + escaped_angular),
+        momentum_scale=float(numpy.hypot(momentum_x, momentum_y).sum()),
+        angular_momentum_scale=float(numpy.abs(angular_momentum).sum()),
+    )
+
+
+def total_momentum(
+    x: numpy.array, y: numpy.array, u: numpy.array, v: numpy.array, mass: numpy.array
+) -> numpy.array:
+    """
+    :return: array of the bodies' total (momentum_x, momentum_y, angular momentum about the
+        origin)
+    """
+    momentum_x = mass * u
+    momentum_y = mass * v
+    return numpy.array(
+        [momentum_x.sum(), momentum_y.sum(), (x * momentum_y - y * momentum_x).sum()]
+    )
+
+
+def merger_heat(
+    dx: numpy.array,
+    dy: numpy.array,
+    du: numpy.array,
+    dv: numpy.array,
+    mass1: numpy.array,
+    mass2: numpy.array,
+) -> float:
+    """
+    Total energy lost when pairs of bodies merge; see pair_heat.
+    """
+    return float(numpy.sum(pair_heat(dx, dy, du, dv, mass1, mass2)))
+
+
+def pair_heat(
+    dx: numpy.array,
+    dy: numpy.array,
+    du: numpy.array,
+    dv: numpy.array,
+    mass1: numpy.array,
+    mass2: numpy.array,
+) -> numpy.array:
+    """
+    Energy lost when each pair of bodies merges: the kinetic energy of their relative motion,
+    plus their mutual potential energy (which is negative). The small change in potential energy
+    with respect to all the other bodies is ignored.
+
+    :param dx, dy: separation of each pair
+    :param du, dv: relative velocity of each pair
+    :param mass1, mass2: masses of each pair
+    """
+    reduced_mass = mass1 * mass2 / (mass1 + mass2)
+    kinetic = 0.5 * reduced_mass * (du**2 + dv**2)
+    dist = numpy.hypot(dx, dy)
+    with numpy.errstate(divide="ignore"):
+        # coincident bodies have no meaningful mutual potential energy
+        potential = numpy.where(dist > 0, -GRAVITATIONAL_CONSTANT * mass1 * mass2 / dist, 0.0)
+    return kinetic + potential
+
+
+class Telemetry:
+    """
+    Collects Diagnostics every `every` iterations, and compares them to the first sample.
+    """
+
+    def __init__(self, every: int = 10, maxlen: int = 1000):
+        """
+        :param every: sample every this many iterations. 0 disables sampling.
+        :param maxlen: number of samples to keep
+        """
+        self.every = every
+        self.samples: deque[Diagnostics] = deque(maxlen=maxlen)
+        self.initial: Diagnostics | None = None
+
+    def due(self, iteration: int) -> bool:
+        return bool(self.every) and iteration % self.every == 0
+
+    def record(self, sample: Diagnostics):
+        if self.initial is None:
+            self.initial = sample
+        self.samples.append(sample)
+
+    def rollback(self, iteration: int):
+        """
+        Forget the samples taken from `iteration` on, e.g. because the automaton has been
+        restored to a snapshot from before them.
+        """
+        while self.samples and self.samples[-1].iteration >= iteration:
+            self.samples.pop()
+        if self.initial is not None and self.initial.iteration >= iteration:
+            self.initial = None
+
+    @property
+    def latest(self) -> Diagnostics | None:
+        return self.samples[-1] if self.samples else None
+
+    def errors(self) -> tuple[float, float, float]:
+        """
+        Relative drift of (energy, momentum, angular momentum) since the first sample
+        """
+        first, last = self.initial, self.latest
+        if first is None or last is None:
+            return 0.0, 0.0, 0.0
+        energy = abs(last.energy - first.energy) / (abs(first.energy) or 1)
+        momentum = numpy.hypot(
+            last.momentum_x - first.momentum_x, last.momentum_y - first.momentum_y
+        ) / (first.momentum_scale or 1)
+        angular = abs(last.angular_momentum - first.angular_momentum) / (
+            first.angular_momentum_scale or 1
+        )
+        return float(energy), float(momentum), float(angular)
+
+    def summary(self) -> str:
+        if self.latest is None:
+            return "telemetry: no samples"
+        energy, momentum, angular = self.errors()
+        return (
+            f"iteration {self.latest.iteration}: "
+            f"E={self.latest.energy:.4g} "
+            f"dE={energy:.2e} dP={momentum:.2e} dL={angular:.2e}"
+        )
@@ -0,0 +1,193 @@
+"""
+Ensemble mode: many independent small simulations advanced together.
+
+Running hundreds of copies of a small system (e.g. the solar system with perturbed initial
+conditions) as separate automata is dominated by python overhead. Here the S simulations are
+stacked along a leading axis into (S, N) arrays, and every iteration is a handful of batched
+numpy operations on (S, N, N) arrays. Bodies that merge away are masked out rather than removed,
+so the arrays never change shape; simulations with fewer than N bodies are padded the same way.
+"""
+
+import numpy
+
+from . import physics
+from .automaton import Automaton
+from .dataframe import GravityAutomatonDataFrame
+from .diagnostics import pair_heat
+from .names import NameTable, NO_NAME
+
+FIELDS = "x y mass radius u v".split()
+
+
+class GravityAutomatonEnsemble:
+    """
+    S independent simulations of up to N bodies each. Slot [s, i] holds body i of simulation s;
+    it is empty if alive[s, i] is False. Empty slots have zero mass and radius, so they exert no
+    force and never collide.
+    """
+
+    iteration: int = 0
+
+    def __init__(self, n_simulations: int, n_bodies: int):
+        """
+        :param n_simulations: number of simulations (S)
+        :param n_bodies: maximum number of bodies per simulation (N)
+        """
+        shape = (n_simulations, n_bodies)
+        self.x = numpy.zeros(shape)
+        self.y = numpy.zeros(shape)
+        self.mass = numpy.zeros(shape)
+        self.radius = numpy.zeros(shape)
+        self.u = numpy.zeros(shape)
+        self.v = numpy.zeros(shape)
+        self.name_id = numpy.full(shape, NO_NAME)
+        self.alive = numpy.zeros(shape, dtype=bool)
+        self.heat = numpy.zeros(n_simulations)  # energy lost in mergers, per simulation
+        self.names = NameTable()
+
+    @classmethod
+    def from_automata(cls, automata: list[Automaton]) -> "GravityAutomatonEnsemble":
+        """
+        Stack the current state of several automata into one ensemble. Use
+        `to_automaton` to get them back out. Tracers aren't supported.
+        """
+        if any(body.tracer for automaton in automata for body in automaton.bodies().values()):
+            raise ValueError("Ensembles don't support tracers")
+        n_bodies = max((len(automaton.bodies()) for automaton in automata), default=0)
+        ensemble = cls(len(automata), n_bodies)
+        for s, automaton in enumerate(automata):
+            for i, body in enumerate(automaton.bodies().values()):
+                if body.name_id == NO_NAME:
+                    name_id = NO_NAME
+                elif automaton.names.is_materialized(body.name_id):
+                    name_id = ensemble.names.intern(automaton.names[body.name_id])
+                else:
+                    name_id = ensemble.names.reserve()
+                for field in FIELDS:
+                    getattr(ensemble, field)[s, i] = getattr(body, field)
+                ensemble.name_id[s, i] = name_id
+                ensemble.alive[s, i] = True
+        return ensemble
+
+    def to_automaton(self, simulation: int) -> GravityAutomatonDataFrame:
+        """
+        Copy one simulation out into a regular automaton, e.g. to look at it in the viewer.
+        """
+        automaton = GravityAutomatonDataFrame()
+        for i in self.alive[simulation].nonzero()[0]:
+            name_id = int(self.name_id[simulation, i])
+            automaton.add_body(
+                x=self.x[simulation, i],
+                y=self.y[simulation, i],
+                mass=self.mass[simulation, i],
+                radius=self.radius[simulation, i],
+                u=self.u[simulation, i],
+                v=self.v[simulation, i],
+                name=self.names[name_id] if name_id != NO_NAME else "",
+            )
+        return automaton
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.x.shape
+
+    def counts(self) -> numpy.array:
+        """Number of bodies left in each simulation"""
+        return self.alive.sum(axis=1)
+
+    def perturb(
+        self,
+        position_scale: float = 0.0,
+        velocity_scale: float = 0.0,
+        rng: numpy.random.Generator = None,
+    ):
+        """
+        Multiply every position and velocity component by (1 + noise), where noise is normally
+        distributed with the given standard deviation, independently for every simulation.
+        """
+        rng = rng or numpy.random.default_rng()
+        for values, scale in [
+            (self.x, position_scale),
+            (self.y, position_scale),
+            (self.u, velocity_scale),
+            (self.v, velocity_scale),
+        ]:
+            values *= 1 + rng.normal(0, scale, self.shape)
+
+    def iterate(self):
+        """
+        1. Apply the rules of gravitation attraction between each pair of objects in each
+           simulation
+        2. Move every object according to the laws of motion
+        3. Merge colliding objects
+        """
+        acc_x, acc_y = physics.calculate_batched_x_y_acceleration(self.x, self.y, self.mass)
+        self.u += acc_x * self.alive
+        self.v += acc_y * self.alive
+        self.x += self.u
+        self.y += self.v
+        while self.do_collisions():
+            pass
+        self.iteration += 1
+
+    def do_collisions(self) -> bool:
+        """
+        Do one round of collision processing: in every simulation that has any overlapping
+        bodies, merge the first overlapping pair. The lower slot keeps the merged body and the
+        higher slot is emptied. Simulations with several collisions get merged over multiple
+        rounds.
+        Return True if collisions were processed.
+        """
+        n = self.shape[1]
+        DX = self.x[:, numpy.newaxis, :] - self.x[:, :, numpy.newaxis]
+        DY = self.y[:, numpy.newaxis, :] - self.y[:, :, numpy.newaxis]
+        R1R2 = self.radius[:, numpy.newaxis, :] + self.radius[:, :, numpy.newaxis]
+        COLLIDING = DX**2 + DY**2 < R1R2**2
+        COLLIDING &= self.alive[:, numpy.newaxis, :] & self.alive[:, :, numpy.newaxis]
+        COLLIDING &= numpy.triu(numpy.ones((n, n), dtype=bool), k=1)
+        COLLIDING = COLLIDING.reshape(len(COLLIDING), -1)
+        (ss,) = COLLIDING.any(axis=1).nonzero()
+        if not len(ss):
+            return False
+
+        ii, jj = numpy.divmod(COLLIDING[ss].argmax(axis=1), n)
+        m_i, m_j = self.mass[ss, ii], self.mass[ss, jj]
+        new_mass = m_i + m_j
+        self.heat[ss] += pair_heat(
+            self.x[ss, jj] - self.x[ss, ii],
+            self.y[ss, jj] - self.y[ss, ii],
+            self.u[ss, jj] - self.u[ss, ii],
+            self.v[ss, jj] - self.v[ss, ii],
+            m_i,
+            m_j,
+        )
+        for field in "x y u v".split():
+            values = getattr(self, field)
+            values[ss, ii] = (values[ss, ii] * m_i + values[ss, jj] * m_j) / new_mass
+        self.radius[ss, ii] = numpy.sqrt(self.radius[ss, ii] ** 2 + self.radius[ss, jj] ** 2)
+        self.mass[ss, ii] = new_mass
+        self.name_id[ss, ii] = [
+            self.names.merge(name_i, name_j, mass_i, mass_j)
+            for name_i, name_j, mass_i, mass_j in zip(
+                self.name_id[ss, ii].tolist(),
+                self.name_id[ss, jj].tolist(),
+                m_i.tolist(),
+                m_j.tolist(),
+            )
+        ]
+        self.alive[ss, jj] = False
+        self.mass[ss, jj] = 0
+        self.radius[ss, jj] = 0
+        self.u[ss, jj] = self.v[ss, jj] = 0
+        self.name_id[ss, jj] = NO_NAME
+        return True
+
+    def energy(self) -> numpy.array:
+        """
+        Total energy of each simulation, including what has been turned into heat by mergers
+        """
+        _, _, potential = physics.calculate_batched_x_y_acceleration(
+            self.x, self.y, self.mass, return_potential=True
+        )
+        kinetic = 0.5 * (self.mass * (self.u**2 + self.v**2)).sum(axis=1)
+        return kinetic + potential + self.heat
@@ -0,0 +1,150 @@
+"""
+Escaped-body culling. Bodies that have been flung out of the system still take part in every
+force and collision pass, and stretch the world limits. An EscapePolicy decides when a body has
+left for good, so the automaton can move it out of the active set into an archive.
+"""
+
+from typing import NamedTuple
+
+import numpy
+
+from .constants import GRAVITATIONAL_CONSTANT
+
+
+class SystemCentre(NamedTuple):
+    x: float  # centre of mass
+    y: float
+    u: float  # velocity of the centre of mass
+    v: float
+    mass: float  # total mass
+    core_radius: float  # distance from the centre of mass that contains most bodies
+
+
+class EscapePolicy:
+    """
+    A body has escaped if it is unbound, i.e. its energy relative to the system is positive,
+    and it is further than `k` core radii from the centre of mass. That far out, the rest of
+    the system looks like a point mass, so the energy is calculated relative to a point mass at
+    the centre of mass; this is O(N) instead of O(N**2).
+
+    Archived bodies can optionally be re-admitted if they come back within `k` core radii. In
+    the meantime they are moved around the centre of mass as if it were a point mass, at O(1)
+    cost per archived body.
+    """
+
+    def __init__(
+        self, every: int = 50, k: float = 3.0, core_quantile: float = 0.9, readmit: bool = False
+    ):
+        """
+        :param every: check for escaped bodies every this many iterations
+        :param k: bodies must be further than k core radii from the centre of mass to escape
+        :param core_quantile: the core radius is the distance that contains this fraction of
+            the (non-tracer) bodies
+        :param readmit: move archived bodies back into the active set if they return
+        """
+        self.every = every
+        self.k = k
+        self.core_quantile = core_quantile
+        self.readmit = readmit
+
+    def due(self, iteration: int) -> bool:
+        return bool(self.every) and iteration % self.every == 0
+
+    def centre(
+        self, x: numpy.array, y: numpy.array, u: numpy.array, v: numpy.array, mass: numpy.array
+    ) -> SystemCentre:
+        """
+        Find the centre of mass and core radius of a set of bodies.
+        """
+        total_mass = mass.sum()
+        if not len(x) or not total_mass:
+            return SystemCentre(0.0, 0.0, 0.0, 0.0, 0.0, numpy.inf)
+        cx = x.dot(mass) / total_mass
+        cy = y.dot(mass) / total_mass
+        return SystemCentre(
+            x=cx,
+            y=cy,
+            u=u.dot(mass) / total_mass,
+            v=v.dot(mass) / total_mass,
+            mass=total_mass,
+            core_radius=numpy.quantile(numpy.hypot(x - cx, y - cy), self.core_quantile),
+        )
+
+    def specific_energy(
+        self,
+        centre: SystemCentre,
+        x: numpy.array,
+        y: numpy.array,
+        u: numpy.array,
+        v: numpy.array,
+        mass: numpy.array,
+    ) -> numpy.array:
+        """
+        Energy per unit mass of each body relative to the rest of the system (a point mass at
+        the centre of mass)
+        """
+        with numpy.errstate(divide="ignore"):
+            dist = numpy.hypot(x - centre.x, y - centre.y)
+            potential = -GRAVITATIONAL_CONSTANT * (centre.mass - mass) / dist
+        return 0.5 * ((u - centre.u) ** 2 + (v - centre.v) ** 2) + potential
+
+    def escaped(
+        self,
+        centre: SystemCentre,
+        x: numpy.array,
+        y: numpy.array,
+        u: numpy.array,
+        v: numpy.array,
+        mass: numpy.array,
+    ) -> numpy.array:
+        """
+        :return: boolean array; True for bodies that have escaped
+        """
+        dist = numpy.hypot(x - centre.x, y - centre.y)
+        far = dist > self.k * centre.core_radius
+        return far & (self.specific_energy(centre, x, y, u, v, mass) > 0)
+
+    def returned(self, centre: SystemCentre, x: numpy.array, y: numpy.array) -> numpy.array:
+        """
+        :return: boolean array; True for archived bodies that should be re-admitted
+        """
+        return numpy.hypot(x - centre.x, y - centre.y) <= self.k * centre.core_radius
+
+    def energy(
+        self,
+        centre: SystemCentre,
+        x: numpy.array,
+        y: numpy.array,
+        u: numpy.array,
+        v: numpy.array,
+        mass: numpy.array,
+    ) -> float:
+        """
+        Total energy that a set of bodies takes with it when it leaves the system: their kinetic
+        energy, plus their potential energy with respect to the rest of the system.
+        """
+        with numpy.errstate(divide="ignore"):
+            dist = numpy.hypot(x - centre.x, y - centre.y)
+            potential = -GRAVITATIONAL_CONSTANT * mass * (centre.mass - mass) / dist
+        return float((0.5 * mass * (u**2 + v**2) + potential).sum())
+
+    def advance(
+        self,
+        centre: SystemCentre,
+        x: numpy.array,
+        y: numpy.array,
+        u: numpy.array,
+        v: numpy.array,
+        dt: float = 1.0,
+    ):
+        """
+        Move archived bodies one step in place, attracted by a point mass at the centre of mass.
+        """
+        dx = centre.x - x
+        dy = centre.y - y
+        dist = numpy.hypot(dx, dy)
+        strength = GRAVITATIONAL_CONSTANT * centre.mass / dist**3 * dt
+        u += dx * strength
+        v += dy * strength
+        x += u * dt
+        y += v * dt
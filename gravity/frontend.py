@@ -1,17 +1,35 @@
-import matplotlib
+import numpy
 import pygame.draw
+import pygame.surfarray
 from pygame import Surface, Color
 from robingame.text import fonts
 
-from .automaton import Automaton
+from . import colormaps
+from .automaton import Automaton, BodyArrays
+from .interpolation import Interpolation
+from .names import NO_NAME
 from .physics import Body
+from .sprites import SpriteCache
+from .trails import Trails
 from .transform import Transform
-from .utils import overlap, square_text
+from .utils import square_text
 from .viewport_handler import FloatRect
 
+MIN_BRIGHTNESS = 0.2
+
 
 class GravityFrontend:
-    colormap = matplotlib.cm.cividis
+    colormap = colormaps.cividis
+    splat_radius: float = 1.0  # bodies smaller than this many pixels are drawn as single pixels
+    lod_tile: int = 8  # bodies smaller than this many pixels are aggregated into tiles; 0 = off
+
+    def __init__(self, trails: Trails = None, sprites: SpriteCache = None):
+        """
+        :param trails: if given, draw the trails of the visible bodies
+        :param sprites: pre-rendered discs; pass the same cache to several frontends to share it
+        """
+        self.trails = trails
+        self.sprites = sprites or SpriteCache(self.colormap)
 
     def draw(
         self,
@@ -19,42 +37,130 @@ class GravityFrontend:
         automaton: Automaton,
         viewport: FloatRect,
         debug: bool = False,
+        interpolation: Interpolation = None,
     ):
         """
-        For now just draw everything
+        Draw the bodies that overlap the viewport. The automaton's spatial index finds them, so
+        this costs about as much as the number of bodies on screen.
+
+        :param interpolation: if given, draw the bodies at their interpolated positions
         """
         surface.fill(Color("black"))
 
-        visible = {
-            (x, y): body
-            for (x, y), body in automaton.bodies().items()
-            if (
-                overlap(
-                    (x - body.radius, x + body.radius), (viewport[0], viewport[0] + viewport[2])
-                )
-                and overlap(
-                    (y - body.radius, y + body.radius), (viewport[1], viewport[1] + viewport[3])
-                )
+        bodies = automaton.arrays()
+        if interpolation is None:
+            visible = automaton.query_rect(viewport)
+        else:
+            # the index has the bodies where they are now, which can be up to margin away
+            x, y, width, height = viewport
+            margin = interpolation.margin
+            visible = automaton.query_rect(
+                (x - margin, y - margin, width + 2 * margin, height + 2 * margin)
             )
-        }
+            bodies = interpolation.apply(bodies, visible)
+            visible = numpy.arange(len(visible))
 
         image_rect_uv = surface.get_rect()
         transform = Transform(viewport, image_rect_uv)
+        if self.trails:
+            self.draw_trails(surface, transform, bodies, visible, automaton.total_mass)
+        self.draw_bodies(surface, transform, bodies, visible, automaton.total_mass)
+
+        named = visible[bodies.name_id[visible] != NO_NAME]
+        for name_id, x, y in zip(
+            *(array[named].tolist() for array in (bodies.name_id, bodies.x, bodies.y))
+        ):
+            u, v = transform.point((x, y))
+            # this is the only place names get materialized
+            fonts.cellphone_white.render(
+                surface,
+                square_text(automaton.names[name_id]),
+                x=u,
+                y=v,
+                scale=2,
+            )
 
-        for xy, body in visible.items():
-            color = self.get_color(body, automaton)
-            uv = transform.point(xy)
-            radius = body.radius * transform.scale
-            radius = max(2, radius)
-            pygame.draw.circle(surface, color, center=uv, radius=radius)
-            if body.name:
-                fonts.cellphone_white.render(
-                    surface,
-                    square_text(body.name),
-                    x=uv[0],
-                    y=uv[1],
-                    scale=2,
-                )
+    def draw_bodies(
+        self,
+        surface: Surface,
+        transform: Transform,
+        bodies: BodyArrays,
+        which: numpy.array,
+        total_mass: float,
+    ):
+        """
+        Level of detail: bodies that are too small on screen to be told apart are aggregated
+        into one disc per lod_tile x lod_tile screen tile, so the drawing cost is bounded by the
+        screen resolution rather than the number of bodies. Then, discs smaller than
+        splat_radius are added onto single pixels in one vectorised write. The bigger ones are
+        blitted from the sprite cache in one batch; only discs too big for the cache are drawn
+        as circles one by one.
+
+        :param which: boolean or index array; draw only these bodies
+        """
+        u, v = transform.point((bodies.x[which], bodies.y[which]))
+        radius = bodies.radius[which] * transform.scale
+        mass = bodies.mass[which]
+        if self.lod_tile:
+            resolved = radius * 2 >= self.lod_tile
+            tiles = aggregate(
+                u[~resolved],
+                v[~resolved],
+                radius[~resolved],
+                mass[~resolved],
+                self.lod_tile,
+                surface.get_size(),
+            )
+            u, v, radius, mass = (
+                numpy.concatenate([tiled, array[resolved]])
+                for tiled, array in zip(tiles, (u, v, radius, mass))
+            )
+        color_index = self.get_color_indices(mass, total_mass)
+        small = radius < self.splat_radius
+        splat(surface, u[small], v[small], self.colormap.table[color_index[small]])
+
+        radius = numpy.maximum(2, numpy.rint(radius)).astype(int)
+        left = numpy.rint(u).astype(int) - radius  # sprites are placed by their top left corner
+        top = numpy.rint(v).astype(int) - radius
+        cached = ~small & (radius <= self.sprites.max_radius)
+        # look each distinct sprite up once, rather than once per body
+        colors = len(self.colormap.table)
+        keys, which_sprite = numpy.unique(
+            radius[cached] * colors + color_index[cached], return_inverse=True
+        )
+        sprites = [self.sprites.get(*divmod(key, colors)) for key in keys.tolist()]
+        surface.blits(
+            zip(
+                map(sprites.__getitem__, which_sprite.tolist()),
+                zip(left[cached].tolist(), top[cached].tolist()),
+            ),
+            doreturn=False,
+        )
+        huge = ~small & ~cached
+        for u, v, radius, color in zip(
+            *(array[huge].tolist() for array in (u, v, radius, self.colormap.table[color_index]))
+        ):
+            pygame.draw.circle(surface, color, center=(u, v), radius=radius)
+
+    def draw_trails(
+        self,
+        surface: Surface,
+        transform: Transform,
+        bodies: BodyArrays,
+        which: numpy.array,
+        total_mass: float,
+    ):
+        """
+        Draw the trail of each body as a polyline in a dimmed version of the body's colour.
+
+        :param which: boolean or index array; draw only these bodies' trails
+        """
+        colors = self.get_colors(bodies.mass[which], total_mass) // 2
+        for body_id, color in zip(bodies.id[which].tolist(), colors.tolist()):
+            trail = self.trails.trail(body_id)
+            if len(trail) > 1:
+                u, v = transform.point((trail[:, 0], trail[:, 1]))
+                pygame.draw.lines(surface, color, False, numpy.stack([u, v], axis=1).tolist())
 
     def get_color(self, body: Body, automaton: Automaton) -> Color:
         """
@@ -62,43 +168,145 @@ class GravityFrontend:
         where MIN maps to the lower limit of the colormap,
         and MAX maps to the upper limit.
         """
-        MIN_BRIGHTNESS = 0.2
         interpolated = body.mass / automaton.total_mass
         interpolated = max(interpolated, MIN_BRIGHTNESS)
-        return Color(*tuple(int(ch * 255) for ch in self.colormap(interpolated)))
+        return Color(*self.colormap(interpolated).tolist())
+
+    def get_colors(self, mass: numpy.array, total_mass: float) -> numpy.array:
+        """
+        Same as get_color for an array of masses.
+        :return: (N, 3) array of RGB values
+        """
+        return self.colormap.table[self.get_color_indices(mass, total_mass)]
+
+    def get_color_indices(self, mass: numpy.array, total_mass: float) -> numpy.array:
+        """
+        Same as get_colors, but return the rows of the colormap's table instead of the colours
+        """
+        interpolated = numpy.maximum(mass / (total_mass or 1), MIN_BRIGHTNESS)
+        return self.colormap.index(interpolated)
+
+
+def aggregate(
+    u: numpy.array,
+    v: numpy.array,
+    radius: numpy.array,
+    mass: numpy.array,
+    tile: int,
+    size: tuple[int, int],
+) -> tuple[numpy.array, numpy.array, numpy.array, numpy.array]:
+    """
+    Bin bodies into square screen tiles, and combine each tile into a single disc at the
+    tile's centre of mass, with the tile's total mass and area. Tiles with no mass (e.g. only
+    tracers) use the mean position instead.
+
+    :param u, v: 1d arrays of screen coordinates
+    :param radius: 1d array of screen radii
+    :param mass: 1d array of masses
+    :param tile: tile size in pixels
+    :param size: screen (width, height) in pixels; bodies off screen go in the edge tiles
+    :return u, v, radius, mass: 1d arrays with one entry per non-empty tile
+    """
+    n_u, n_v = (-(-length // tile) for length in size)
+    tile_u = numpy.clip(numpy.floor(u / tile).astype(int), 0, n_u - 1)
+    tile_v = numpy.clip(numpy.floor(v / tile).astype(int), 0, n_v - 1)
+    which_tile = tile_u * n_v + tile_v
+
+    def total(weights: numpy.array = None) -> numpy.array:
+        return numpy.bincount(which_tile, weights=weights, minlength=n_u * n_v)
+
+    count = total()
+    (occupied,) = count.nonzero()
+    tile_mass = total(mass)
+    weight = numpy.where(tile_mass[which_tile] > 0, mass, 1.0)
+    weight_total = numpy.where(tile_mass > 0, tile_mass, count)[occupied]
+    return (
+        total(u * weight)[occupied] / weight_total,
+        total(v * weight)[occupied] / weight_total,
+        numpy.sqrt(total(radius**2)[occupied]),  # same area, like merging bodies
+        tile_mass[occupied],
+    )
+
+
+def splat(surface: Surface, u: numpy.array, v: numpy.array, colors: numpy.array):
+    """
+    Add colours onto single pixels of a surface. Where several points land on the same pixel,
+    their colours add up (clipped at white), so dense regions glow.
+
+    :param u, v: 1d arrays of screen coordinates
+    :param colors: (N, 3) array of RGB values
+    """
+    width, height = surface.get_size()
+    u = numpy.floor(u).astype(int)
+    v = numpy.floor(v).astype(int)
+    inside = (u >= 0) & (u < width) & (v >= 0) & (v < height)
+    if not inside.any():
+        return
+    pixel_ids, which_pixel = numpy.unique(u[inside] * height + v[inside], return_inverse=True)
+    added = numpy.stack(
+        [
+            numpy.bincount(which_pixel, weights=channel, minlength=len(pixel_ids))
+            for channel in colors[inside].T
+        ],
+        axis=1,
+    )
+    pixel_u, pixel_v = numpy.divmod(pixel_ids, height)
+    pixels = pygame.surfarray.pixels3d(surface)
+    pixels[pixel_u, pixel_v] = numpy.minimum(pixels[pixel_u, pixel_v] + added, 255)
+    del pixels  # unlock the surface
 
 
 class GravityMinimap(GravityFrontend):
+    """
+    The minimap always shows the whole world, so the bodies only need redrawing when they
+    change. Panning or zooming the main map only moves the viewport outline.
+    """
+
+    _layer: Surface = None  # bodies, drawn for the key below
+    _layer_key: tuple = None
+    _world_rect_xy: FloatRect = None
+
     def draw(
         self,
         surface: Surface,
         automaton: Automaton,
         viewport: FloatRect,
         debug: bool = False,
+        interpolation: Interpolation = None,
     ):
         """
         For now just draw everything
         """
-        surface.fill(Color("black"))
+        fraction = interpolation.fraction if interpolation else None
+        layer_key = (id(automaton), automaton.version, surface.get_size(), fraction)
+        if layer_key != self._layer_key:
+            self._draw_layer(surface.get_size(), automaton, interpolation)
+            self._layer_key = layer_key
+        surface.blit(self._layer, (0, 0))
+
+        transform = Transform(self._world_rect_xy, surface.get_rect())
+        viewport_rect_uv = transform.floatrect(viewport)
+        pygame.draw.rect(surface, Color("white"), viewport_rect_uv, 1)
+        if debug:
+            world_rect_uv = transform.rect(self._world_rect_xy)
+            pygame.draw.rect(surface, Color("yellow"), world_rect_uv, 1)
+
+    def _draw_layer(
+        self, size: tuple[int, int], automaton: Automaton, interpolation: Interpolation = None
+    ):
+        if self._layer is None or self._layer.get_size() != size:
+            self._layer = Surface(size)
+        self._layer.fill(Color("black"))
 
-        # Choose viewport in xy coordinates to filter for visible cells
         # fit viewport as tightly as possible to world limits
         world_width, world_height = automaton.world_size()
         (xmin, xmax), (ymin, ymax) = automaton.world_limits()
-        world_rect_xy = FloatRect((xmin, ymin, world_width, world_height))
-        image_rect_uv = surface.get_rect()
-        transform = Transform(world_rect_xy, image_rect_uv)
-        viewport_rect_uv = transform.floatrect(viewport)
+        self._world_rect_xy = FloatRect((xmin, ymin, world_width, world_height))
+        transform = Transform(self._world_rect_xy, self._layer.get_rect())
 
         # Draw all cells in screen coords
-        for xy, body in automaton.bodies().items():
-            color = self.get_color(body, automaton)
-            uv = transform.point(xy)
-            radius = body.radius * transform.scale
-            radius = max(radius, 2)
-            pygame.draw.circle(surface, color, center=uv, radius=radius)
-
-        pygame.draw.rect(surface, Color("white"), viewport_rect_uv, 1)
-        if debug:
-            world_rect_uv = transform.rect(world_rect_xy)
-            pygame.draw.rect(surface, Color("yellow"), world_rect_uv, 1)
+        bodies = automaton.arrays()
+        everything = numpy.ones(len(bodies.x), dtype=bool)
+        if interpolation is not None:
+            bodies = interpolation.apply(bodies, everything)
+        self.draw_bodies(self._layer, transform, bodies, everything, automaton.total_mass)
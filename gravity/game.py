@@ -11,11 +11,11 @@ class GravityGame(Game):
     window_caption = "Gravity"
     screen_color = Color("black")
 
-    def __init__(self):
+    def __init__(self, scene: GravityScene = None):
         super().__init__()
         self.scenes = Group()
         self.child_groups = [self.scenes]
-        self.scenes.add(GravityScene())
+        self.scenes.add(scene or GravityScene())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""
+Run a simulation without a window, printing conservation telemetry as it goes:
+
+    python -m gravity.headless --scene swirling --bodies 400 --steps 1000 --sample-every 10
+
+Add `--profile profiles --profile-slower-than 0.05` to keep profiles of any slow steps.
+"""
+
+import argparse
+from pathlib import Path
+
+from . import utils
+from .automaton import Automaton, GravityAutomatonSparseMatrix
+from .dataframe import GravityAutomatonDataFrame, INTEGRATORS
+from .diagnostics import Telemetry
+from .escape import EscapePolicy
+from .mergelog import MergeLog
+from .profiler import Profiler
+from .timer import Timer
+
+SCENES = {
+    "swirling": utils.spawn_swirling,
+    "dusty-disk": utils.spawn_dusty_disk,
+    "random": utils.spawn_random,
+    "line": utils.spawn_line,
+    "solar-system": utils.create_solar_system,
+}
+
+
+def create_automaton(
+    scene: str = "swirling",
+    bodies: int = None,
+    automaton: str = "dataframe",
+    solver: str = "auto",
+    accuracy: float = 0.0,
+    sample_every: int = 10,
+    escape_every: int = 0,
+    swept_collisions: bool = False,
+    merge_at_contact: bool = False,
+    integrator: str = "euler",
+    timestep: float = 1.0,
+    reorder_every: int = 0,
+    merge_log: MergeLog = None,
+    **spawn_kwargs,
+) -> Automaton:
+    """
+    :param escape_every: archive escaped bodies every this many iterations; 0 disables this.
+        Only supported by the dataframe automaton.
+    :param swept_collisions, merge_at_contact, merge_log: see the automata
+    :param integrator, timestep, reorder_every: see GravityAutomatonDataFrame. Only supported
+        by the dataframe automaton.
+    :param spawn_kwargs: passed to the scene's spawn function, e.g. speed_coeff for "swirling"
+    """
+    telemetry = Telemetry(every=sample_every)
+    collisions = dict(
+        swept_collisions=swept_collisions, merge_at_contact=merge_at_contact, merge_log=merge_log
+    )
+    if automaton == "sparse":
+        result = GravityAutomatonSparseMatrix(telemetry=telemetry, **collisions)
+    else:
+        result = GravityAutomatonDataFrame(
+            solver=solver,
+            accuracy=accuracy,
+            telemetry=telemetry,
+            escape=EscapePolicy(every=escape_every) if escape_every else None,
+            integrator=integrator,
+            timestep=timestep,
+            reorder_every=reorder_every,
+            **collisions,
+        )
+    spawn = SCENES[scene]
+    if bodies is None or scene == "solar-system":
+        spawn(result, **spawn_kwargs)
+    else:
+        spawn(result, n=bodies, **spawn_kwargs)
+    return result
+
+
+def run(
+    automaton: Automaton,
+    steps: int,
+    verbose: bool = True,
+    profiler: Profiler = None,
+    profile_from: int = 0,
+) -> float:
+    """
+    Iterate the automaton `steps` times. Print the telemetry every time a sample is taken.
+    Return the time taken in seconds.
+
+    :param profiler: if given, tick it once per step
+    :param profile_from: start the profiler after this many steps
+    """
+    with Timer() as timer:
+        for step in range(steps):
+            if profiler and step == profile_from:
+                profiler.start()
+            sampled = automaton.telemetry.due(automaton.iteration)
+            automaton.iterate()
+            if verbose and sampled:
+                print(f"{automaton.telemetry.summary()} bodies={len(automaton.bodies())}")
+            if profiler:
+                profiler.tick()
+        if profiler:
+            profiler.stop()  # write what there is of the last capture
+    return timer.time
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scene", choices=SCENES, default="swirling")
+    parser.add_argument("--bodies", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--automaton", choices=["dataframe", "sparse"], default="dataframe")
+    parser.add_argument("--solver", default="auto")
+    parser.add_argument("--accuracy", type=float, default=0.0)
+    parser.add_argument("--sample-every", type=int, default=10)
+    parser.add_argument("--escape-every", type=int, default=0)
+    parser.add_argument("--swept-collisions", action="store_true")
+    parser.add_argument("--merge-at-contact", action="store_true")
+    parser.add_argument("--integrator", choices=INTEGRATORS, default="euler")
+    parser.add_argument("--timestep", type=float, default=1.0)
+    parser.add_argument("--reorder-every", type=int, default=0)
+    parser.add_argument("--merge-log", type=Path, default=None, help="stream mergers to this file")
+    parser.add_argument("--profile", type=Path, default=None, help="write profiles here")
+    parser.add_argument("--profile-steps", type=int, default=100, help="steps per profile")
+    parser.add_argument("--profile-from", type=int, default=0, help="start after this step")
+    parser.add_argument("--profile-allocations", action="store_true")
+    parser.add_argument(
+        "--profile-slower-than",
+        type=float,
+        default=None,
+        help="profile the whole run, but only keep profiles with a step slower than this (s)",
+    )
+    args = parser.parse_args(argv)
+
+    merge_log = MergeLog(path=args.merge_log) if args.merge_log else None
+    automaton = create_automaton(
+        scene=args.scene,
+        bodies=args.bodies,
+        automaton=args.automaton,
+        solver=args.solver,
+        accuracy=args.accuracy,
+        sample_every=args.sample_every,
+        escape_every=args.escape_every,
+        swept_collisions=args.swept_collisions,
+        merge_at_contact=args.merge_at_contact,
+        integrator=args.integrator,
+        timestep=args.timestep,
+        reorder_every=args.reorder_every,
+        merge_log=merge_log,
+    )
+    profiler = (
+        Profiler(
+            args.profile,
+            frames=args.profile_steps,
+            allocations=args.profile_allocations,
+            slower_than=args.profile_slower_than,
+        )
+        if args.profile
+        else None
+    )
+    seconds = run(automaton, args.steps, profiler=profiler, profile_from=args.profile_from)
+    if profiler:
+        print(f"wrote {len(profiler.written)} profiles to {args.profile}")
+    if merge_log is not None:
+        merge_log.flush()
+        print(f"logged {len(merge_log)} mergers to {args.merge_log}")
+    print(f"{args.steps} steps in {seconds:.2f}s ({args.steps / seconds:.1f} steps/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -49,3 +49,6 @@ class KeyboardHandler:
                     backend.iterations_per_update *= 2
                 if event.key == pygame.K_LEFT:
                     backend.iterations_per_update = max(1, backend.iterations_per_update // 2)
+                if event.key == pygame.K_p and backend.profiler:
+                    # shift+P also tracks memory allocations
+                    backend.profiler.toggle(allocations=bool(event.mod & pygame.KMOD_SHIFT))
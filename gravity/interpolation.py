@@ -0,0 +1,67 @@
+"""
+Smooth motion between physics steps. When the backend only iterates every few ticks, drawing
+the bodies where the automaton has them makes them jump once per update and stand still in
+between. Instead, each frame draws them part of the way from where they were before the last
+update to where they are now, in proportion to how much of the update cycle has passed. This
+lags the simulation by up to one update, but moves every body a little every frame.
+"""
+
+from typing import NamedTuple
+
+import numpy
+
+from .automaton import BodyArrays
+
+
+class Interpolation(NamedTuple):
+    """
+    Where the bodies were before the last update, lined up with `arrays()` after it. Only
+    valid while the automaton is still at `version`.
+    """
+
+    x: numpy.array  # previous positions; bodies that are new since then use the current one
+    y: numpy.array
+    max_shift: float  # furthest any body moved during the update
+    version: int
+    fraction: float = 1.0  # how far from the previous to the current positions to draw
+
+    @property
+    def margin(self) -> float:
+        """
+        Bodies are drawn up to this far from their current position, so viewport queries have
+        to be padded by this much to find every body that is drawn inside the viewport.
+        """
+        return (1 - self.fraction) * self.max_shift
+
+    def apply(self, bodies: BodyArrays, which: numpy.array) -> BodyArrays:
+        """
+        :param which: boolean or index array; keep only these bodies
+        :return: the selected bodies, at their interpolated positions
+        """
+        subset = BodyArrays(*(array[which] for array in bodies))
+        x, y = self.x[which], self.y[which]
+        return subset._replace(
+            x=x + self.fraction * (subset.x - x),
+            y=y + self.fraction * (subset.y - y),
+        )
+
+
+def interpolation(before: BodyArrays, after: BodyArrays, version: int) -> Interpolation:
+    """
+    Match the bodies up by ID, because merging and escaping change the order and number of
+    bodies. Bodies that are new since (e.g. the product of a merger) stay where they are now.
+
+    :param before: the bodies before the update; only id, x, and y are used
+    :param after: the bodies after the update
+    :param version: the automaton's version after the update
+    """
+    if not len(before.id):
+        return Interpolation(after.x, after.y, 0.0, version)
+    order = numpy.argsort(before.id, kind="stable")
+    ids = before.id[order]
+    where = order[numpy.searchsorted(ids, after.id).clip(max=len(ids) - 1)]
+    found = before.id[where] == after.id
+    x = numpy.where(found, before.x[where], after.x)
+    y = numpy.where(found, before.y[where], after.y)
+    shift = numpy.hypot(after.x - x, after.y - y)
+    return Interpolation(x, y, float(shift.max(initial=0.0)), version)
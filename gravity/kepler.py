@@ -0,0 +1,204 @@
+"""
+Wisdom-Holman integration for systems dominated by one central mass, like the solar system.
+Each step splits the motion into the part the central mass causes, which is solved exactly
+(every body follows its Kepler orbit), and the small pulls of the other bodies on each other,
+which are applied as kicks. Because the big part is exact, steps can be orders of magnitude
+longer than a direct integration needs for the same accuracy.
+
+The split uses democratic heliocentric coordinates (Duncan, Levison & Lee 1998): positions
+relative to the central body, and velocities relative to the centre of mass. One step is
+    kick(dt/2) jump(dt/2) drift(dt) jump(dt/2) kick(dt/2)
+where `drift` moves every body along its Kepler orbit, `kick` applies the bodies' attraction to
+each other (not to the central body), and `jump` moves the bodies to account for the central
+body's motion around the centre of mass.
+
+The split only works while the other bodies' pulls are small compared to the central body's.
+When they aren't (e.g. two planets passing close to each other), the step is done by direct
+integration in short substeps instead.
+"""
+
+import math
+from typing import Callable
+
+import numpy
+
+from .constants import GRAVITATIONAL_CONSTANT
+
+# (x, y, mass) -> (acc_x, acc_y). Bodies with no mass feel the others, but don't attract them.
+Accelerations = Callable[[numpy.array, numpy.array, numpy.array], tuple[numpy.array, numpy.array]]
+
+
+def stumpff(z: numpy.array) -> tuple[numpy.array, numpy.array]:
+    """
+    Stumpff functions c2(z) = (1 - cos(s)) / z and c3(z) = (s - sin(s)) / s**3 with s = sqrt(z),
+    continued to z < 0 with cosh / sinh, and given by their Taylor series near 0, where the
+    closed forms lose precision.
+    """
+    z = numpy.asarray(z, dtype=float)
+    c2 = numpy.empty_like(z)
+    c3 = numpy.empty_like(z)
+    small = numpy.abs(z) < 1e-2
+    ellipse = ~small & (z > 0)
+    hyperbola = ~small & (z < 0)
+
+    zs = z[small]
+    c2[small] = 1 / 2 - zs / 24 + zs**2 / 720 - zs**3 / 40320 + zs**4 / 3628800
+    c3[small] = 1 / 6 - zs / 120 + zs**2 / 5040 - zs**3 / 362880 + zs**4 / 39916800
+    s = numpy.sqrt(z[ellipse])
+    c2[ellipse] = (1 - numpy.cos(s)) / z[ellipse]
+    c3[ellipse] = (s - numpy.sin(s)) / s**3
+    s = numpy.sqrt(-z[hyperbola])
+    c2[hyperbola] = (numpy.cosh(s) - 1) / -z[hyperbola]
+    c3[hyperbola] = (numpy.sinh(s) - s) / s**3
+    return c2, c3
+
+
+def kepler_drift(
+    x: numpy.array,
+    y: numpy.array,
+    u: numpy.array,
+    v: numpy.array,
+    gm: float,
+    dt: float,
+    tolerance: float = 1e-13,
+    max_iterations: int = 50,
+) -> tuple[numpy.array, numpy.array, numpy.array, numpy.array]:
+    """
+    Move bodies along their Kepler orbits around a fixed point mass at the origin. Works for
+    bound and unbound orbits alike, using the universal variable formulation; Kepler's equation
+    is solved with Laguerre's method, which converges from any starting guess.
+
+    :param x, y: 1d arrays of positions relative to the central mass
+    :param u, v: 1d arrays of velocities
+    :param gm: gravitational constant times the central mass
+    :param dt: time to move the bodies forward by
+    :return x, y, u, v: the new positions and velocities
+    """
+    # 1 orbital elements that the solution depends on
+    r0 = numpy.hypot(x, y)
+    eta = (x * u + y * v) / math.sqrt(gm)  # r0 * radial velocity / sqrt(gm)
+    alpha = 2 / r0 - (u * u + v * v) / gm  # 1 / semi-major axis; <= 0 if unbound
+    beta = 1 - alpha * r0
+
+    # 2 bound orbits repeat, so only the time since the last whole orbit matters
+    t = numpy.full(len(x), float(dt))
+    bound = alpha > 0
+    period = 2 * math.pi / numpy.sqrt(gm * alpha[bound] ** 3)
+    t[bound] = numpy.fmod(dt, period)
+    sqrt_gm_t = math.sqrt(gm) * t
+
+    # 3 solve the universal Kepler equation f(chi) = 0 for the universal anomaly chi
+    chi = numpy.where(bound, alpha * sqrt_gm_t, sqrt_gm_t / r0)
+    n = 5  # Laguerre's method is insensitive to this; 5 is the usual choice
+    for _ in range(max_iterations):
+        z = alpha * chi * chi
+        c2, c3 = stumpff(z)
+        f = eta * chi * chi * c2 + beta * chi**3 * c3 + r0 * chi - sqrt_gm_t
+        df = eta * chi * (1 - z * c3) + beta * chi * chi * c2 + r0  # = r(chi)
+        ddf = eta * (1 - z * c2) + beta * chi * (1 - z * c3)
+        root = numpy.sqrt(numpy.abs((n - 1) ** 2 * df * df - n * (n - 1) * f * ddf))
+        step = n * f / (df + numpy.copysign(root, df))
+        chi = chi - step
+        if (numpy.abs(step) <= tolerance * numpy.maximum(numpy.abs(chi), 1e-300)).all():
+            break
+
+    # 4 Lagrange coefficients give the new state as a combination of the old one
+    z = alpha * chi * chi
+    c2, c3 = stumpff(z)
+    f = 1 - chi * chi * c2 / r0
+    g = t - chi**3 * c3 / math.sqrt(gm)
+    new_x = f * x + g * u
+    new_y = f * y + g * v
+    r = numpy.hypot(new_x, new_y)
+    df = math.sqrt(gm) / (r * r0) * chi * (z * c3 - 1)
+    dg = 1 - chi * chi * c2 / r
+    return new_x, new_y, df * x + dg * u, df * y + dg * v
+
+
+def wisdom_holman_step(
+    x: numpy.array,
+    y: numpy.array,
+    u: numpy.array,
+    v: numpy.array,
+    mass: numpy.array,
+    dt: float,
+    accelerations: Accelerations,
+    max_perturbation: float = 0.1,
+    substeps: int = 10,
+) -> tuple[numpy.array, numpy.array, numpy.array, numpy.array, bool]:
+    """
+    Advance a system with one dominant mass by one step.
+
+    :param x, y, u, v: 1d arrays of positions and velocities
+    :param mass: 1d array of masses; the heaviest body is the central one. Tracers should be
+        given zero mass.
+    :param dt: step length
+    :param accelerations: calculates the bodies' gravitational accelerations
+    :param max_perturbation: fall back to direct integration if any body is pulled by the
+        others more than this fraction of the central body's pull
+    :param substeps: number of substeps of the direct integration
+    :return x, y, u, v: the new positions and velocities
+    :return direct: True if the step fell back to direct integration
+    """
+    central = int(numpy.argmax(mass))
+    others = numpy.arange(len(x)) != central
+    m0, m = mass[central], mass[others]
+    total_mass = mass.sum()
+    gm = GRAVITATIONAL_CONSTANT * m0
+
+    # 1 democratic heliocentric coordinates
+    centre_x, centre_y = x.dot(mass) / total_mass, y.dot(mass) / total_mass
+    centre_u, centre_v = u.dot(mass) / total_mass, v.dot(mass) / total_mass
+    qx, qy = x[others] - x[central], y[others] - y[central]
+    pu, pv = u[others] - centre_u, v[others] - centre_v
+
+    # 2 the split is only accurate if the central body dominates everywhere
+    acc_x, acc_y = accelerations(qx, qy, m)
+    central_acc = gm / (qx * qx + qy * qy)
+    if (numpy.hypot(acc_x, acc_y) > max_perturbation * central_acc).any():
+        return (*leapfrog(x, y, u, v, mass, dt, accelerations, substeps), True)
+
+    # 3 kick, jump, drift, jump, kick
+    pu, pv = pu + acc_x * dt / 2, pv + acc_y * dt / 2
+    jump = dt / 2 / m0
+    qx, qy = qx + jump * m.dot(pu), qy + jump * m.dot(pv)
+    qx, qy, pu, pv = kepler_drift(qx, qy, pu, pv, gm, dt)
+    qx, qy = qx + jump * m.dot(pu), qy + jump * m.dot(pv)
+    acc_x, acc_y = accelerations(qx, qy, m)
+    pu, pv = pu + acc_x * dt / 2, pv + acc_y * dt / 2
+
+    # 4 back to the automaton's coordinates. The centre of mass moves in a straight line.
+    new_x, new_y, new_u, new_v = (numpy.empty(len(x)) for _ in range(4))
+    new_x[central] = centre_x + centre_u * dt - qx.dot(m) / total_mass
+    new_y[central] = centre_y + centre_v * dt - qy.dot(m) / total_mass
+    new_u[central] = centre_u - pu.dot(m) / m0
+    new_v[central] = centre_v - pv.dot(m) / m0
+    new_x[others] = qx + new_x[central]
+    new_y[others] = qy + new_y[central]
+    new_u[others] = pu + centre_u
+    new_v[others] = pv + centre_v
+    return new_x, new_y, new_u, new_v, False
+
+
+def leapfrog(
+    x: numpy.array,
+    y: numpy.array,
+    u: numpy.array,
+    v: numpy.array,
+    mass: numpy.array,
+    dt: float,
+    accelerations: Accelerations,
+    substeps: int = 1,
+) -> tuple[numpy.array, numpy.array, numpy.array, numpy.array]:
+    """
+    Direct integration of all the bodies' mutual attraction: kick-drift-kick leapfrog, split
+    into equal substeps.
+    """
+    h = dt / substeps
+    acc_x, acc_y = accelerations(x, y, mass)
+    for _ in range(substeps):
+        u, v = u + acc_x * h / 2, v + acc_y * h / 2
+        x, y = x + u * h, y + v * h
+        acc_x, acc_y = accelerations(x, y, mass)
+        u, v = u + acc_x * h / 2, v + acc_y * h / 2
+    return x, y, u, v
@@ -0,0 +1,123 @@
+"""
+Optional accelerated kernels.
+
+If numba is installed, the force and collision loops are compiled to machine code. The compiled
+code is cached on disk (in __pycache__, or NUMBA_CACHE_DIR if that isn't writable), so only the
+very first launch pays for compilation. If numba isn't installed, we silently fall back to the
+numpy implementations in physics.py.
+
+numba itself is only imported the first time a compiled kernel is used, so that importing this
+module (and everything that depends on it) stays fast.
+"""
+
+import functools
+import importlib.util
+from types import ModuleType
+
+import numpy
+
+from . import physics
+
+AVAILABLE = importlib.util.find_spec("numba") is not None
+
+
+@functools.cache
+def _compiled() -> ModuleType:
+    from . import compiled
+
+    return compiled
+
+
+def set_num_threads(n: int):
+    """Limit the number of threads the compiled kernels use (e.g. one per process in a pool)"""
+    if AVAILABLE:
+        _compiled().numba.set_num_threads(n)
+
+
+def calculate_x_y_acceleration(
+    x: numpy.array,
+    y: numpy.array,
+    mass: numpy.array,
+    return_potential: bool = False,
+) -> tuple[numpy.array, numpy.array] | tuple[numpy.array, numpy.array, float]:
+    """
+    Same as physics.calculate_x_y_acceleration_symmetric, but compiled if possible. The
+    compiled version never builds any temporary arrays besides the per-thread accumulators,
+    and always calculates the potential energy because it is nearly free.
+    """
+    if not AVAILABLE:
+        return physics.calculate_x_y_acceleration_symmetric(
+            x, y, mass, return_potential=return_potential
+        )
+    n_chunks = _compiled().numba.get_num_threads()
+    acc_x, acc_y, potential = _compiled().x_y_acceleration(
+        _floats(x), _floats(y), _floats(mass), n_chunks
+    )
+    if return_potential:
+        return acc_x, acc_y, potential
+    return acc_x, acc_y
+
+
+def calculate_collisions(
+    x: numpy.array, y: numpy.array, radius: numpy.array
+) -> tuple[numpy.array, numpy.array]:
+    """
+    Same as physics.calculate_collisions, but compiled if possible.
+    """
+    if AVAILABLE:
+        return _compiled().collisions(_floats(x), _floats(y), _floats(radius))
+    return physics.calculate_collisions(x, y, radius)
+
+
+def calculate_swept_collisions(
+    x: numpy.array, y: numpy.array, u: numpy.array, v: numpy.array, radius: numpy.array
+) -> tuple[numpy.array, numpy.array, numpy.array]:
+    """
+    Same as physics.calculate_swept_collisions, but compiled if possible.
+    """
+    if not AVAILABLE:
+        return physics.calculate_swept_collisions(x, y, u, v, radius)
+    ii, jj, t = _compiled().swept_collisions(
+        _floats(x), _floats(y), _floats(u), _floats(v), _floats(radius)
+    )
+    order = numpy.argsort(t, kind="stable")
+    return ii[order], jj[order], t[order]
+
+
+def calculate_tracer_acceleration(
+    x: numpy.array,
+    y: numpy.array,
+    source_x: numpy.array,
+    source_y: numpy.array,
+    source_mass: numpy.array,
+) -> tuple[numpy.array, numpy.array]:
+    """
+    Same as physics.calculate_tracer_acceleration, but compiled if possible.
+    """
+    if AVAILABLE:
+        return _compiled().tracer_acceleration(
+            _floats(x), _floats(y), _floats(source_x), _floats(source_y), _floats(source_mass)
+        )
+    return physics.calculate_tracer_acceleration(x, y, source_x, source_y, source_mass)
+
+
+def calculate_tracer_hits(
+    x: numpy.array,
+    y: numpy.array,
+    source_x: numpy.array,
+    source_y: numpy.array,
+    source_radius: numpy.array,
+) -> numpy.array:
+    """
+    Same as physics.calculate_tracer_hits, but compiled if possible.
+    """
+    if AVAILABLE:
+        return _compiled().tracer_hits(
+            _floats(x), _floats(y), _floats(source_x), _floats(source_y), _floats(source_radius)
+        )
+    return physics.calculate_tracer_hits(x, y, source_x, source_y, source_radius)
+
+
+def _floats(array: numpy.array) -> numpy.array:
+    """numba compiles one version per dtype; make sure we always hit the same one"""
+    return numpy.ascontiguousarray(array, dtype=numpy.float64)
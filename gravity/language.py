@@ -1,5 +1,6 @@
 import re
 import random
+from functools import lru_cache
 
 
 STARTS = (
@@ -84,10 +85,34 @@ def generate_syllable() -> str:
     return random.choice(STARTS) + random.choice(ENDS)
 
 
+NAME_RX = re.compile(r"(?P<first>\w+)(-(?P<second>\w+))?(-(?P<number>\d+))?")
+
+
+@lru_cache(maxsize=4096)
+def parse_name(name: str) -> tuple[str, str, int]:
+    """
+    Split a hyphenated name like "Flarble-Bazbaz-10" into ("Flarble", "Bazbaz", 10).
+    Cached because the same names get merged over and over.
+    """
+    match = NAME_RX.search(name)
+    first = match.group("first") or ""
+    second = match.group("second") or ""
+    number = int(match.group("number") or 0)
+    return first, second, number
+
+
+def is_absorbed(massleft: float, massright: float) -> bool:
+    """
+    If one body is much more massive, the smaller body is just absorbed into the larger one and
+    the larger one keeps its name.
+    """
+    return max(massleft, massright) / min(massleft, massright) > 7
+
+
 def choose_new_name(left: str, right: str, massleft: float, massright: float) -> str:
     # if one body is much more massive, just continue using that name.
     # The smaller body is just absorbed into the larger one.
-    if max(massleft, massright) / min(massleft, massright) > 7:
+    if is_absorbed(massleft, massright):
         return left if massleft > massright else right
 
     # non-hyphenated names
@@ -99,17 +124,8 @@ def choose_new_name(left: str, right: str, massleft: float, massright: float) ->
             return f"{left}-{right}" if massleft >= massright else f"{right}-{left}"
 
     # merging hyphenated names
-    rx = re.compile(r"(?P<first>\w+)(-(?P<second>\w+))?(-(?P<number>\d+))?")
-
-    match = rx.search(left)
-    left1 = match.group("first") or ""
-    left2 = match.group("second") or ""
-    leftnum = int(match.group("number") or 0)
-
-    match = rx.search(right)
-    right1 = match.group("first") or ""
-    right2 = match.group("second") or ""
-    rightnum = int(match.group("number") or 0)
+    left1, left2, leftnum = parse_name(left)
+    right1, right2, rightnum = parse_name(right)
 
     x = len(left2) + len(right2) + leftnum + rightnum
     if massleft >= massright:
@@ -0,0 +1,190 @@
+"""
+A log of every merger, for working out afterwards which bodies became which. Events are stored
+as rows of a structured numpy array rather than as Python objects, so a long run with millions
+of mergers costs 80 bytes per merger and no garbage collection. The log can also be streamed to
+a file as it fills up, so memory use stays at one chunk however long the run:
+
+    log = MergeLog.load("mergers.bin")
+    log.merger_tree(body_id)  # every merger that went into the body
+    log.progenitors(body_id)  # the original bodies it is made of
+"""
+
+import os
+from pathlib import Path
+
+import numpy
+
+MERGE_EVENT = numpy.dtype(
+    [
+        ("iteration", numpy.int64),  # the iteration during which the bodies merged
+        ("parent1", numpy.int64),
+        ("parent2", numpy.int64),
+        ("mass1", numpy.float64),
+        ("mass2", numpy.float64),
+        ("x", numpy.float64),  # of the merged body
+        ("y", numpy.float64),
+        ("u", numpy.float64),
+        ("v", numpy.float64),
+        ("child", numpy.int64),  # ID of the merged body
+    ]
+)
+
+
+class MergeLog:
+    """
+    Append-only log of merge events. New events go into a preallocated chunk; when it is full,
+    it is either kept (in a list, so nothing is ever copied to grow the log) or, if the log has
+    a path, appended to that file and reused.
+    """
+
+    def __init__(self, chunk_size: int = 4096, path: Path | str = None):
+        """
+        :param chunk_size: number of events per chunk
+        :param path: if given, stream the events to this file, as raw MERGE_EVENT records. Any
+            existing file is overwritten.
+        """
+        self.chunk_size = chunk_size
+        self.path = Path(path) if path else None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(b"")
+        self._chunks: list[numpy.ndarray] = []  # full chunks, when not streaming
+        self._chunk = numpy.empty(chunk_size, dtype=MERGE_EVENT)
+        self._count = 0  # events in the current chunk
+        self._flushed = 0  # events in the file
+
+    def __len__(self) -> int:
+        return self._flushed + sum(map(len, self._chunks)) + self._count
+
+    def record(
+        self,
+        iteration: int,
+        parent1: int,
+        parent2: int,
+        mass1: float,
+        mass2: float,
+        x: float,
+        y: float,
+        u: float,
+        v: float,
+        child: int,
+    ):
+        """
+        Log one merger
+        """
+        self._chunk[self._count] = (iteration, parent1, parent2, mass1, mass2, x, y, u, v, child)
+        self._count += 1
+        if self._count == self.chunk_size:
+            self._next_chunk()
+
+    def record_many(self, iteration: int, **columns: numpy.array):
+        """
+        Log several mergers from the same iteration at once.
+
+        :param columns: 1d arrays, one for each field of MERGE_EVENT except iteration
+        """
+        n = len(columns["child"])
+        done = 0
+        while done < n:
+            space = min(self.chunk_size - self._count, n - done)
+            rows = self._chunk[self._count : self._count + space]
+            rows["iteration"] = iteration
+            for name, values in columns.items():
+                rows[name] = values[done : done + space]
+            self._count += space
+            done += space
+            if self._count == self.chunk_size:
+                self._next_chunk()
+
+    def _next_chunk(self):
+        if self.path:
+            self.flush()  # and reuse the chunk
+        else:
+            self._chunks.append(self._chunk)
+            self._chunk = numpy.empty(self.chunk_size, dtype=MERGE_EVENT)
+            self._count = 0
+
+    def flush(self):
+        """
+        Write the events that haven't been written yet to the file; e.g. at the end of a run
+        """
+        if self.path and self._count:
+            with self.path.open("ab") as file:
+                self._chunk[: self._count].tofile(file)
+            self._flushed += self._count
+            self._count = 0
+
+    def rollback(self, next_id: int):
+        """
+        Forget the mergers that created bodies with IDs from `next_id` on, e.g. because the
+        automaton has been restored to a snapshot from before them. IDs are handed out in
+        increasing order, so these are always the latest events.
+        """
+        events = self.events
+        keep = int(numpy.searchsorted(events["child"], next_id))
+        if keep == len(events):
+            return
+        if not self.path:
+            self._chunks = [events[:keep].copy()]
+            self._count = 0
+        elif keep >= self._flushed:
+            self._count = keep - self._flushed
+        else:
+            os.truncate(self.path, keep * MERGE_EVENT.itemsize)
+            self._flushed = keep
+            self._count = 0
+
+    @property
+    def events(self) -> numpy.ndarray:
+        """
+        All the events so far, oldest first, as one MERGE_EVENT array. If streaming, this reads
+        the file back.
+        """
+        parts = [*self._chunks, self._chunk[: self._count]]
+        if self.path and self._flushed:
+            parts.insert(0, numpy.fromfile(self.path, dtype=MERGE_EVENT))
+        return numpy.concatenate(parts)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "MergeLog":
+        """
+        Read a streamed log back into memory
+        """
+        log = cls()
+        log._chunks = [numpy.fromfile(path, dtype=MERGE_EVENT)]
+        return log
+
+    def merger_tree(self, body_id: int) -> numpy.ndarray:
+        """
+        The mergers that produced a body: the one that created it, the ones that created its
+        parents, and so on. Together they form a binary tree, with an edge from each event's
+        parents to its child.
+
+        :return: MERGE_EVENT array, in the order the mergers happened. Empty if the body was
+            never merged.
+        """
+        events = self.events
+        if not len(events):
+            return events
+        # each body is created by at most one merger, so the events can be looked up by child
+        by_child = numpy.argsort(events["child"], kind="stable")
+        children = events["child"][by_child]
+        found = []
+        frontier = numpy.array([body_id])
+        while len(frontier):
+            where = numpy.searchsorted(children, frontier).clip(max=len(children) - 1)
+            hit = children[where] == frontier
+            rows = by_child[where[hit]]
+            found.append(rows)
+            frontier = numpy.concatenate([events["parent1"][rows], events["parent2"][rows]])
+        return events[numpy.sort(numpy.concatenate(found))]
+
+    def progenitors(self, body_id: int) -> numpy.array:
+        """
+        :return: sorted IDs of the original (never merged) bodies that a body is made of. Just
+            the body itself if it was never merged.
+        """
+        tree = self.merger_tree(body_id)
+        parents = numpy.concatenate([tree["parent1"], tree["parent2"]])
+        leaves = parents[~numpy.isin(parents, tree["child"])]
+        return numpy.sort(leaves) if len(tree) else numpy.array([body_id])
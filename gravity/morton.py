@@ -0,0 +1,58 @@
+"""
+Morton (Z-order) codes. Interleaving the bits of a body's grid coordinates gives a single
+number, and sorting bodies by it puts bodies that are close in space close in memory too. The
+automaton can reorder its bodies like this every few iterations, so that the force, collision
+and drawing loops read neighbouring bodies from the same cache lines.
+"""
+
+import numpy
+
+BITS = 16  # per axis; enough to tell apart about 65000 positions across the world
+
+
+def spread_bits(values: numpy.array) -> numpy.array:
+    """
+    Move bit k of each value to bit 2k, leaving zeros in between.
+
+    :param values: 1d array of integers below 2**32
+    :return: 1d array of uint64
+    """
+    v = values.astype(numpy.uint64)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        v = (v | (v << numpy.uint64(shift))) & numpy.uint64(mask)
+    return v
+
+
+def morton_codes(x: numpy.array, y: numpy.array, bits: int = BITS) -> numpy.array:
+    """
+    Quantise the positions onto a 2**bits x 2**bits grid spanning the bodies' bounding box,
+    and interleave the grid coordinates' bits.
+
+    :param x, y: 1d arrays of positions
+    :return: 1d array of uint64 codes
+    """
+    if not len(x):
+        return numpy.zeros(0, dtype=numpy.uint64)
+    cells = 2**bits - 1
+
+    def quantise(values: numpy.array) -> numpy.array:
+        low = values.min()
+        extent = values.max() - low
+        scale = cells / extent if extent > 0 else 0.0
+        return numpy.rint((values - low) * scale)
+
+    return spread_bits(quantise(x)) | (spread_bits(quantise(y)) << numpy.uint64(1))
+
+
+def morton_order(x: numpy.array, y: numpy.array, bits: int = BITS) -> numpy.array:
+    """
+    :return: the permutation that sorts the bodies along the Z-order curve. Bodies in the same
+        grid cell keep their relative order.
+    """
+    return numpy.argsort(morton_codes(x, y, bits), kind="stable")
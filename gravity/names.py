@@ -0,0 +1,100 @@
+from .language import generate_syllable, choose_new_name, is_absorbed
+
+NO_NAME = 0  # name ID of the empty string; bodies with this ID aren't labelled
+
+
+class NameTable:
+    """
+    Shared string table for body names.
+
+    Bodies only store an integer name ID, so the automaton state can stay purely numeric. The
+    actual strings are only generated / merged when something asks for them -- usually the
+    frontend labelling a body on screen.
+
+    There are three kinds of entries:
+        - interned: a concrete string, e.g. "Earth"
+        - lazy: a name that will be generated with `generate_syllable` on first lookup
+        - merged: the name of the body formed by a collision, computed with `choose_new_name`
+          from the parents' names on first lookup
+    """
+
+    def __init__(self):
+        self._strings: list[str | None] = [""]  # None means "not materialized yet"
+        self._ids: dict[str, int] = {"": NO_NAME}
+        self._merges: dict[int, tuple[int, int, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, name_id: int) -> str:
+        name = self._strings[name_id]
+        if name is None:
+            name = self._materialize(name_id)
+        return name
+
+    def intern(self, name: str) -> int:
+        """
+        Get the ID of a concrete name, adding it to the table if it isn't there yet.
+        """
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = self._ids[name] = len(self._strings)
+            self._strings.append(name)
+        return name_id
+
+    def get_id(self, name: str | None) -> int:
+        """
+        Get the name ID for a new body. Pass None to have a name generated lazily.
+        """
+        return self.reserve() if name is None else self.intern(name)
+
+    def reserve(self) -> int:
+        """
+        Get a new ID for a name that will be generated when it is first looked up.
+        """
+        self._strings.append(None)
+        return len(self._strings) - 1
+
+    def merge(self, left: int, right: int, massleft: float, massright: float) -> int:
+        """
+        Get the name ID for the body formed by merging two bodies. If one body absorbs the other,
+        or one of them is unnamed, we can reuse an existing ID without creating a new entry.
+        """
+        if is_absorbed(massleft, massright):
+            return left if massleft > massright else right
+        if left == NO_NAME or right == NO_NAME:
+            return left or right
+        name_id = self.reserve()
+        self._merges[name_id] = (left, right, massleft, massright)
+        return name_id
+
+    def is_materialized(self, name_id: int) -> bool:
+        return self._strings[name_id] is not None
+
+    def _materialize(self, name_id: int) -> str:
+        """
+        Resolve a lazy or merged entry. A big body can be the result of thousands of merges, so
+        walk the merge history with an explicit stack rather than recursing.
+        """
+        stack = [name_id]
+        while stack:
+            top = stack[-1]
+            if self._strings[top] is not None:
+                stack.pop()
+                continue
+            merge = self._merges.get(top)
+            if merge is None:
+                self._strings[top] = generate_syllable()
+                stack.pop()
+                continue
+            left, right, massleft, massright = merge
+            pending = [ii for ii in (left, right) if self._strings[ii] is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            self._strings[top] = choose_new_name(
+                self._strings[left], self._strings[right], massleft, massright
+            )
+            del self._merges[top]
+            stack.pop()
+        return self._strings[name_id]
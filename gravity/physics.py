@@ -4,16 +4,19 @@ from dataclasses import dataclass
 
 from . import constants
 from .constants import GRAVITATIONAL_CONSTANT
-from .vector import Vector2D
 
 
-@dataclass
+@dataclass(slots=True)
 class Body:
     mass: float  # kg
     radius: float  # m
+    x: float = 0  # m
+    y: float = 0  # m
     u: float = 0  # m/s
     v: float = 0  # m/s
-    name: str = ""
+    name_id: int = 0  # index into the automaton's NameTable
+    id: int = 0  # persistent across iterations; assigned by the automaton
+    tracer: bool = False  # feels gravity, but doesn't exert it or merge
 
 
 def euclidian_distance(xy1, xy2) -> float:
@@ -22,9 +25,9 @@ def euclidian_distance(xy1, xy2) -> float:
     """
     x1, y1 = xy1
     x2, y2 = xy2
-    delta_x = abs(x2 - x1)
-    delta_y = abs(y2 - y1)
-    return math.sqrt(delta_x**2 + delta_y**2)
+    delta_x = x2 - x1
+    delta_y = y2 - y1
+    return math.sqrt(delta_x * delta_x + delta_y * delta_y)
 
 
 def attraction_force(xy1, xy2, mass1: float, mass2: float) -> float:
@@ -54,32 +57,23 @@ def gravitational_attraction(body1: Body, xy1, body2: Body, xy2):
     2. Calculate the resulting acceleration for each object based on its mass
     3. Calculate the x/y components of the acceleration for each object
     4. Adjust each objects u/v according to its acceleration
-    """
 
-    # 1
-    force = attraction_force(xy1, xy2, body1.mass, body2.mass)
-    # 2
-    acc1 = newtonian_acceleration(body1, force)
-    acc2 = newtonian_acceleration(body2, force)
-    # 3
+    Steps 1-3 are folded together: the x component of body1's acceleration is
+        G * m2 / R**2 * dx / R = dx * m2 * G / R**3
+    so no force or unit vector objects need to be created.
+    """
     x1, y1 = xy1
     x2, y2 = xy2
-    dx = x2 - x1
+    dx = x2 - x1  # from body1 to body2
     dy = y2 - y1
-    vector = Vector2D(dx, dy)  # vector from body1 to body2
-    unit = vector.unit()
-    acc1_x = acc1 * unit.dx
-    acc1_y = acc1 * unit.dy
-    vector = vector.reverse()
-    unit = vector.unit()
-    acc2_x = acc2 * unit.dx
-    acc2_y = acc2 * unit.dy
+    dist2 = dx * dx + dy * dy
+    strength = GRAVITATIONAL_CONSTANT / (dist2 * math.sqrt(dist2))  # G / R**3
 
     # 4
-    body1.u += acc1_x
-    body1.v += acc1_y
-    body2.u += acc2_x
-    body2.v += acc2_y
+    body1.u += dx * strength * body2.mass
+    body1.v += dy * strength * body2.mass
+    body2.u -= dx * strength * body1.mass
+    body2.v -= dy * strength * body1.mass
 
 
 # ================== matrix algebra solution =========================
@@ -138,15 +132,18 @@ def calculate_x_y_acceleration(
     x: numpy.array,
     y: numpy.array,
     mass: numpy.array,
-) -> tuple[numpy.array, numpy.array]:
+    return_potential: bool = False,
+) -> tuple[numpy.array, numpy.array] | tuple[numpy.array, numpy.array, float]:
     """
     Given the x/y coordinates and masses of a set of bodies, calculate the x/y acceleration of
     the bodies due to gravitational attraction.
     :param x: 1d array of x coordinates
     :param y: 1d array of y coordinates
     :param mass: 1d array of masses
+    :param return_potential: also return the total potential energy
     :return acc_x: 1d array of x accelerations
     :return acc_y: 1d array of y accelerations
+    :return potential: total potential energy (only if return_potential)
     """
     DX, DY, DIST = calculate_distances(x, y)
     FORCE = calculate_attraction_forces(mass, DIST)
@@ -157,4 +154,239 @@ def calculate_x_y_acceleration(
     ACC_Y = ACCELERATION * UNIT_Y
     acc_x = ACC_X.sum(axis=1)
     acc_y = ACC_Y.sum(axis=1)
+    if return_potential:
+        # F * R = G * m1 * m2 / R; every pair appears twice in the matrix
+        potential = -0.5 * (FORCE * DIST).sum()
+        return acc_x, acc_y, potential
+    return acc_x, acc_y
+
+
+def calculate_x_y_acceleration_symmetric(
+    x: numpy.array,
+    y: numpy.array,
+    mass: numpy.array,
+    tile_size: int = 512,
+    return_potential: bool = False,
+) -> tuple[numpy.array, numpy.array] | tuple[numpy.array, numpy.array, float]:
+    """
+    Same result as calculate_x_y_acceleration, but using Newton's third law: the force on body i
+    due to body j is equal and opposite to the force on body j due to body i. The bodies are
+    split into tiles, and only the upper triangle of tile pairs is visited. Each tile pair
+    computes its forces once, and adds them to one tile and subtracts them from the other.
+    Memory use is bounded by tile_size**2 instead of N**2.
+
+    :param x: 1d array of x coordinates
+    :param y: 1d array of y coordinates
+    :param mass: 1d array of masses
+    :param tile_size: number of bodies per tile
+    :param return_potential: also return the total potential energy
+    :return acc_x: 1d array of x accelerations
+    :return acc_y: 1d array of y accelerations
+    :return potential: total potential energy (only if return_potential)
+    """
+    n = len(x)
+    acc_x = numpy.zeros(n)
+    acc_y = numpy.zeros(n)
+    potential = 0.0
+    for start_i in range(0, n, tile_size):
+        i = slice(start_i, start_i + tile_size)
+        for start_j in range(start_i, n, tile_size):
+            j = slice(start_j, start_j + tile_size)
+            DX = x[j].reshape(1, -1) - x[i].reshape(-1, 1)  # DX[a, b] is from i[a] to j[b]
+            DY = y[j].reshape(1, -1) - y[i].reshape(-1, 1)
+            DIST2 = DX**2 + DY**2
+            DIST2[DIST2 == 0] = numpy.inf  # self, or coincident bodies: no force
+            INVERSE_DIST = 1 / numpy.sqrt(DIST2)
+            if start_i == start_j:
+                INVERSE_DIST = numpy.triu(INVERSE_DIST, k=1)  # each pair within the tile once
+            STRENGTH = GRAVITATIONAL_CONSTANT * INVERSE_DIST**3  # G / R**3
+            FX = DX * STRENGTH
+            FY = DY * STRENGTH
+            acc_x[i] += FX.dot(mass[j])
+            acc_y[i] += FY.dot(mass[j])
+            acc_x[j] -= mass[i].dot(FX)
+            acc_y[j] -= mass[i].dot(FY)
+            if return_potential:
+                potential -= GRAVITATIONAL_CONSTANT * mass[i].dot(INVERSE_DIST).dot(mass[j])
+    if return_potential:
+        return acc_x, acc_y, potential
+    return acc_x, acc_y
+
+
+def calculate_collisions(
+    x: numpy.array, y: numpy.array, radius: numpy.array
+) -> tuple[numpy.array, numpy.array]:
+    """
+    Find all pairs of overlapping bodies.
+
+    :param x: 1d array of x coordinates
+    :param y: 1d array of y coordinates
+    :param radius: 1d array of radii
+    :return ii, jj: 1d arrays of indices where body ii[k] overlaps body jj[k], and ii[k] < jj[k]
+    """
+    DX, DY, DIST = calculate_distances(x, y)
+    R1R2 = radius.reshape(-1, 1) + radius.reshape(1, -1)
+    COLLIDING = numpy.triu(DIST < R1R2, k=1)  # upper triangle excludes self and duplicates
+    ii, jj = COLLIDING.nonzero()
+    return ii, jj
+
+
+def contact_time(dx: float, dy: float, du: float, dv: float, distance: float) -> float | None:
+    """
+    Find when two bodies first touched during the last step. The bodies moved in straight lines
+    over the step, so their separation at time t (0 = start of the step, 1 = now) is
+        (dx, dy) - (1 - t) * (du, dv)
+    and they touch when its length equals `distance`. That's a quadratic in t.
+
+    :param dx, dy: separation now
+    :param du, dv: relative velocity over the step
+    :param distance: separation at which the bodies touch (the sum of their radii)
+    :return: the earliest t in [0, 1] at which they touched, or None if they didn't
+    """
+    x0 = dx - du  # separation at the start of the step
+    y0 = dy - dv
+    c = x0**2 + y0**2 - distance**2
+    if c <= 0:
+        return 0.0  # already touching at the start
+    a = du**2 + dv**2
+    b = 2 * (x0 * du + y0 * dv)
+    discriminant = b**2 - 4 * a * c
+    if a == 0 or b >= 0 or discriminant < 0:
+        return None  # not approaching, or passing wide
+    t = (-b - math.sqrt(discriminant)) / (2 * a)
+    return t if t <= 1 else None
+
+
+def calculate_swept_collisions(
+    x: numpy.array, y: numpy.array, u: numpy.array, v: numpy.array, radius: numpy.array
+) -> tuple[numpy.array, numpy.array, numpy.array]:
+    """
+    Find all pairs of bodies that touched at any time during the last step, not just the ones
+    that overlap now. Fast bodies can pass right through each other in one step, which
+    calculate_collisions misses. See contact_time.
+
+    :param x, y: 1d arrays of coordinates now (at the end of the step)
+    :param u, v: 1d arrays of velocities over the step
+    :param radius: 1d array of radii
+    :return ii, jj, t: 1d arrays; body ii[k] first touched body jj[k] at time t[k] in [0, 1],
+        and ii[k] < jj[k]. Sorted by t.
+    """
+    DX, DY, _ = calculate_distances(x, y)
+    DU, DV, _ = calculate_distances(u, v)
+    X0 = DX - DU
+    Y0 = DY - DV
+    R1R2 = radius.reshape(-1, 1) + radius.reshape(1, -1)
+    A = DU**2 + DV**2
+    B = 2 * (X0 * DU + Y0 * DV)
+    C = X0**2 + Y0**2 - R1R2**2
+    DISCRIMINANT = B**2 - 4 * A * C
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        T = (-B - numpy.sqrt(DISCRIMINANT)) / (2 * A)
+    T = numpy.where(C <= 0, 0.0, T)
+    COLLIDING = (C <= 0) | ((A > 0) & (B < 0) & (DISCRIMINANT >= 0) & (T <= 1))
+    ii, jj = numpy.triu(COLLIDING, k=1).nonzero()
+    t = T[ii, jj]
+    order = numpy.argsort(t, kind="stable")
+    return ii[order], jj[order], t[order]
+
+
+def calculate_batched_x_y_acceleration(
+    x: numpy.ndarray,
+    y: numpy.ndarray,
+    mass: numpy.ndarray,
+    return_potential: bool = False,
+) -> tuple[numpy.ndarray, numpy.ndarray] | tuple[numpy.ndarray, numpy.ndarray, numpy.array]:
+    """
+    Same as calculate_x_y_acceleration, but for S independent sets of N bodies at once. Bodies
+    only attract bodies in the same set. Pad sets with fewer bodies with zero-mass bodies.
+
+    :param x: 2d array of x coordinates where x[s, i] is body i in set s
+    :param y: 2d array of y coordinates
+    :param mass: 2d array of masses
+    :param return_potential: also return the potential energy of each set
+    :return acc_x: 2d array of x accelerations
+    :return acc_y: 2d array of y accelerations
+    :return potential: 1d array of potential energy per set (only if return_potential)
+    """
+    DX = x[:, numpy.newaxis, :] - x[:, :, numpy.newaxis]  # DX[s, i, j] is from i to j
+    DY = y[:, numpy.newaxis, :] - y[:, :, numpy.newaxis]
+    DIST2 = DX**2 + DY**2
+    DIST2[DIST2 == 0] = numpy.inf  # self, or coincident bodies: no force
+    INVERSE_DIST = 1 / numpy.sqrt(DIST2)
+    STRENGTH = GRAVITATIONAL_CONSTANT * INVERSE_DIST**3 * mass[:, numpy.newaxis, :]
+    acc_x = (DX * STRENGTH).sum(axis=2)
+    acc_y = (DY * STRENGTH).sum(axis=2)
+    if return_potential:
+        # every pair appears twice in the matrix
+        potential = (
+            -0.5 * GRAVITATIONAL_CONSTANT * numpy.einsum("si,sij,sj->s", mass, INVERSE_DIST, mass)
+        )
+        return acc_x, acc_y, potential
     return acc_x, acc_y
+
+
+def calculate_tracer_acceleration(
+    x: numpy.array,
+    y: numpy.array,
+    source_x: numpy.array,
+    source_y: numpy.array,
+    source_mass: numpy.array,
+    tile_size: int = 4096,
+) -> tuple[numpy.array, numpy.array]:
+    """
+    Calculate the x/y acceleration of N tracers due to M massive source bodies. The tracers
+    don't attract anything, so this is O(N * M) instead of O((N + M)**2). Tracers are processed
+    in tiles so memory use is bounded by tile_size * M.
+
+    :param x: 1d array of tracer x coordinates
+    :param y: 1d array of tracer y coordinates
+    :param source_x: 1d array of source x coordinates
+    :param source_y: 1d array of source y coordinates
+    :param source_mass: 1d array of source masses
+    :param tile_size: number of tracers per tile
+    :return acc_x: 1d array of tracer x accelerations
+    :return acc_y: 1d array of tracer y accelerations
+    """
+    acc_x = numpy.zeros(len(x))
+    acc_y = numpy.zeros(len(x))
+    for start in range(0, len(x), tile_size):
+        i = slice(start, start + tile_size)
+        DX = source_x.reshape(1, -1) - x[i].reshape(-1, 1)  # DX[a, b] is from tracer a to source b
+        DY = source_y.reshape(1, -1) - y[i].reshape(-1, 1)
+        DIST2 = DX**2 + DY**2
+        DIST2[DIST2 == 0] = numpy.inf  # tracer exactly on a source: no force
+        STRENGTH = GRAVITATIONAL_CONSTANT / (DIST2 * numpy.sqrt(DIST2))  # G / R**3
+        acc_x[i] = (DX * STRENGTH).dot(source_mass)
+        acc_y[i] = (DY * STRENGTH).dot(source_mass)
+    return acc_x, acc_y
+
+
+def calculate_tracer_hits(
+    x: numpy.array,
+    y: numpy.array,
+    source_x: numpy.array,
+    source_y: numpy.array,
+    source_radius: numpy.array,
+    tile_size: int = 4096,
+) -> numpy.array:
+    """
+    Find tracers that are inside a source body.
+
+    :param x: 1d array of tracer x coordinates
+    :param y: 1d array of tracer y coordinates
+    :param source_x: 1d array of source x coordinates
+    :param source_y: 1d array of source y coordinates
+    :param source_radius: 1d array of source radii
+    :param tile_size: number of tracers per tile
+    :return: 1d array with the index of a source each tracer is inside, or -1
+    """
+    hits = numpy.full(len(x), -1)
+    if not len(source_x):
+        return hits
+    for start in range(0, len(x), tile_size):
+        i = slice(start, start + tile_size)
+        DX = source_x.reshape(1, -1) - x[i].reshape(-1, 1)
+        DY = source_y.reshape(1, -1) - y[i].reshape(-1, 1)
+        INSIDE = DX**2 + DY**2 < source_radius.reshape(1, -1) ** 2
+        hits[i] = numpy.where(INSIDE.any(axis=1), INSIDE.argmax(axis=1), -1)
+    return hits
@@ -0,0 +1,155 @@
+"""
+Capture a cProfile (and optionally tracemalloc) profile of the next N frames of a running game
+or headless simulation, so slow frames can be investigated without restarting under an
+external profiler. Each capture writes two files to the output directory:
+
+    profile-<first frame>.pstats  for `python -m pstats` or snakeviz
+    profile-<first frame>.txt     the slowest frames, the functions with the most cumulative
+                                  time, and the lines that allocated the most memory
+"""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+
+class Profiler:
+    """
+    Call `tick` once per frame. `start` profiles the next `frames` frames, then writes the
+    results and stops by itself; `stop` ends a capture early.
+
+    With `slower_than` set, captures run back to back until stopped, and are only written if
+    one of their frames took longer than that. That way a long run can be left profiling, and
+    only the spikes end up on disk.
+    """
+
+    frame: int = 0  # number of ticks so far
+    _profile: cProfile.Profile | None = None
+
+    def __init__(
+        self,
+        directory: Path | str = "profiles",
+        frames: int = 100,
+        allocations: bool = False,
+        slower_than: float = None,
+        top: int = 25,
+    ):
+        """
+        :param directory: where to write the results; created if needed
+        :param frames: number of frames per capture
+        :param allocations: also track memory allocations. This slows everything down a lot
+            more than cProfile does.
+        :param slower_than: only keep captures with a frame slower than this many seconds
+        :param top: number of functions and allocation sites to list in the summary
+        """
+        self.directory = Path(directory)
+        self.frames = frames
+        self.allocations = allocations
+        self.slower_than = slower_than
+        self.top = top
+        self.written: list[Path] = []  # pstats files, oldest first
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    @property
+    def frames_left(self) -> int:
+        return self.frames - len(self._frame_times) if self.active else 0
+
+    def start(self, allocations: bool = None):
+        """
+        :param allocations: override the `allocations` setting for this capture
+        """
+        if self.active:
+            return
+        self._allocations = self.allocations if allocations is None else allocations
+        # if something else is already tracing, share its traces, and leave it running after
+        self._started_tracing = self._allocations and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._first_frame = self.frame
+        self._frame_times: list[float] = []
+        self._frame_started = time.perf_counter()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self) -> Path | None:
+        """
+        End the capture, and write the results unless they are filtered out by `slower_than`.
+        :return: the pstats file, if one was written
+        """
+        if not self.active:
+            return None
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot() if self._allocations else None
+        if self._started_tracing:
+            tracemalloc.stop()
+        profile, self._profile = self._profile, None
+        slowest = max(self._frame_times, default=0.0)
+        if self.slower_than is not None and slowest <= self.slower_than:
+            return None
+        return self._write(profile, snapshot)
+
+    def toggle(self, allocations: bool = None):
+        if self.active:
+            self.stop()
+        else:
+            self.start(allocations)
+
+    def tick(self):
+        """Call once per frame"""
+        self.frame += 1
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self._frame_times.append(now - self._frame_started)
+        self._frame_started = now
+        if len(self._frame_times) >= self.frames:
+            self.stop()
+            if self.slower_than is not None:
+                self.start(allocations=self._allocations)
+
+    def _write(self, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot | None) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = self.directory / f"profile-{self._first_frame:07d}"
+        profile.dump_stats(stem.with_suffix(".pstats"))
+
+        summary = io.StringIO()
+        frame_times = self._frame_times
+        summary.write(
+            f"frames {self._first_frame}-{self._first_frame + len(frame_times) - 1}: "
+            f"total {sum(frame_times):.3f}s\nslowest frames:\n"
+        )
+        slowest = sorted(range(len(frame_times)), key=frame_times.__getitem__, reverse=True)
+        for index in slowest[:10]:
+            summary.write(f"    frame {self._first_frame + index}: {frame_times[index]:.4f}s\n")
+        summary.write("\n")
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        if snapshot is not None:
+            summary.write(format_allocations(snapshot, self.top))
+        stem.with_suffix(".txt").write_text(summary.getvalue())
+
+        self.written.append(stem.with_suffix(".pstats"))
+        return self.written[-1]
+
+
+def format_allocations(snapshot: tracemalloc.Snapshot, top: int = 25) -> str:
+    """
+    The lines that allocated the most memory that was still in use when the snapshot was taken
+    """
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    statistics = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in statistics)
+    lines = [f"top allocations ({total / 1024:.1f} KiB in {len(statistics)} places):"]
+    for stat in statistics[:top]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"    {stat.size / 1024:9.1f} KiB {stat.count:7d} blocks  "
+            f"{frame.filename}:{frame.lineno}"
+        )
+    return "\n".join(lines) + "\n"
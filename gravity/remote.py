@@ -0,0 +1,537 @@
+"""
+Run one simulation and watch it from any number of viewer processes:
+
+    python -m gravity.remote serve --address 127.0.0.1:8765 --bodies 2000
+    python -m gravity.remote view --address 127.0.0.1:8765
+
+The SnapshotServer iterates a Backend in an asyncio loop and streams compact binary snapshots
+of it to every connected client. Each client is served by its own task, which only packs the
+newest state when the client is ready for it, at most `max_fps` times per second. Iterations
+that happen in between are skipped for that client, so a slow client gets fewer frames but
+never slows down the simulation or the other clients.
+
+On the client side, RemoteAutomaton mirrors the latest snapshot and implements enough of the
+Automaton protocol for GravityFrontend to draw it, and RemoteBackend plugs it into a Viewer.
+
+Wire format: every message is a 1-byte kind and a 4-byte payload length, followed by the
+payload. All numbers are little-endian.
+    HELLO (client -> server): float32 frames per second the client wants; 0 = server maximum
+    NAME_REQUEST (client -> server): uint32 count, then uint32 name IDs
+    NAMES (server -> client): uint32 count, then per name: uint32 name ID, uint32 byte length,
+        utf-8 bytes
+    FRAME: uint64 iteration, float64 total mass, uint32 number of bodies N, then the arrays
+        id (uint32), name_id (uint32), x, y, u, v, mass, radius (float32), tracer (uint8)
+Frames only carry name IDs. A client asks for a name the first time it looks it up, i.e. when
+it labels the body on screen, so the server's NameTable still only generates the names that
+somebody actually looks at.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import signal
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import numpy
+
+from . import physics
+from .automaton import BodyArrays, BodyID
+from .backend import Backend
+from .diagnostics import Telemetry
+from .names import NO_NAME
+from .spatial import Rect, SpatialIndex
+from .trails import Trails
+
+Address = tuple[str, int] | str | Path  # (host, port) for TCP, or the path of a Unix socket
+
+HELLO = b"H"
+NAME_REQUEST = b"R"
+NAMES = b"N"
+FRAME = b"F"
+MESSAGE_HEADER = struct.Struct("<cI")
+HELLO_PAYLOAD = struct.Struct("<f")
+FRAME_HEADER = struct.Struct("<QdI")
+NAME_HEADER = struct.Struct("<II")
+FIELDS = [  # BodyArrays field, wire dtype
+    ("id", "<u4"),
+    ("name_id", "<u4"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("u", "<f4"),
+    ("v", "<f4"),
+    ("mass", "<f4"),
+    ("radius", "<f4"),
+    ("tracer", "u1"),
+]
+DTYPES = dict(id=int, name_id=int, tracer=bool)  # in BodyArrays; the rest are floats
+
+
+class Frame(NamedTuple):
+    iteration: int
+    total_mass: float
+    bodies: BodyArrays
+
+
+def pack_message(kind: bytes, payload: bytes) -> bytes:
+    return MESSAGE_HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    """
+    :return kind, payload: of the next message
+    :raise asyncio.IncompleteReadError: if the connection is closed
+    """
+    kind, length = MESSAGE_HEADER.unpack(await reader.readexactly(MESSAGE_HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+def pack_frame(iteration: int, total_mass: float, bodies: BodyArrays) -> bytes:
+    header = FRAME_HEADER.pack(iteration, total_mass, len(bodies.id))
+    arrays = [getattr(bodies, field).astype(dtype).tobytes() for field, dtype in FIELDS]
+    return b"".join([header, *arrays])
+
+
+def unpack_frame(payload: bytes) -> Frame:
+    iteration, total_mass, n = FRAME_HEADER.unpack_from(payload)
+    offset = FRAME_HEADER.size
+    arrays = {}
+    for field, dtype in FIELDS:
+        wire = numpy.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+        offset += wire.nbytes
+        # back to the dtypes the automata use, so consumers can't tell the difference
+        arrays[field] = wire.astype(DTYPES.get(field, float))
+    return Frame(iteration, total_mass, BodyArrays(**arrays))
+
+
+def pack_names(names: dict[int, str]) -> bytes:
+    parts = [struct.pack("<I", len(names))]
+    for name_id, name in names.items():
+        encoded = name.encode()
+        parts += [NAME_HEADER.pack(name_id, len(encoded)), encoded]
+    return b"".join(parts)
+
+
+def pack_name_ids(name_ids: list[int]) -> bytes:
+    return struct.pack("<I", len(name_ids)) + numpy.array(name_ids, dtype="<u4").tobytes()
+
+
+def unpack_name_ids(payload: bytes) -> list[int]:
+    (count,) = struct.unpack_from("<I", payload)
+    return numpy.frombuffer(payload, dtype="<u4", count=count, offset=4).tolist()
+
+
+def unpack_names(payload: bytes) -> dict[int, str]:
+    (count,) = struct.unpack_from("<I", payload)
+    offset = 4
+    names = {}
+    for _ in range(count):
+        name_id, length = NAME_HEADER.unpack_from(payload, offset)
+        offset += NAME_HEADER.size
+        names[name_id] = payload[offset : offset + length].decode()
+        offset += length
+    return names
+
+
+async def start_server(handler, address: Address) -> asyncio.AbstractServer:
+    if isinstance(address, tuple):
+        host, port = address
+        return await asyncio.start_server(handler, host, port)
+    return await asyncio.start_unix_server(handler, address)
+
+
+async def open_connection(address: Address) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if isinstance(address, tuple):
+        host, port = address
+        return await asyncio.open_connection(host, port)
+    return await asyncio.open_unix_connection(address)
+
+
+def parse_address(text: str) -> Address:
+    """'127.0.0.1:8765' -> ('127.0.0.1', 8765); anything else is a Unix socket path"""
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return text
+
+
+def positive_float(text: str) -> float:
+    """argparse type for frame rates and the like"""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, not {text}")
+    return value
+
+
+class SnapshotServer:
+    """
+    Iterates a Backend and streams snapshots of its automaton to clients. See the module
+    docstring.
+    """
+
+    def __init__(self, backend: Backend, max_fps: float = 30.0):
+        """
+        :param backend: the simulation to run
+        :param max_fps: upper limit on the frames per second sent to each client
+        :raise ValueError: if max_fps isn't positive
+        """
+        if not max_fps > 0:
+            raise ValueError(f"max_fps must be greater than 0, not {max_fps}")
+        self.backend = backend
+        self.max_fps = max_fps
+        self.frames_sent = 0
+        self._frame: tuple[int, bytes] | None = None  # version, payload
+        self._new_version = asyncio.Event()
+        self._clients: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def frame(self) -> tuple[int, bytes]:
+        """
+        Pack the current state of the automaton. Packing happens at most once per version, no
+        matter how many clients want it, and only when a client is ready for it.
+
+        :return version, payload:
+        """
+        automaton = self.backend.automaton
+        if self._frame is None or self._frame[0] != automaton.version:
+            payload = pack_frame(automaton.iteration, automaton.total_mass, automaton.arrays())
+            self._frame = (automaton.version, payload)
+        return self._frame
+
+    async def serve(self, address: Address, steps: int = None):
+        """
+        Listen for clients on the address, and run the simulation.
+
+        :param steps: stop after this many iterations; None runs forever
+        """
+        server = await start_server(self.handle_client, address)
+        async with server:
+            try:
+                await self.run(steps)
+            finally:
+                await self.disconnect()
+
+    async def disconnect(self):
+        """
+        Drop all clients, and wait for their tasks to finish.
+        """
+        for writer in self._clients.values():
+            writer.transport.abort()
+        self._new_version.set()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+
+    async def run(self, steps: int = None):
+        """
+        Iterate the backend, letting the client tasks run between iterations.
+        """
+        iteration = 0
+        while steps is None or iteration < steps:
+            self.backend.iterate()
+            iteration += 1
+            self._new_version.set()
+            self._new_version = asyncio.Event()
+            await asyncio.sleep(0)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Send the client the newest frame whenever it has finished receiving the last one and
+        its frame interval has passed, and answer its name requests in between.
+        """
+        self._clients[asyncio.current_task()] = writer
+        requests = None
+        try:
+            kind, payload = await read_message(reader)
+            (fps,) = HELLO_PAYLOAD.unpack(payload) if kind == HELLO else (0,)
+            interval = 1 / min(fps if fps > 0 else self.max_fps, self.max_fps)
+            requests = asyncio.create_task(self.answer_name_requests(reader, writer))
+            sent_version = None
+            while True:
+                if self.backend.automaton.version == sent_version:
+                    await self._new_version.wait()
+                if writer.is_closing():
+                    break  # disconnected by the server
+                started = time.perf_counter()
+                sent_version, frame = self.frame()
+                writer.write(pack_message(FRAME, frame))
+                await writer.drain()  # a slow client only holds up its own task
+                self.frames_sent += 1
+                await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client went away
+        finally:
+            if requests:
+                requests.cancel()
+            self._clients.pop(asyncio.current_task())
+            writer.close()
+
+    async def answer_name_requests(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """
+        Send the client the names it asks for. Looking them up is what makes the NameTable
+        generate them, so names nobody asks for are never generated.
+        """
+        with contextlib.suppress(asyncio.IncompleteReadError, ConnectionError):
+            while True:
+                kind, payload = await read_message(reader)
+                if kind != NAME_REQUEST:
+                    continue
+                names = self.backend.automaton.names
+                name_ids = [name_id for name_id in unpack_name_ids(payload) if name_id < len(names)]
+                writer.write(pack_message(NAMES, pack_names({i: names[i] for i in name_ids})))
+
+
+class RemoteNames:
+    """
+    The client's copy of the server's name table. A name that hasn't arrived yet reads as "".
+    The first lookup of a missing name calls `request`, which should arrange for
+    `take_wanted` to be called soon, so the names looked up in one frame go in one request.
+    """
+
+    def __init__(self, request: Callable[[], None]):
+        self._request = request
+        self._names: dict[int, str] = {NO_NAME: ""}
+        self._wanted: set[int] = set()  # looked up, but not requested yet
+        self._requested: set[int] = set()
+        self._lock = threading.Lock()  # looked up in the main thread, requested in the other
+
+    def __getitem__(self, name_id: int) -> str:
+        name = self._names.get(name_id)
+        if name is not None:
+            return name
+        with self._lock:
+            request = not self._wanted and name_id not in self._requested
+            if name_id not in self._requested:
+                self._wanted.add(name_id)
+        if request:
+            self._request()
+        return ""
+
+    def update(self, names: dict[int, str]):
+        self._names.update(names)
+
+    def take_wanted(self) -> list[int]:
+        """
+        :return: the name IDs to request from the server; each one is only returned once
+        """
+        with self._lock:
+            wanted, self._wanted = self._wanted, set()
+            self._requested |= wanted
+        return sorted(wanted)
+
+
+class RemoteAutomaton:
+    """
+    Read-only mirror of an automaton that is running in a SnapshotServer. A background thread
+    receives frames; `iterate` swaps in the newest one, skipping any that arrived in between.
+    Positions are only float32 precision, which is plenty for drawing.
+    """
+
+    contents: BodyArrays
+    total_mass: float = 1
+    iteration: int = 0
+    version: int = 0
+
+    def __init__(self, address: Address, max_fps: float = 0):
+        """
+        :param address: where the server is listening
+        :param max_fps: frames per second to ask the server for; 0 = as many as it allows
+        """
+        self.address = address
+        self.max_fps = max_fps
+        self.names = RemoteNames(self._request_names)  # filled in as the server sends them
+        self.telemetry = Telemetry(every=0)  # the server keeps the telemetry
+        self.contents = BodyArrays(
+            **{field: numpy.zeros(0, DTYPES.get(field, float)) for field in BodyArrays._fields}
+        )
+        self.connected = False
+        self._latest: Frame | None = None  # received, but not swapped in yet
+        self._lock = threading.Lock()
+        self._received = threading.Event()  # set by the first frame, or by an error
+        self._error: Exception | None = None  # that stopped the background thread
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._spatial_index = SpatialIndex()
+
+    def connect(self, timeout: float = 10.0):
+        """
+        Start receiving, and wait until the first frame has been swapped in.
+        :raise ConnectionError: if no frame arrived in time
+        :raise Exception: whatever stopped the background thread before the first frame, e.g.
+            FileNotFoundError if there is no server at the address
+        """
+        self._thread.start()
+        if not self._received.wait(timeout):
+            raise ConnectionError(f"no frames from {self.address} after {timeout}s")
+        if self._error is not None:
+            raise self._error
+        self.iterate()
+
+    def close(self):
+        if self._loop and self._writer:
+            self._loop.call_soon_threadsafe(self._writer.close)
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        try:
+            asyncio.run(self._receive())
+        except Exception as error:
+            self._error = error
+            self._received.set()  # don't keep connect() waiting
+
+    async def _receive(self):
+        reader, self._writer = await open_connection(self.address)
+        self._loop = asyncio.get_running_loop()
+        self.connected = True
+        try:
+            self._writer.write(pack_message(HELLO, HELLO_PAYLOAD.pack(self.max_fps)))
+            self._send_name_request()  # any that were looked up before connecting
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == NAMES:
+                    # names are never changed, so they can be kept for good
+                    self.names.update(unpack_names(payload))
+                elif kind == FRAME:
+                    frame = unpack_frame(payload)
+                    with self._lock:
+                        self._latest = frame
+                    self._received.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # server went away, or we closed the connection
+        finally:
+            self.connected = False
+            self._writer.close()
+
+    def _request_names(self):
+        if self.connected:
+            self._loop.call_soon_threadsafe(self._send_name_request)
+
+    def _send_name_request(self):
+        wanted = self.names.take_wanted()
+        if wanted and not self._writer.is_closing():
+            self._writer.write(pack_message(NAME_REQUEST, pack_name_ids(wanted)))
+
+    @property
+    def has_new_frame(self) -> bool:
+        return self._latest is not None
+
+    def iterate(self):
+        """
+        Swap in the newest frame, if one has arrived since the last call.
+        """
+        with self._lock:
+            frame, self._latest = self._latest, None
+        if frame is None:
+            return
+        self.iteration = frame.iteration
+        self.total_mass = frame.total_mass
+        self.contents = frame.bodies
+        self.version += 1
+
+    def arrays(self) -> BodyArrays:
+        return self.contents
+
+    def query_rect(self, rect: Rect) -> numpy.array:
+        return self._spatial_index.query(rect, self.version, self.arrays)
+
+    def bodies(self) -> dict[BodyID, physics.Body]:
+        fields = "id x y u v mass radius name_id tracer".split()
+        columns = [getattr(self.contents, field).tolist() for field in fields]
+        return {values[0]: physics.Body(**dict(zip(fields, values))) for values in zip(*columns)}
+
+    def get_body(self, body_id: BodyID) -> physics.Body | None:
+        """
+        Look up a body by ID. Unlike the real automata, this can't follow mergers.
+        """
+        return self.bodies().get(body_id)
+
+    def snapshot(self) -> tuple[int, float, BodyArrays]:
+        return self.iteration, self.total_mass, self.contents
+
+    def restore(self, snapshot: tuple[int, float, BodyArrays]):
+        self.iteration, self.total_mass, self.contents = snapshot
+        self.version += 1
+
+    def world_size(self) -> tuple[float, float]:
+        xlim, ylim = self.world_limits()
+        width = xlim[1] - xlim[0] + 1
+        height = ylim[1] - ylim[0] + 1
+        return width, height
+
+    def world_limits(self) -> tuple[tuple[float, float], tuple[float, float]]:
+        x, y = self.contents.x, self.contents.y
+        if not len(x):
+            return (0, 0), (0, 0)
+        return (x.min(), x.max()), (y.min(), y.max())
+
+
+class RemoteBackend(Backend):
+    """
+    Backend for a simulation that runs in a SnapshotServer. An iteration swaps in the newest
+    frame from the server, so pausing freezes the picture, and stepping back goes back through
+    the frames that were shown. Trails are recorded from the frames too.
+    """
+
+    automaton: RemoteAutomaton
+
+    def __init__(self, address: Address, max_fps: float = 0, trails: Trails = None):
+        super().__init__(RemoteAutomaton(address, max_fps), trails=trails)
+        self.automaton.connect()
+
+    def iterate(self):
+        # only count iterations in which a new frame arrived
+        if self.automaton.has_new_frame:
+            super().iterate()
+
+    def close(self):
+        self.automaton.close()
+
+
+async def _serve_until_stopped(server: SnapshotServer, address: Address, steps: int = None):
+    # importing pygame (through Backend) lets SDL swallow SIGINT and SIGTERM; take them back
+    task = asyncio.create_task(server.serve(address, steps))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="run a simulation and stream it")
+    serve.add_argument("--address", type=parse_address, default=("127.0.0.1", 8765))
+    serve.add_argument("--scene", default="swirling")
+    serve.add_argument("--bodies", type=int, default=None)
+    serve.add_argument("--steps", type=int, default=None)
+    serve.add_argument("--max-fps", type=positive_float, default=30.0)
+    view = subparsers.add_parser("view", help="watch a simulation that is being streamed")
+    view.add_argument("--address", type=parse_address, default=("127.0.0.1", 8765))
+    view.add_argument("--max-fps", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        from .headless import create_automaton
+
+        automaton = create_automaton(scene=args.scene, bodies=args.bodies)
+        server = SnapshotServer(Backend(automaton), max_fps=args.max_fps)
+        asyncio.run(_serve_until_stopped(server, args.address, args.steps))
+    else:
+        from .game import GravityGame
+        from .scene import GravityScene
+
+        trails = Trails(length=50, stride=1)
+        backend = RemoteBackend(args.address, args.max_fps, trails=trails)
+        GravityGame(GravityScene(backend)).main()
+
+
+if __name__ == "__main__":
+    main()
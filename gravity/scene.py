@@ -3,9 +3,13 @@ from robingame.objects import Entity, Group
 from robingame.utils import random_float
 
 from . import utils
-from .automaton import GravityAutomatonSparseMatrix, GravityAutomatonDataFrame
+from .automaton import GravityAutomatonSparseMatrix
+from .dataframe import GravityAutomatonDataFrame
 from .backend import Backend
+from .trails import Trails
+from .escape import EscapePolicy
 from .physics import Body
+from .profiler import Profiler
 from .frontend import GravityFrontend, GravityMinimap
 from .input_handler import KeyboardHandler
 from .viewer import Viewer
@@ -13,14 +17,21 @@ from .viewport_handler import DefaultViewportHandler
 
 
 class GravityScene(Entity):
-    def __init__(self):
+    def __init__(self, backend: Backend = None):
+        """
+        :param backend: e.g. a RemoteBackend; by default a local simulation is created
+        """
         super().__init__()
 
-        # automaton = GravityAutomatonSparseMatrix()
-        automaton = GravityAutomatonDataFrame()
-        # utils.create_solar_system(automaton)
-        utils.spawn_swirling(automaton)
-        backend = Backend(automaton=automaton)
+        if backend is None:
+            # automaton = GravityAutomatonSparseMatrix()
+            automaton = GravityAutomatonDataFrame(solver="auto", escape=EscapePolicy())
+            # utils.create_solar_system(automaton)
+            utils.spawn_swirling(automaton)
+            backend = Backend(automaton=automaton, trails=Trails(length=50, stride=2))
+        if backend.profiler is None:
+            backend.profiler = Profiler()  # press P to profile the next 100 frames
+        automaton = backend.automaton
         main_rect = Rect(0, 0, 1000, 1000)
         size = max(automaton.world_size())
         viewport_handler = DefaultViewportHandler(
@@ -32,7 +43,7 @@ class GravityScene(Entity):
         main_map = Viewer(
             rect=main_rect,
             backend=backend,
-            frontend=GravityFrontend(),
+            frontend=GravityFrontend(trails=backend.trails),
             controller=KeyboardHandler(),
             viewport_handler=viewport_handler,
         )
@@ -0,0 +1,392 @@
+"""
+Registry of force solvers. Every solver takes the positions and masses of a set of bodies and
+returns their x/y accelerations, so the automata don't need to know which one they're using.
+
+The "auto" solver picks the fastest registered solver for the current number of bodies that
+meets an accuracy target. Which solver is fastest depends on the machine, so you can measure it:
+
+    python -m gravity.solvers
+
+This times every solver over a range of body counts and stores the results; the auto solver
+uses the stored timings if there are any, and a rough built-in cost model otherwise.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Protocol
+
+import numpy
+
+from . import physics, kernels
+from .constants import GRAVITATIONAL_CONSTANT
+from .timer import Timer
+
+CALIBRATION_PATH = Path.home() / ".cache" / "gravity" / "solvers.json"
+
+
+class Solver(Protocol):
+    name: str
+    error: float  # typical relative error of the forces; 0 for exact solvers
+    max_bodies: int | None  # don't use this solver for more bodies than this (e.g. memory)
+
+    def accelerations(
+        self, x: numpy.array, y: numpy.array, mass: numpy.array
+    ) -> tuple[numpy.array, numpy.array]:
+        """
+        :param x: 1d array of x coordinates
+        :param y: 1d array of y coordinates
+        :param mass: 1d array of masses
+        :return acc_x, acc_y: 1d arrays of x/y accelerations
+        """
+
+    def accelerations_and_potential(
+        self, x: numpy.array, y: numpy.array, mass: numpy.array
+    ) -> tuple[numpy.array, numpy.array, float]:
+        """
+        Same as accelerations, plus the total potential energy calculated in the same pass.
+        """
+
+
+SOLVERS: dict[str, Solver] = {}
+
+
+def register(solver: Solver) -> Solver:
+    SOLVERS[solver.name] = solver
+    return solver
+
+
+def get_solver(solver: str | Solver, accuracy: float = 0.0) -> Solver:
+    """
+    Look up a solver by name. "auto" gives a new AutoSolver with the given accuracy target.
+    """
+    if not isinstance(solver, str):
+        return solver
+    if solver == "auto":
+        return AutoSolver(accuracy=accuracy)
+    return SOLVERS[solver]
+
+
+class PairwiseSolver:
+    """
+    Plain python loop over every pair of bodies. No numpy overhead, so it wins for a handful of
+    bodies. Each unordered pair is visited once, and applies equal and opposite accelerations.
+    """
+
+    name = "pairwise"
+    error = 0.0
+    max_bodies = None
+
+    def accelerations(self, x, y, mass):
+        acc_x, acc_y, _ = self.accelerations_and_potential(x, y, mass)
+        return acc_x, acc_y
+
+    def accelerations_and_potential(self, x, y, mass):
+        x, y, mass = x.tolist(), y.tolist(), mass.tolist()
+        n = len(x)
+        acc_x = [0.0] * n
+        acc_y = [0.0] * n
+        potential = 0.0
+        for i in range(n):
+            for j in range(i + 1, n):
+                dx = x[j] - x[i]
+                dy = y[j] - y[i]
+                dist2 = dx * dx + dy * dy
+                if dist2 == 0:
+                    continue  # coincident bodies
+                dist = math.sqrt(dist2)
+                strength = GRAVITATIONAL_CONSTANT / (dist2 * dist)
+                acc_x[i] += strength * mass[j] * dx
+                acc_y[i] += strength * mass[j] * dy
+                acc_x[j] -= strength * mass[i] * dx
+                acc_y[j] -= strength * mass[i] * dy
+                potential -= GRAVITATIONAL_CONSTANT * mass[i] * mass[j] / dist
+        return numpy.array(acc_x), numpy.array(acc_y), potential
+
+
+class MatrixSolver:
+    """
+    physics.calculate_x_y_acceleration: builds several NxN matrices, so it is quick for
+    moderate N but runs out of memory for big N.
+    """
+
+    name = "matrix"
+    error = 0.0
+    max_bodies = 5000
+
+    def accelerations(self, x, y, mass):
+        return physics.calculate_x_y_acceleration(x, y, mass)
+
+    def accelerations_and_potential(self, x, y, mass):
+        return physics.calculate_x_y_acceleration(x, y, mass, return_potential=True)
+
+
+class SymmetricSolver:
+    """
+    physics.calculate_x_y_acceleration_symmetric: evaluates each pair once over tiles, so it does
+    half the arithmetic of the matrix solver, and memory use doesn't grow with N**2.
+    """
+
+    name = "symmetric"
+    error = 0.0
+    max_bodies = None
+
+    def accelerations(self, x, y, mass):
+        return physics.calculate_x_y_acceleration_symmetric(x, y, mass)
+
+    def accelerations_and_potential(self, x, y, mass):
+        return physics.calculate_x_y_acceleration_symmetric(x, y, mass, return_potential=True)
+
+
+class CompiledSolver:
+    """
+    numba-compiled symmetric direct sum (see kernels.py). Only registered if numba is installed.
+    """
+
+    name = "compiled"
+    error = 0.0
+    max_bodies = None
+
+    def accelerations(self, x, y, mass):
+        return kernels.calculate_x_y_acceleration(x, y, mass)
+
+    def accelerations_and_potential(self, x, y, mass):
+        return kernels.calculate_x_y_acceleration(x, y, mass, return_potential=True)
+
+
+class ParticleMeshSolver:
+    """
+    Approximate solver for large N. Mass is spread onto a grid, the potential is found by
+    convolving the grid with the 1/r kernel using FFTs, and the accelerations are interpolated
+    back from the gradient of the potential. Cost is O(N + M log M) for M grid cells, but
+    forces between bodies closer than a couple of grid cells are underestimated. The error
+    below is typical for a scene dominated by a central mass, like spawn_swirling.
+    """
+
+    name = "particle-mesh"
+    error = 0.05
+    max_bodies = None
+
+    def __init__(self, grid_size: int = 512):
+        self.grid_size = grid_size
+
+    def accelerations(self, x, y, mass):
+        acc_x, acc_y, _ = self.accelerations_and_potential(x, y, mass)
+        return acc_x, acc_y
+
+    def accelerations_and_potential(self, x, y, mass):
+        """
+        The potential energy is an estimate: half the sum of each body's mass times the grid
+        potential at its position, minus each body's interaction with its own cloud of mass.
+        """
+        size = self.grid_size
+
+        # 1. fit the grid around the bodies, with a margin so the interpolation stays inside
+        x0, y0 = x.min(), y.min()
+        extent = max(x.max() - x0, y.max() - y0, 1e-9)
+        h = extent / (size - 3)
+        x0, y0 = x0 - h, y0 - h
+
+        # 2. cloud-in-cell deposit of the masses onto the grid
+        gx, gy = (x - x0) / h, (y - y0) / h
+        ix, iy = gx.astype(int), gy.astype(int)
+        fx, fy = gx - ix, gy - iy
+        corners = [
+            (0, 0, (1 - fx) * (1 - fy)),
+            (1, 0, fx * (1 - fy)),
+            (0, 1, (1 - fx) * fy),
+            (1, 1, fx * fy),
+        ]
+        density = numpy.zeros(size * size)
+        for dx, dy, weight in corners:
+            cell = (ix + dx) * size + (iy + dy)
+            density += numpy.bincount(cell, weights=mass * weight, minlength=size * size)
+        density = density.reshape(size, size)
+
+        # 3. potential = density convolved with -G/r, zero-padded so the box isn't periodic
+        kernel = self._green(h)
+        potential = numpy.fft.irfft2(
+            numpy.fft.rfft2(density, s=(2 * size, 2 * size)) * numpy.fft.rfft2(kernel),
+            s=(2 * size, 2 * size),
+        )[:size, :size]
+
+        # 4. acceleration is minus the gradient of the potential
+        grad_x, grad_y = numpy.gradient(potential, h)
+
+        # 5. interpolate back onto the bodies with the same cloud-in-cell weights
+        acc_x = numpy.zeros_like(x)
+        acc_y = numpy.zeros_like(y)
+        body_potential = numpy.zeros_like(x)
+        for dx, dy, weight in corners:
+            acc_x -= grad_x[ix + dx, iy + dy] * weight
+            acc_y -= grad_y[ix + dx, iy + dy] * weight
+            body_potential += potential[ix + dx, iy + dy] * weight
+
+        # 6. potential energy, without each body's interaction with itself
+        self_potential = numpy.zeros_like(x)
+        for dx1, dy1, weight1 in corners:
+            for dx2, dy2, weight2 in corners:
+                self_potential += weight1 * weight2 * kernel[abs(dx1 - dx2), abs(dy1 - dy2)]
+        potential_energy = 0.5 * (mass * body_potential - mass**2 * self_potential).sum()
+        return acc_x, acc_y, potential_energy
+
+    def _green(self, h: float) -> numpy.ndarray:
+        """The -G/r Green's function on the padded grid, in wrap-around order"""
+        offsets = numpy.arange(2 * self.grid_size)
+        offsets = numpy.minimum(offsets, 2 * self.grid_size - offsets) * h
+        dist = numpy.hypot(offsets.reshape(-1, 1), offsets.reshape(1, -1))
+        # the average of 1/r over a square cell of side h is 4 * ln(1 + sqrt(2)) / h
+        dist[0, 0] = h / (4 * math.log(1 + math.sqrt(2)))
+        return -GRAVITATIONAL_CONSTANT / dist
+
+
+register(PairwiseSolver())
+register(MatrixSolver())
+register(SymmetricSolver())
+if kernels.AVAILABLE:
+    register(CompiledSolver())
+register(ParticleMeshSolver())
+
+
+# rough seconds per call if there is no calibration file: cost = a * N**2 + b * N + c
+DEFAULT_COSTS = {
+    "pairwise": (4e-7, 0, 0),
+    "matrix": (7e-8, 0, 5e-5),
+    "symmetric": (1e-8, 0, 1e-4),
+    "compiled": (2e-9, 0, 2e-5),
+    "particle-mesh": (0, 5e-7, 5e-2),
+}
+DEFAULT_SIZES = (8, 32, 128, 512, 2048, 8192, 32768)
+
+
+class AutoSolver:
+    """
+    Picks the fastest solver that meets the accuracy target for the current number of bodies.
+    The choice is re-evaluated whenever the number of bodies changes, so as bodies merge away
+    a big scene will move from approximate solvers to exact ones.
+    """
+
+    name = "auto"
+    max_bodies = None
+    current: Solver | None = None
+    _n: int | None = None
+
+    def __init__(self, accuracy: float = 0.0, timings: dict[str, dict[int, float]] = None):
+        """
+        :param accuracy: maximum acceptable relative force error. 0 means exact solvers only.
+        :param timings: {solver name: {number of bodies: seconds per call}}. Defaults to the
+            stored calibration, or the built-in cost model.
+        """
+        self.accuracy = accuracy
+        self.timings = timings or load_calibration() or default_timings()
+
+    @property
+    def error(self) -> float:
+        return self.current.error if self.current else 0.0
+
+    def accelerations(self, x, y, mass):
+        return self._solver_for(len(x)).accelerations(x, y, mass)
+
+    def accelerations_and_potential(self, x, y, mass):
+        return self._solver_for(len(x)).accelerations_and_potential(x, y, mass)
+
+    def _solver_for(self, n: int) -> Solver:
+        if n != self._n:
+            self._n = n
+            self.current = self.choose(n)
+        return self.current
+
+    def choose(self, n: int) -> Solver:
+        candidates = [
+            solver
+            for solver in SOLVERS.values()
+            if solver.error <= self.accuracy
+            and (solver.max_bodies is None or n <= solver.max_bodies)
+            and solver.name in self.timings
+        ]
+        return min(candidates, key=lambda solver: estimate(self.timings[solver.name], n))
+
+
+def estimate(timings: dict[int, float], n: int) -> float:
+    """
+    Interpolate measured timings in log-log space. Outside the measured range, extrapolate
+    using the slope of the nearest two points.
+    """
+    sizes = numpy.log(sorted(timings))
+    times = numpy.log([timings[size] for size in sorted(timings)])
+    log_n = math.log(max(n, 1))
+    if len(sizes) == 1:
+        return math.exp(times[0])
+    if log_n < sizes[0]:
+        ii = 0
+    elif log_n > sizes[-1]:
+        ii = len(sizes) - 2
+    else:
+        return math.exp(numpy.interp(log_n, sizes, times))
+    slope = (times[ii + 1] - times[ii]) / (sizes[ii + 1] - sizes[ii])
+    return math.exp(times[ii] + slope * (log_n - sizes[ii]))
+
+
+def default_timings() -> dict[str, dict[int, float]]:
+    return {
+        name: {n: a * n**2 + b * n + c for n in DEFAULT_SIZES}
+        for name, (a, b, c) in DEFAULT_COSTS.items()
+    }
+
+
+def crossovers(
+    timings: dict[str, dict[int, float]], accuracy: float = 0.0, max_n: int = 100_000
+) -> list[tuple[int, str]]:
+    """
+    The body counts at which the auto solver switches solver, as [(from_n, solver name), ...]
+    """
+    auto = AutoSolver(accuracy=accuracy, timings=timings)
+    result = []
+    for n in numpy.unique(numpy.geomspace(1, max_n, 200).astype(int)):
+        name = auto.choose(int(n)).name
+        if not result or result[-1][1] != name:
+            result.append((int(n), name))
+    return result
+
+
+def calibrate(
+    sizes=(8, 32, 128, 512, 2048, 8192),
+    time_limit: float = 1.0,
+    path: Path = CALIBRATION_PATH,
+) -> dict[str, dict[int, float]]:
+    """
+    Time every registered solver on random bodies and store the results at `path`. A solver
+    stops being timed at larger sizes once one call takes longer than `time_limit` seconds.
+    """
+    rng = numpy.random.default_rng(0)
+    timings = {}
+    for solver in SOLVERS.values():
+        timings[solver.name] = {}
+        for n in sizes:
+            if solver.max_bodies is not None and n > solver.max_bodies:
+                break
+            x, y = rng.uniform(-1000, 1000, (2, n))
+            mass = rng.uniform(1e9, 1e10, n)
+            solver.accelerations(x, y, mass)  # warm up (e.g. numba compilation)
+            with Timer() as timer:
+                solver.accelerations(x, y, mass)
+            timings[solver.name][n] = timer.time
+            if timer.time > time_limit:
+                break
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(timings, indent=2))
+    return timings
+
+
+def load_calibration(path: Path = CALIBRATION_PATH) -> dict[str, dict[int, float]] | None:
+    if not path.exists():
+        return None
+    timings = json.loads(path.read_text())
+    return {name: {int(n): t for n, t in times.items()} for name, times in timings.items()}
+
+
+if __name__ == "__main__":
+    timings = calibrate()
+    print(f"stored timings in {CALIBRATION_PATH}")
+    for accuracy in sorted({solver.error for solver in SOLVERS.values()}):
+        print(f"accuracy {accuracy}: {crossovers(timings, accuracy)}")
@@ -0,0 +1,219 @@
+"""
+Spatial index for range queries, e.g. finding the bodies inside a viewer's viewport. Bodies are
+binned into a uniform grid sized so that each cell holds a few bodies on average, and sorted by
+cell, so the bodies in a row of cells are one contiguous slice. A query only looks at the rows
+and columns of cells that overlap the rectangle, so it costs about as much as the number of
+bodies it finds, however big the world is.
+"""
+
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import numpy
+
+from .timer import Timer
+
+Rect = tuple[float, float, float, float]  # x, y, width, height
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the bodies' positions, rebuilt when the automaton's version changes.
+    Building costs about ten times as much as scanning every body once, so the first query for
+    a version is answered by a scan, and the grid is only built if the same version is queried
+    again (e.g. panning while paused). While the simulation runs, the version changes every
+    frame, and every query is a scan.
+
+    Each body is binned by its centre, so a query rectangle is grown by the largest radius to
+    catch discs that stick out of their cell. Bodies bigger than half a cell are kept in a
+    separate list that every query checks, so one big star doesn't make every query slow.
+    """
+
+    version: int | None = None  # automaton version the index was built for
+    _scanned: int | None = None  # automaton version that was last answered by a scan
+
+    def __init__(self, bodies_per_cell: float = 4):
+        """
+        :param bodies_per_cell: average number of bodies per grid cell
+        """
+        self.bodies_per_cell = bodies_per_cell
+        empty = numpy.zeros(0)
+        self.build(empty, empty, empty, version=None)
+
+    def query(self, rect: Rect, version: int, bodies: Callable[[], Any]) -> numpy.array:
+        """
+        Find the bodies that overlap a rectangle. If the index is out of date, scan all the
+        bodies the first time, and rebuild the index the second time.
+
+        :param rect: (x, y, width, height) in world coordinates
+        :param version: the automaton's current version
+        :param bodies: returns the automaton's BodyArrays; only called if the index is out of
+            date
+        :return: sorted indices into the body arrays
+        """
+        if version == self.version:
+            return self.query_rect(rect)
+        arrays = bodies()
+        if version != self._scanned:
+            self._scanned = version
+            return scan(arrays.x, arrays.y, arrays.radius, rect)
+        self.build(arrays.x, arrays.y, arrays.radius, version)
+        return self.query_rect(rect)
+
+    def build(self, x: numpy.array, y: numpy.array, radius: numpy.array, version: int | None):
+        """
+        :param x, y, radius: 1d arrays, one entry per body
+        :param version: automaton version that these positions belong to
+        """
+        n = len(x)
+        self.version = version
+        self._x, self._y, self._radius = x, y, radius
+        if not n:
+            self._origin = (0.0, 0.0)
+            self._cell = (1.0, 1.0)
+            self._shape = (1, 1)
+            self._keys = self._order = self._large = numpy.zeros(0, dtype=int)
+            self._margin = 0.0
+            return
+
+        # 1 choose roughly square cells, bodies_per_cell bodies each on average
+        xmin, ymin = x.min(), y.min()
+        width, height = x.max() - xmin, y.max() - ymin
+        cells = max(1, int(n / self.bodies_per_cell))
+        if width and height:
+            side = numpy.sqrt(width * height / cells)
+        else:
+            side = max(width, height) / cells or 1.0  # all bodies in a line, or in one place
+        columns = int(numpy.clip(width / side, 1, cells))
+        rows = int(numpy.clip(height / side, 1, cells))
+        self._origin = (xmin, ymin)
+        self._cell = (width / columns or 1.0, height / rows or 1.0)
+        self._shape = (columns, rows)
+
+        # 2 big bodies go in their own list
+        large = radius > min(self._cell) / 2
+        (self._large,) = large.nonzero()
+        (small,) = (~large).nonzero()
+        self._margin = radius[small].max() if len(small) else 0.0
+
+        # 3 sort the rest by cell, row by row. The order within a cell doesn't matter, because
+        # queries sort what they find, so use the fast unstable sort
+        column, row = self._cells(x[small], y[small])
+        keys = row * columns + column
+        order = numpy.argsort(keys)
+        self._keys = keys[order]
+        self._order = small[order]
+
+    def query_rect(self, rect: Rect) -> numpy.array:
+        """
+        :param rect: (x, y, width, height) in world coordinates
+        :return: sorted indices into the body arrays of the bodies that overlap the rectangle
+        """
+        x, y, width, height = rect
+        margin = self._margin
+        columns, rows = self._shape
+        (column0, column1), (row0, row1) = self._cells(
+            numpy.array([x - margin, x + width + margin]),
+            numpy.array([y - margin, y + height + margin]),
+            clip=False,
+        )
+        column0, row0 = max(column0, 0), max(row0, 0)
+        column1, row1 = min(column1, columns - 1), min(row1, rows - 1)
+
+        candidates = self._large
+        if column0 <= column1 and row0 <= row1 and len(self._keys):
+            # one contiguous slice of the sorted bodies per row of cells
+            row_keys = numpy.arange(row0, row1 + 1) * columns
+            starts = numpy.searchsorted(self._keys, row_keys + column0, side="left")
+            ends = numpy.searchsorted(self._keys, row_keys + column1, side="right")
+            candidates = numpy.concatenate([self._order[_ranges(starts, ends)], candidates])
+
+        # the grid only narrows it down; check the candidates themselves
+        cx, cy, cr = self._x[candidates], self._y[candidates], self._radius[candidates]
+        return numpy.sort(candidates[_overlaps(cx, cy, cr, rect)])
+
+    def _cells(
+        self, x: numpy.array, y: numpy.array, clip: bool = True
+    ) -> tuple[numpy.array, numpy.array]:
+        """:return: column and row of the cell that each point is in"""
+        (xmin, ymin), (cell_width, cell_height) = self._origin, self._cell
+        column = numpy.floor((x - xmin) / cell_width).astype(int)
+        row = numpy.floor((y - ymin) / cell_height).astype(int)
+        if clip:
+            columns, rows = self._shape
+            column = numpy.clip(column, 0, columns - 1)
+            row = numpy.clip(row, 0, rows - 1)
+        return column, row
+
+
+def scan(x: numpy.array, y: numpy.array, radius: numpy.array, rect: Rect) -> numpy.array:
+    """
+    Same as SpatialIndex.query_rect, by checking every body
+    """
+    (indices,) = _overlaps(x, y, radius, rect).nonzero()
+    return indices
+
+
+def _overlaps(x: numpy.array, y: numpy.array, radius: numpy.array, rect: Rect) -> numpy.array:
+    """:return: boolean array; True for the discs that overlap the rectangle"""
+    rx, ry, width, height = rect
+    return (
+        (x + radius > rx)
+        & (x - radius < rx + width)
+        & (y + radius > ry)
+        & (y - radius < ry + height)
+    )
+
+
+def _ranges(starts: numpy.array, ends: numpy.array) -> numpy.array:
+    """
+    Concatenate several ranges without a python loop.
+        _ranges([0, 5], [2, 8]) -> [0, 1, 5, 6, 7]
+    """
+    lengths = ends - starts
+    total = lengths.sum()
+    if not total:
+        return numpy.zeros(0, dtype=int)
+    # each range's offset from where it lands in the result
+    offsets = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+    return offsets + numpy.arange(total)
+
+
+def benchmark(n: int, frames: int = 20, seed: int = 0) -> dict[str, float]:
+    """
+    Time one viewport query per frame over n random bodies, the way the frontend makes them.
+
+    :return: milliseconds per frame for
+        running: the version changes every frame, as it does while the simulation runs
+        rebuilding: the same, if the index were rebuilt for every new version
+        paused: the version stays the same
+    """
+    rng = numpy.random.default_rng(seed)
+    x, y = rng.normal(0, 1000, (2, n))
+    radius = rng.uniform(0.1, 3, n)
+    rect = (-100, -100, 200, 200)
+    arrays = SimpleNamespace(x=x, y=y, radius=radius)  # all the index needs of BodyArrays
+
+    index = SpatialIndex()
+    with Timer() as running:
+        for version in range(frames):
+            index.query(rect, version, lambda: arrays)
+    with Timer() as rebuilding:
+        for version in range(frames):
+            index.build(x, y, radius, version)
+            index.query_rect(rect)
+    with Timer() as paused:
+        for _ in range(frames):
+            index.query(rect, frames - 1, lambda: arrays)
+    return {
+        "running": running.time * 1e3 / frames,
+        "rebuilding": rebuilding.time * 1e3 / frames,
+        "paused": paused.time * 1e3 / frames,
+    }
+
+
+if __name__ == "__main__":
+    print("milliseconds per viewport query")
+    for n in (10_000, 100_000, 1_000_000):
+        times = benchmark(n)
+        print(f"{n:>9} bodies: " + ", ".join(f"{name} {t:.3f}" for name, t in times.items()))
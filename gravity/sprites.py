@@ -0,0 +1,71 @@
+"""
+Pre-rendered body sprites. Most bodies on screen share a handful of sizes and colours, so
+rasterising each disc once and blitting copies of it is much cheaper than drawing a circle per
+body per frame, and lets a whole frame go out in one Surface.blits call.
+"""
+
+from collections import OrderedDict
+
+import pygame.gfxdraw
+from pygame import Surface, SRCALPHA, RLEACCEL
+
+from .colormaps import Colormap
+
+
+class SpriteCache:
+    """
+    Anti-aliased discs keyed by (pixel radius, colormap index), rendered on first use. When
+    there are more than `maxsize`, the least recently used one is dropped.
+    """
+
+    hits: int = 0
+    misses: int = 0
+
+    def __init__(self, colormap: Colormap, maxsize: int = 1024, max_radius: int = 64):
+        """
+        :param colormap: the colour of a sprite is this colormap's entry at its colour index
+        :param maxsize: number of sprites to keep
+        :param max_radius: bigger discs aren't cached; there are few of them on screen, and
+            each sprite takes (2 * radius + 1)**2 * 4 bytes
+        """
+        self.colormap = colormap
+        self.maxsize = maxsize
+        self.max_radius = max_radius
+        self._sprites: OrderedDict[tuple[int, int], Surface] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def get(self, radius: int, color_index: int) -> Surface:
+        """
+        :return: a (2 * radius + 1) square surface with the disc centred on it
+        """
+        key = (radius, color_index)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = render_disc(radius, self.colormap.table[color_index].tolist())
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.maxsize:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self._sprites.clear()
+
+
+def render_disc(radius: int, color: tuple[int, int, int]) -> Surface:
+    """
+    Filled, anti-aliased disc on a transparent background
+    """
+    size = 2 * radius + 1
+    sprite = Surface((size, size), SRCALPHA)
+    pygame.gfxdraw.aacircle(sprite, radius, radius, radius, color)
+    pygame.gfxdraw.filled_circle(sprite, radius, radius, radius, color)
+    # run-length encoding lets blits skip the transparent corners and copy the opaque middle
+    # without blending; it about halves the cost of blitting a disc
+    sprite.set_alpha(255, RLEACCEL)
+    return sprite
@@ -0,0 +1,196 @@
+"""
+Run headless simulations over a grid of parameters, spread across all cores:
+
+    python -m gravity.sweep --out sweep.jsonl --steps 2000 \\
+        --param speed_coeff=4,6,8 --param density=5e9,1e10 --param bodies=200,400
+
+Each run gets its own automaton in a worker process. Summaries are appended to the results file
+(one JSON object per line) as runs finish, so a sweep can be stopped at any time and restarted
+with the same arguments; runs that are already in the results file are skipped.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Iterator
+
+from . import headless, kernels
+from .dataframe import GravityAutomatonDataFrame
+from .mergelog import MergeLog
+
+
+def grid(**axes: list) -> list[dict[str, Any]]:
+    """
+    Every combination of the given parameter values.
+        grid(speed_coeff=[4, 6], density=[1e10]) ->
+        [{"speed_coeff": 4, "density": 1e10}, {"speed_coeff": 6, "density": 1e10}]
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def run_key(params: dict[str, Any], steps: int, seed: int) -> str:
+    """Identifies a run in the results file"""
+    return json.dumps(dict(params, steps=steps, seed=seed), sort_keys=True)
+
+
+def run_one(params: dict[str, Any], steps: int, seed: int = 0) -> dict[str, Any]:
+    """
+    Run one simulation and summarise it.
+
+    :param params: keyword arguments for headless.create_automaton; anything it doesn't know
+        about is passed on to the scene's spawn function.
+    :param steps: number of iterations
+    :param seed: random seed for the spawn function
+    """
+    random.seed(seed)
+    merge_log = MergeLog()
+    automaton = headless.create_automaton(merge_log=merge_log, **params)
+    initial_bodies = len(automaton.bodies())
+    seconds = headless.run(automaton, steps, verbose=False)
+    energy, momentum, angular = automaton.telemetry.errors()
+    final_bodies = len(automaton.bodies())
+    # bodies leave by merging, escaping (into the archive), or as tracers absorbed by others
+    merges = len(merge_log)
+    escapes = len(automaton.archive) if isinstance(automaton, GravityAutomatonDataFrame) else 0
+    return dict(
+        key=run_key(params, steps, seed),
+        params=params,
+        steps=steps,
+        seed=seed,
+        initial_bodies=initial_bodies,
+        final_bodies=final_bodies,
+        merges=merges,
+        escapes=escapes,
+        absorptions=initial_bodies - final_bodies - merges - escapes,
+        seconds=seconds,
+        steps_per_second=steps / seconds if seconds else None,
+        energy_error=energy,
+        momentum_error=momentum,
+        angular_momentum_error=angular,
+    )
+
+
+def completed_keys(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    keys = set()
+    with path.open() as file:
+        for line in file:
+            try:
+                keys.add(json.loads(line)["key"])
+            except (json.JSONDecodeError, KeyError):
+                pass  # e.g. a line cut short when the last sweep was killed
+    return keys
+
+
+def _init_worker():
+    # one worker per core already; don't let the compiled kernels oversubscribe them
+    kernels.set_num_threads(1)
+
+
+def sweep(
+    param_grid: list[dict[str, Any]],
+    path: Path | str,
+    steps: int = 1000,
+    seeds: list[int] = (0,),
+    workers: int = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Run every combination of parameters and seed, skipping runs that are already in the results
+    file. Append each summary to the file as soon as its run finishes, and yield it.
+    A run that raises an exception gets a summary with just its key, parameters, seed and the
+    error, so that the rest of the sweep carries on. Like any other summary, it marks the run
+    as done; delete its line from the results file to run it again.
+
+    :param param_grid: list of parameter dicts, e.g. from `grid`
+    :param path: results file (JSON lines)
+    :param steps: iterations per run
+    :param seeds: run every set of parameters once per seed
+    :param workers: number of processes; defaults to one per core
+    """
+    path = Path(path)
+    done = completed_keys(path)
+    pending = [
+        (params, seed)
+        for params in param_grid
+        for seed in seeds
+        if run_key(params, steps, seed) not in done
+    ]
+    if not pending:
+        return
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(run_one, params, steps, seed): (params, seed) for params, seed in pending
+        }
+        with path.open("a") as file:
+            if file.tell() and not path.read_text().endswith("\n"):
+                file.write("\n")  # don't append to a line cut short by a killed sweep
+            for future in as_completed(futures):
+                try:
+                    summary = future.result()
+                except Exception as error:
+                    params, seed = futures[future]
+                    summary = dict(
+                        key=run_key(params, steps, seed),
+                        params=params,
+                        steps=steps,
+                        seed=seed,
+                        error=f"{type(error).__name__}: {error}",
+                    )
+                file.write(json.dumps(summary) + "\n")
+                file.flush()
+                yield summary
+
+
+def _parse_param(text: str) -> tuple[str, list]:
+    """'speed_coeff=4,6,8' -> ('speed_coeff', [4, 6, 8])"""
+    name, _, values = text.partition("=")
+    return name.replace("-", "_"), [_parse_value(value) for value in values.split(",")]
+
+
+def _parse_value(text: str) -> Any:
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", type=Path, default=Path("sweep.jsonl"))
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="name=value1,value2,... for any create_automaton or spawn function argument",
+    )
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seeds", type=int, default=1, help="number of seeds per combination")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    param_grid = grid(**dict(_parse_param(param) for param in args.param))
+    for summary in sweep(param_grid, args.out, args.steps, range(args.seeds), args.workers):
+        run = f"{summary['params']} seed={summary['seed']}"
+        if "error" in summary:
+            print(f"{run}: failed with {summary['error']}")
+            continue
+        rate = summary["steps_per_second"]
+        print(
+            f"{run}: {summary['final_bodies']} bodies, {summary['merges']} merges, "
+            f"{summary['escapes']} escapes, {summary['absorptions']} absorptions, "
+            f"{'-' if rate is None else f'{rate:.1f}'} steps/s, "
+            f"dE={summary['energy_error']:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import random
+import tracemalloc
+
+import numpy
+import pytest
+
+from gravity.automaton import GravityAutomatonDataFrame, GravityAutomatonSparseMatrix
+from gravity.constants import GRAVITATIONAL_CONSTANT
+from gravity.diagnostics import Telemetry
+
+AUTOMATA = [GravityAutomatonSparseMatrix, GravityAutomatonDataFrame]
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_bodies_at_same_position_are_kept(automaton_class):
+    automaton = automaton_class()
+    id1 = automaton.add_body(0, 0, mass=1, radius=1)
+    id2 = automaton.add_body(0, 0, mass=2, radius=1)
+    assert id1 != id2
+    assert set(automaton.bodies()) == {id1, id2}
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_body_ids_are_stable_across_iterations(automaton_class):
+    automaton = automaton_class()
+    ids = [automaton.add_body(x * 100, 0, mass=1, radius=1, v=1) for x in range(3)]
+    for _ in range(3):
+        automaton.iterate()
+    assert set(automaton.bodies()) == set(ids)
+    body = automaton.get_body(ids[1])
+    assert body.id == ids[1]
+    assert body.x == pytest.approx(100)
+    assert body.y == pytest.approx(3)
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_get_body_follows_merges(automaton_class):
+    automaton = automaton_class()
+    far = automaton.add_body(1000, 0, mass=1, radius=1)
+    left = automaton.add_body(0, 0, mass=1, radius=2)
+    right = automaton.add_body(3, 0, mass=1, radius=2)
+    automaton.iterate()
+    assert len(automaton.bodies()) == 2
+    merged = automaton.get_body(left)
+    assert merged is not None
+    assert merged.id not in (left, right)
+    assert automaton.get_body(right).id == merged.id
+    assert merged.mass == 2
+    assert automaton.get_body(far).id == far
+    assert automaton.get_body(12345) is None
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_snapshot_restore(automaton_class):
+    automaton = automaton_class()
+    body_id = automaton.add_body(0, 0, mass=1, radius=1, u=1)
+    snapshot = automaton.snapshot()
+    automaton.iterate()
+    assert automaton.get_body(body_id).x == 1
+    automaton.restore(snapshot)
+    assert automaton.get_body(body_id).x == 0
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_restore_undoes_mergers(automaton_class):
+    automaton = automaton_class()
+    id1 = automaton.add_body(0, 0, mass=1, radius=5)
+    id2 = automaton.add_body(3, 0, mass=1, radius=5)
+    snapshot = automaton.snapshot()
+    automaton.iterate()
+    merged = automaton.get_body(id1)
+    assert merged.id == automaton.get_body(id2).id not in (id1, id2)
+    automaton.restore(snapshot)
+    assert automaton.get_body(id1).x == 0
+    assert automaton.get_body(id2).x == 3
+    assert automaton.get_body(merged.id) is None
+    automaton.iterate()  # merges again, and reuses the undone ID
+    assert automaton.get_body(id1).id == merged.id
+
+
+def test_automata_apply_the_same_forces():
+    """Each pair of bodies should only be applied once, in both automata"""
+    automata = [automaton_class() for automaton_class in AUTOMATA]
+    for automaton in automata:
+        for x, y, mass in [(0, 0, 1e12), (100, 0, 1e9), (0, 250, 1e10)]:
+            automaton.add_body(x, y, mass=mass, radius=1)
+        automaton.iterate()
+    sparse, dataframe = (automaton.bodies() for automaton in automata)
+    for body_id, body in sparse.items():
+        assert body.u == pytest.approx(dataframe[body_id].u, rel=1e-9)
+        assert body.v == pytest.approx(dataframe[body_id].v, rel=1e-9)
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_tracers_feel_gravity_but_dont_exert_it(automaton_class):
+    automaton = automaton_class()
+    sun = automaton.add_body(0, 0, mass=1e12, radius=10)
+    tracer = automaton.add_body(100, 0, mass=1e12, radius=1, tracer=True)
+    dust = automaton.add_body(100, 1, mass=0, radius=1, tracer=True)  # touching; doesn't merge
+    automaton.iterate()
+    assert len(automaton.bodies()) == 3
+    assert automaton.get_body(sun).u == 0
+    expected = -GRAVITATIONAL_CONSTANT * 1e12 / 100**2
+    assert automaton.get_body(tracer).u == pytest.approx(expected)
+    assert automaton.get_body(dust).u == pytest.approx(expected, rel=1e-3)
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+@pytest.mark.parametrize("absorb_tracers", [True, False])
+def test_tracers_are_absorbed(automaton_class, absorb_tracers):
+    automaton = automaton_class(absorb_tracers=absorb_tracers)
+    sun = automaton.add_body(0, 0, mass=1, radius=10)
+    tracer = automaton.add_body(5, 0, mass=0, radius=1, tracer=True)
+    automaton.add_bodies(
+        x=numpy.array([20.0, 30.0]), y=numpy.zeros(2), mass=0, radius=1, tracer=True
+    )
+    automaton.iterate()
+    assert len(automaton.bodies()) == (3 if absorb_tracers else 4)
+    assert automaton.get_body(sun).mass == 1
+    assert (automaton.get_body(tracer) is None) == absorb_tracers
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+@pytest.mark.parametrize("swept_collisions", [True, False])
+def test_swept_collisions_stop_tunnelling(automaton_class, swept_collisions):
+    automaton = automaton_class(swept_collisions=swept_collisions)
+    automaton.add_body(0, 0, mass=1, radius=10)
+    automaton.add_body(-30, 0, mass=1, radius=1, u=60)  # ends the step at x=30
+    automaton.add_body(-30, 100, mass=1, radius=1, u=60)  # passes wide
+    automaton.iterate()
+    assert len(automaton.bodies()) == (2 if swept_collisions else 3)
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_merge_at_contact(automaton_class):
+    merged = []
+    heat = []
+    for merge_at_contact in [False, True]:
+        automaton = automaton_class(swept_collisions=True, merge_at_contact=merge_at_contact)
+        automaton.add_body(0, 0, mass=1e10, radius=10)
+        automaton.add_body(-30, 0, mass=1e10, radius=1, u=60)
+        automaton.iterate()
+        (body,) = automaton.bodies().values()
+        merged.append(body)
+        heat.append(automaton.heat)
+    # bodies move in straight lines during a step, so the merged body ends up in the same place
+    # either way; but at contact the pair's (negative) potential energy is lower, so the merger
+    # releases less heat
+    assert merged[0].x == pytest.approx(merged[1].x)
+    assert merged[0].u == pytest.approx(merged[1].u)
+    difference = GRAVITATIONAL_CONSTANT * 1e20 * (1 / 11 - 1 / 30)
+    assert heat[0] - heat[1] == pytest.approx(difference, rel=1e-3)
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_restore_rolls_back_the_bookkeeping(automaton_class):
+    automaton = automaton_class(telemetry=Telemetry(every=1))
+    id1 = automaton.add_body(0, 0, mass=1e6, radius=5)
+    id2 = automaton.add_body(3, 0, mass=1e6, radius=5)
+    id3 = automaton.add_body(100, 0, mass=1e6, radius=5)
+    automaton.iterate()  # 1 and 2 merge
+    first = automaton.get_body(id1).id
+    heat = automaton.heat
+    snapshot = automaton.snapshot()
+    automaton.add_body(103, 0, mass=1e6, radius=5)
+    for _ in range(3):
+        automaton.iterate()
+    assert automaton.get_body(id3).id != id3
+    automaton.restore(snapshot)
+    assert (automaton.iteration, automaton.heat) == (1, heat)
+    assert [sample.iteration for sample in automaton.telemetry.samples] == [0]
+    assert automaton.get_body(id2).id == first  # the earlier merger still counts
+    assert automaton.get_body(id3).id == id3
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_version_changes_with_bodies(automaton_class):
+    automaton = automaton_class()
+    versions = [automaton.version]
+    automaton.add_body(0, 0, mass=1, radius=1, u=1)
+    versions.append(automaton.version)
+    snapshot = automaton.snapshot()
+    automaton.bodies()
+    automaton.world_limits()
+    assert automaton.version == versions[-1]
+    automaton.iterate()
+    versions.append(automaton.version)
+    automaton.restore(snapshot)
+    versions.append(automaton.version)
+    assert len(set(versions)) == len(versions)
+
+
+@pytest.mark.parametrize("n", [50, 200])
+def test_sparse_iterate_allocations_are_bounded(n):
+    """The pair loops shouldn't create (let alone keep) any objects per pair"""
+    random.seed(0)
+    automaton = GravityAutomatonSparseMatrix(telemetry=Telemetry(every=0))
+    for _ in range(n):
+        x, y = random.uniform(-1e4, 1e4), random.uniform(-1e4, 1e4)
+        automaton.add_body(x, y, mass=1e6, radius=1, name=None)
+    automaton.iterate()  # warm up
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        automaton.iterate()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert after - before < 1024  # updated in place; this allows for Python's float free list
+    assert peak - before < 64 * n + 4096  # a few lists of bodies, nothing per pair
@@ -0,0 +1,51 @@
+import numpy
+import pytest
+
+from gravity.automaton import GravityAutomatonDataFrame, GravityAutomatonSparseMatrix
+from gravity.constants import GRAVITATIONAL_CONSTANT
+from gravity.diagnostics import Telemetry, measure, merger_heat
+
+
+def test_measure():
+    x = numpy.array([1.0, -1.0])
+    y = numpy.array([0.0, 0.0])
+    u = numpy.array([0.0, 0.0])
+    v = numpy.array([2.0, -2.0])
+    mass = numpy.array([3.0, 3.0])
+    sample = measure(7, x, y, u, v, mass, potential_energy=-5.0, heat=1.0)
+    assert sample.iteration == 7
+    assert sample.kinetic_energy == 12.0
+    assert sample.energy == 12.0 - 5.0 + 1.0
+    assert (sample.momentum_x, sample.momentum_y) == (0.0, 0.0)
+    assert sample.angular_momentum == 12.0
+
+
+def test_merger_heat():
+    heat = merger_heat(dx=2.0, dy=0.0, du=0.0, dv=4.0, mass1=1.0, mass2=1.0)
+    assert heat == pytest.approx(0.5 * 0.5 * 16 - GRAVITATIONAL_CONSTANT / 2)
+    assert merger_heat(dx=0.0, dy=0.0, du=0.0, dv=0.0, mass1=1.0, mass2=1.0) == 0.0
+
+
+def test_telemetry_sampling():
+    telemetry = Telemetry(every=5)
+    assert [ii for ii in range(12) if telemetry.due(ii)] == [0, 5, 10]
+    assert Telemetry(every=0).due(0) is False
+    assert telemetry.errors() == (0.0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize(
+    "automaton_class", [GravityAutomatonSparseMatrix, GravityAutomatonDataFrame]
+)
+def test_automata_conserve_momentum_through_mergers(automaton_class):
+    automaton = automaton_class(telemetry=Telemetry(every=1))
+    automaton.add_body(0, 0, mass=1e12, radius=10)
+    automaton.add_body(100, 0, mass=1e10, radius=2, v=0.8)
+    automaton.add_body(-500, 0, mass=1e9, radius=2, v=-0.3)
+    automaton.add_body(-503, 0, mass=2e9, radius=2, u=0.1, v=-0.4)  # merges straight away
+    for _ in range(20):
+        automaton.iterate()
+    assert len(automaton.telemetry.samples) == 20
+    assert len(automaton.bodies()) == 3
+    energy, momentum, angular_momentum = automaton.telemetry.errors()
+    assert momentum < 1e-12
+    assert energy < 1e-2
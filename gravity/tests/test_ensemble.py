@@ -0,0 +1,69 @@
+import numpy
+import pytest
+
+from gravity import physics, utils
+from gravity.automaton import GravityAutomatonDataFrame
+from gravity.ensemble import GravityAutomatonEnsemble
+
+
+def create_system(n_bodies: int, offset: float) -> GravityAutomatonDataFrame:
+    """A heavy body with a line of light ones, two of which will collide"""
+    automaton = GravityAutomatonDataFrame(solver="matrix")
+    automaton.add_body(0, 0, mass=1e13, radius=20, name="Sun")
+    for i in range(n_bodies - 2):
+        automaton.add_body(100 + 50 * i + offset, 0, mass=1e8, radius=2, v=3)
+    automaton.add_body(100 + offset, 3, mass=1e8, radius=2, v=-3)
+    return automaton
+
+
+def test_batched_acceleration_matches_unbatched():
+    rng = numpy.random.default_rng(0)
+    x, y = rng.uniform(-100, 100, (2, 4, 10))
+    mass = rng.uniform(1, 10, (4, 10))
+    mass[2, 7:] = 0  # padding
+    acc_x, acc_y, potential = physics.calculate_batched_x_y_acceleration(
+        x, y, mass, return_potential=True
+    )
+    for s in range(4):
+        expected = physics.calculate_x_y_acceleration_symmetric(
+            x[s], y[s], mass[s], return_potential=True
+        )
+        assert acc_x[s] == pytest.approx(expected[0])
+        assert acc_y[s] == pytest.approx(expected[1])
+        assert potential[s] == pytest.approx(expected[2])
+
+
+def test_ensemble_matches_separate_automata():
+    automata = [create_system(n_bodies, offset) for n_bodies, offset in [(3, 0), (5, 7), (4, 13)]]
+    ensemble = GravityAutomatonEnsemble.from_automata(automata)
+    assert ensemble.shape == (3, 5)
+    for _ in range(20):
+        ensemble.iterate()
+        for automaton in automata:
+            automaton.iterate()
+
+    assert ensemble.counts().tolist() == [2, 4, 3]
+    for s, automaton in enumerate(automata):
+        assert ensemble.counts()[s] == len(automaton.bodies())
+        expected = sorted((body.mass, body.x, body.y) for body in automaton.bodies().values())
+        alive = ensemble.alive[s]
+        actual = sorted(zip(ensemble.mass[s, alive], ensemble.x[s, alive], ensemble.y[s, alive]))
+        assert numpy.array(actual) == pytest.approx(numpy.array(expected))
+        assert ensemble.heat[s] == pytest.approx(automaton.heat)
+
+
+def test_ensemble_round_trip():
+    automaton = GravityAutomatonDataFrame()
+    utils.create_solar_system(automaton)
+    ensemble = GravityAutomatonEnsemble.from_automata([automaton] * 5)
+    ensemble.perturb(velocity_scale=0.01, rng=numpy.random.default_rng(0))
+    assert not numpy.allclose(ensemble.u[0], ensemble.u[1])
+    energy = ensemble.energy()
+    ensemble.iterate()
+    assert ensemble.energy() == pytest.approx(energy, rel=1e-3)
+
+    copy = ensemble.to_automaton(3)
+    assert {copy.names[body.name_id] for body in copy.bodies().values()} == {
+        automaton.names[body.name_id] for body in automaton.bodies().values()
+    }
+    assert [body.u for body in copy.bodies().values()] == pytest.approx(ensemble.u[3].tolist())
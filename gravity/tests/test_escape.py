@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from gravity.automaton import GravityAutomatonDataFrame
+from gravity.constants import GRAVITATIONAL_CONSTANT
+from gravity.diagnostics import Telemetry
+from gravity.escape import EscapePolicy
+
+
+def create_system(escape: EscapePolicy) -> tuple[GravityAutomatonDataFrame, int, int]:
+    """A sun with planets in a circular orbit, and an intruder on its way through"""
+    automaton = GravityAutomatonDataFrame(
+        solver="matrix", escape=escape, telemetry=Telemetry(every=1)
+    )
+    sun_mass = 1e12
+    automaton.add_body(0, 0, mass=sun_mass, radius=10)
+    speed = math.sqrt(GRAVITATIONAL_CONSTANT * sun_mass / 100)
+    for angle in range(10):
+        angle *= math.pi / 5
+        planet = automaton.add_body(
+            x=100 * math.cos(angle),
+            y=100 * math.sin(angle),
+            mass=1e6,
+            radius=1,
+            u=-speed * math.sin(angle),
+            v=speed * math.cos(angle),
+        )
+    intruder = automaton.add_body(1000, 100, mass=1, radius=1, u=-20)
+    return automaton, planet, intruder
+
+
+def test_escaped_bodies_are_archived():
+    automaton, planet, intruder = create_system(EscapePolicy(every=10))
+    automaton.iterate()
+    assert automaton.get_body(intruder) is None
+    assert automaton.get_body(planet) is not None
+    assert list(automaton.archive.id) == [intruder]
+    assert max(automaton.world_size()) < 250
+    for _ in range(50):
+        automaton.iterate()
+    assert automaton.get_body(intruder) is None
+    energy, momentum, angular = automaton.telemetry.errors()
+    assert energy == pytest.approx(0, abs=1e-3)
+    assert momentum == pytest.approx(0, abs=1e-6)  # the intruder's momentum is accounted for
+    assert angular == pytest.approx(0, abs=1e-6)
+
+
+def test_archived_bodies_are_readmitted():
+    automaton, planet, intruder = create_system(EscapePolicy(every=10, readmit=True))
+    automaton.iterate()
+    assert automaton.get_body(intruder) is None
+    for _ in range(44):
+        automaton.iterate()
+    body = automaton.get_body(intruder)
+    assert body is not None
+    assert body.x == pytest.approx(1000 - 20 * 45, abs=5)
+    assert automaton.archive.empty
+    automaton.iterate()
+    assert automaton.telemetry.errors() == pytest.approx((0, 0, 0), abs=1e-3)
+
+
+@pytest.mark.parametrize("readmit", [False, True])
+def test_escaped_tracers_with_mass_are_not_accounted_for(readmit):
+    automaton, planet, intruder = create_system(EscapePolicy(every=10, readmit=readmit))
+    tracer = automaton.add_body(-1000, -100, mass=1e6, radius=1, u=20, tracer=True)
+    automaton.iterate()
+    assert automaton.get_body(tracer) is None
+    for _ in range(45):
+        automaton.iterate()
+    assert (automaton.get_body(tracer) is not None) == readmit
+    assert automaton.telemetry.errors() == pytest.approx((0, 0, 0), abs=1e-3)
+
+
+def test_bound_bodies_are_not_archived():
+    automaton = GravityAutomatonDataFrame(escape=EscapePolicy(every=1, k=1))
+    automaton.add_body(0, 0, mass=1e12, radius=10)
+    automaton.add_body(1000, 0, mass=1, radius=1)  # far, but at rest
+    automaton.iterate()
+    assert len(automaton.bodies()) == 2
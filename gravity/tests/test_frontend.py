@@ -0,0 +1,34 @@
+import numpy
+import pytest
+from pygame import Surface
+
+from gravity.frontend import aggregate, splat
+
+
+def test_splat_adds_up_overlapping_points():
+    surface = Surface((4, 3))
+    u = numpy.array([0.2, 0.9, 3.5, -1.0, 2.0])
+    v = numpy.array([1.5, 1.1, 2.9, 0.0, 7.0])  # last two are off the surface
+    colors = numpy.full((5, 3), 200, dtype=numpy.uint8)
+    colors[1] = [10, 20, 30]
+    splat(surface, u, v, colors)
+    assert tuple(surface.get_at((0, 1)))[:3] == (210, 220, 230)
+    assert tuple(surface.get_at((3, 2)))[:3] == (200, 200, 200)
+    assert tuple(surface.get_at((1, 1)))[:3] == (0, 0, 0)
+
+    splat(surface, u[:1], v[:1], colors[:1])
+    assert tuple(surface.get_at((0, 1)))[:3] == (255, 255, 255)
+
+
+def test_aggregate():
+    u = numpy.array([1.0, 3.0, 9.0, 12.0, 13.0, -5.0])
+    v = numpy.array([1.0, 3.0, 1.0, 12.0, 14.0, 2.0])
+    radius = numpy.array([3.0, 4.0, 1.0, 1.0, 1.0, 1.0])
+    mass = numpy.array([1.0, 3.0, 2.0, 0.0, 0.0, 4.0])
+    tiles = aggregate(u, v, radius, mass, tile=8, size=(16, 16))
+    u, v, radius, mass = (array.tolist() for array in tiles)
+    # tile (0, 0) includes the off-screen body
+    assert u == [(1 + 9 - 20) / 8, 9.0, 12.5]
+    assert v == [(1 + 9 + 8) / 8, 1.0, 13.0]
+    assert radius == pytest.approx([(9 + 16 + 1) ** 0.5, 1.0, 2**0.5])
+    assert mass == [8.0, 2.0, 0.0]
@@ -0,0 +1,32 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ["pandas", "matplotlib", "pygame", "numba"]
+BUDGET = 0.5  # seconds; numpy alone takes about 0.1
+
+
+def import_in_fresh_interpreter(module: str) -> tuple[float, list[str]]:
+    """
+    :return: seconds taken to import the module, and which of the heavy modules it pulled in
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps([seconds, [m for m in {HEAVY!r} if m in sys.modules]]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True)
+    seconds, heavy = json.loads(result.stdout.splitlines()[-1])
+    return seconds, heavy
+
+
+@pytest.mark.parametrize("module", ["gravity.physics", "gravity.automaton"])
+def test_import_is_fast(module):
+    # the best of a few runs, so a busy machine doesn't make the test flaky
+    runs = [import_in_fresh_interpreter(module) for _ in range(3)]
+    assert runs[0][1] == []
+    assert min(seconds for seconds, _ in runs) < BUDGET
@@ -0,0 +1,92 @@
+import numpy
+from pygame import Surface
+
+from gravity.automaton import BodyArrays, GravityAutomatonSparseMatrix
+from gravity.backend import Backend
+from gravity.frontend import GravityFrontend
+from gravity.interpolation import interpolation
+
+
+def arrays(ids: list[int], x: list[float]) -> BodyArrays:
+    n = len(ids)
+    return BodyArrays(
+        id=numpy.array(ids),
+        x=numpy.array(x, dtype=float),
+        y=numpy.zeros(n),
+        u=numpy.zeros(n),
+        v=numpy.zeros(n),
+        mass=numpy.ones(n),
+        radius=numpy.ones(n),
+        name_id=numpy.zeros(n, dtype=int),
+        tracer=numpy.zeros(n, dtype=bool),
+    )
+
+
+def test_interpolation_matches_bodies_by_id():
+    before = arrays([5, 2, 9], [50.0, 20.0, 90.0])
+    after = arrays([2, 5, 11], [30.0, 54.0, 110.0])  # 9 merged into the new body 11
+    result = interpolation(before, after, version=3)._replace(fraction=0.25)
+    assert result.x.tolist() == [20.0, 50.0, 110.0]
+    assert result.max_shift == 10.0
+    assert result.margin == 7.5
+    assert result.apply(after, numpy.array([0, 1, 2])).x.tolist() == [22.5, 51.0, 110.0]
+    assert interpolation(arrays([], []), after, version=3).x.tolist() == [30.0, 54.0, 110.0]
+
+
+def moving_body() -> Backend:
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_body(x=0, y=0, mass=1, radius=1, u=8)
+    backend = Backend(automaton)
+    backend.ticks_per_update = 4
+    return backend
+
+
+def test_backend_interpolates_through_the_update_cycle():
+    backend = moving_body()
+    for _ in range(4):
+        backend.update()
+    assert backend.automaton.arrays().x.tolist() == [8.0]
+    drawn = []
+    for _ in range(5):
+        interpolation = backend.interpolation
+        drawn.append(interpolation.apply(backend.automaton.arrays(), [0]).x[0])
+        backend.update()
+    assert drawn == [0.0, 2.0, 4.0, 6.0, 8.0]  # the last one is from the next update
+
+
+def test_backend_stops_interpolating():
+    backend = moving_body()
+    assert backend.interpolation is None  # not updated yet
+    for _ in range(4):
+        backend.update()
+    backend.automaton.add_body(x=100, y=0, mass=1, radius=1)
+    assert backend.interpolation is None  # the bodies have changed since the update
+    for _ in range(4):
+        backend.update()
+    assert backend.interpolation is not None
+    backend.paused = True
+    backend.update()
+    backend.paused = False
+    assert backend.interpolation is None
+    backend.ticks_per_update = 1
+    backend.update()
+    assert backend.interpolation is None
+
+
+def test_frontend_draws_interpolated_positions():
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_body(x=0, y=0, mass=1, radius=3, u=40)
+    backend = Backend(automaton)
+    backend.ticks_per_update = 4
+    for _ in range(4):
+        backend.update()
+    backend.update()
+    backend.update()  # halfway from 0 to 40, so at u = 15
+    frontend = GravityFrontend()
+    frontend.lod_tile = 0
+    surface = Surface((30, 10))
+    viewport = (5, -5, 30, 10)  # the body has already left it, but is drawn inside
+    frontend.draw(surface, backend.automaton, viewport, interpolation=backend.interpolation)
+    assert surface.get_at((15, 5)) != surface.get_at((25, 5))
+    frontend.draw(surface, backend.automaton, viewport)
+    assert surface.get_at((15, 5)) == surface.get_at((25, 5))
@@ -0,0 +1,132 @@
+import math
+
+import numpy
+import pytest
+
+from gravity import kepler
+from gravity.automaton import GravityAutomatonDataFrame
+from gravity.constants import GRAVITATIONAL_CONSTANT
+from gravity.diagnostics import Telemetry
+
+SUN_MASS = 1e12
+GM = GRAVITATIONAL_CONSTANT * SUN_MASS
+
+
+@pytest.mark.parametrize("z", [-5e-3, 5e-3, -1e-2, 1e-2, -30.0, 30.0])
+def test_stumpff(z):
+    c2, c3 = kepler.stumpff(numpy.array([z]))
+    s = math.sqrt(abs(z))
+    cos, sin = (math.cosh, math.sinh) if z < 0 else (math.cos, math.sin)
+    assert c2 == pytest.approx((1 - cos(s)) / z, rel=1e-10)
+    assert c3 == pytest.approx(abs(s - sin(s)) / s**3, rel=1e-10)
+
+
+def orbits(speed_factors: list[float]) -> tuple[numpy.array, ...]:
+    """Bodies at 100 units from the sun, with speeds relative to the circular orbit speed"""
+    n = len(speed_factors)
+    angle = numpy.linspace(0, 2 * math.pi, n, endpoint=False)
+    speed = numpy.array(speed_factors) * math.sqrt(GM / 100)
+    # tilt the velocities so the orbits don't start at their apses
+    direction = angle + math.pi / 2 + 0.3
+    return (
+        100 * numpy.cos(angle),
+        100 * numpy.sin(angle),
+        speed * numpy.cos(direction),
+        speed * numpy.sin(direction),
+    )
+
+
+def test_kepler_drift_conserves_energy_and_angular_momentum():
+    x, y, u, v = orbits([0.5, 1.0, 1.3, 2.0])  # elliptic, nearly circular, parabolic, hyperbolic
+    new_x, new_y, new_u, new_v = kepler.kepler_drift(x, y, u, v, GM, dt=1234.5)
+
+    def energy(x, y, u, v):
+        return (u**2 + v**2) / 2 - GM / numpy.hypot(x, y)
+
+    assert energy(new_x, new_y, new_u, new_v) == pytest.approx(energy(x, y, u, v), rel=1e-9)
+    assert new_x * new_v - new_y * new_u == pytest.approx(x * v - y * u, rel=1e-9)
+    assert not numpy.allclose(new_x, x)
+
+
+def test_kepler_drift_matches_direct_integration():
+    x, y, u, v = orbits([0.7, 1.0, 1.6])
+    dt = 500.0
+    expected = kepler.kepler_drift(x, y, u, v, GM, dt)
+
+    def sun(x, y, mass):
+        strength = GM / numpy.hypot(x, y) ** 3
+        return -x * strength, -y * strength
+
+    direct = kepler.leapfrog(x, y, u, v, None, dt, sun, substeps=20000)
+    for actual, wanted in zip(direct, expected):
+        assert actual == pytest.approx(wanted, rel=1e-5)
+
+
+def test_kepler_drift_splits_into_shorter_drifts():
+    x, y, u, v = orbits([0.6, 1.1, 1.5])
+    once = kepler.kepler_drift(x, y, u, v, GM, dt=3000.0)
+    twice = kepler.kepler_drift(*kepler.kepler_drift(x, y, u, v, GM, 1000.0), GM, 2000.0)
+    for a, b in zip(once, twice):
+        assert a == pytest.approx(b, rel=1e-9, abs=1e-9)
+
+
+def create_system(integrator: str, timestep: float) -> GravityAutomatonDataFrame:
+    """A sun with three planets and a tracer"""
+    automaton = GravityAutomatonDataFrame(
+        solver="matrix", integrator=integrator, timestep=timestep, telemetry=Telemetry(every=1)
+    )
+    automaton.add_body(0, 0, mass=SUN_MASS, radius=5)
+    x, y, u, v = orbits([1.0, 0.9, 1.1])
+    automaton.add_bodies(x * [1, 2, 3], y * [1, 2, 3], mass=1e8, radius=1, u=u, v=v)
+    automaton.add_body(-400, 0, mass=0, radius=1, v=-math.sqrt(GM / 400), tracer=True)
+    return automaton
+
+
+def test_wisdom_holman_is_accurate_with_long_steps():
+    automaton = create_system("wisdom-holman", timestep=50.0)
+    c = automaton.contents
+    x, y, u, v = (c[column].values.copy() for column in "xyuv")
+    mass = numpy.where(c.tracer.astype(bool), 0.0, c.mass)
+    for _ in range(40):  # about two and a half orbits of the innermost planet
+        automaton.iterate()
+    expected = kepler.leapfrog(
+        x, y, u, v, mass, 40 * 50.0, automaton._accelerations, substeps=20000
+    )
+    assert automaton.direct_steps == 0
+    assert automaton.contents.x.values == pytest.approx(expected[0], abs=1e-2)
+    assert automaton.contents.y.values == pytest.approx(expected[1], abs=1e-2)
+    assert abs(automaton.telemetry.errors()[0]) < 1e-5
+
+
+def test_wisdom_holman_samples_without_an_extra_solve():
+    automaton = create_system("wisdom-holman", timestep=50.0)
+    calls = []
+
+    def counted(name: str):
+        solve = getattr(automaton.solver, name)
+
+        def wrapper(*args):
+            calls.append(name)
+            return solve(*args)
+
+        return wrapper
+
+    for name in ["accelerations", "accelerations_and_potential"]:
+        setattr(automaton.solver, name, counted(name))
+    automaton.iterate()
+    assert calls == ["accelerations_and_potential", "accelerations"]  # check, then final kick
+    euler = create_system("euler", timestep=50.0)
+    euler.iterate()
+    assert automaton.telemetry.latest == pytest.approx(euler.telemetry.latest, rel=1e-12)
+
+
+def test_wisdom_holman_falls_back_to_direct_integration_on_close_approaches():
+    automaton = create_system("wisdom-holman", timestep=10.0)
+    automaton.add_body(103, 0, mass=1e8, radius=1)
+    automaton.iterate()
+    assert automaton.direct_steps == 1
+
+
+def test_unknown_integrator():
+    with pytest.raises(ValueError):
+        GravityAutomatonDataFrame(integrator="runge-kutta")
@@ -0,0 +1,125 @@
+import numpy
+import pytest
+
+from gravity import headless
+from gravity.automaton import GravityAutomatonDataFrame, GravityAutomatonSparseMatrix
+from gravity.mergelog import MergeLog
+
+AUTOMATA = [GravityAutomatonSparseMatrix, GravityAutomatonDataFrame]
+
+# 1 + 2 -> 10, 3 + 10 -> 11, 4 + 5 -> 12, 11 + 12 -> 13, and separately 6 + 7 -> 14
+MERGERS = [(1, 2, 10), (4, 5, 12), (3, 10, 11), (6, 7, 14), (11, 12, 13)]
+
+
+def fill(log: MergeLog, mergers: list[tuple[int, int, int]] = MERGERS) -> MergeLog:
+    for iteration, (parent1, parent2, child) in enumerate(mergers):
+        log.record(iteration, parent1, parent2, 1.0, 1.0, 0.0, 0.0, 0.0, 0.0, child)
+    return log
+
+
+def test_log_grows_in_chunks():
+    log = MergeLog(chunk_size=3)
+    log.record(0, 1, 2, 1.5, 2.5, 10.0, 20.0, 0.5, -0.5, 3)
+    log.record_many(
+        4,
+        parent1=numpy.arange(10, 15),
+        parent2=numpy.arange(20, 25),
+        mass1=numpy.ones(5),
+        mass2=numpy.ones(5),
+        x=numpy.zeros(5),
+        y=numpy.zeros(5),
+        u=numpy.zeros(5),
+        v=numpy.zeros(5),
+        child=numpy.arange(30, 35),
+    )
+    assert len(log) == 6
+    assert len(log._chunks) == 2
+    events = log.events
+    assert events["child"].tolist() == [3, 30, 31, 32, 33, 34]
+    assert events["iteration"].tolist() == [0, 4, 4, 4, 4, 4]
+    assert events[0].tolist() == (0, 1, 2, 1.5, 2.5, 10.0, 20.0, 0.5, -0.5, 3)
+    log.flush()  # nothing to do without a path
+    assert len(log) == 6
+
+
+def test_log_streams_to_disk(tmp_path):
+    path = tmp_path / "logs" / "mergers.bin"
+    log = fill(MergeLog(chunk_size=2, path=path))
+    assert path.stat().st_size == 4 * log.events.itemsize  # two full chunks
+    assert len(log) == 5
+    assert log.events["child"].tolist() == [child for _, _, child in MERGERS]
+    log.flush()
+    loaded = MergeLog.load(path)
+    assert len(loaded) == 5
+    assert (loaded.events == log.events).all()
+    assert len(MergeLog(path=path)) == 0  # a new log starts a new file
+
+
+def test_merger_tree():
+    log = fill(MergeLog(chunk_size=2))
+    tree = log.merger_tree(13)
+    assert tree["child"].tolist() == [10, 12, 11, 13]  # in the order they happened
+    assert log.progenitors(13).tolist() == [1, 2, 3, 4, 5]
+    assert log.merger_tree(14)["child"].tolist() == [14]
+    assert log.progenitors(14).tolist() == [6, 7]
+    assert len(log.merger_tree(3)) == 0
+    assert log.progenitors(3).tolist() == [3]
+    assert len(MergeLog().merger_tree(1)) == 0
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_rollback(tmp_path, streamed):
+    path = tmp_path / "mergers.bin" if streamed else None
+    log = fill(MergeLog(chunk_size=2, path=path), sorted(MERGERS, key=lambda merger: merger[2]))
+    log.rollback(13)
+    assert log.events["child"].tolist() == [10, 11, 12]
+    log.rollback(11)  # back into the part that has been written out
+    assert log.events["child"].tolist() == [10]
+    log.rollback(50)
+    assert len(log) == 1
+    fill(log, [(8, 9, 11)])
+    log.rollback(11)  # only the part that hasn't been written out
+    assert log.events["child"].tolist() == [10]
+    fill(log, [(8, 9, 11)])
+    assert log.events["child"].tolist() == [10, 11]
+    if streamed:
+        log.flush()
+        assert MergeLog.load(path).events["child"].tolist() == [10, 11]
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_restore_rolls_the_log_back(automaton_class):
+    log = MergeLog()
+    automaton = automaton_class(merge_log=log)
+    automaton.add_body(0, 0, mass=1, radius=5)
+    automaton.add_body(3, 0, mass=1, radius=5)
+    snapshot = automaton.snapshot()
+    automaton.iterate()
+    assert len(log) == 1
+    automaton.restore(snapshot)
+    assert len(log) == 0
+
+
+@pytest.mark.parametrize("automaton_class", AUTOMATA)
+def test_automata_log_mergers(automaton_class):
+    log = MergeLog()
+    automaton = automaton_class(merge_log=log)
+    id1 = automaton.add_body(0, 0, mass=1e6, radius=5)
+    id2 = automaton.add_body(3, 0, mass=3e6, radius=5)
+    automaton.add_body(1000, 0, mass=1, radius=1)
+    automaton.iterate()
+    automaton.iterate()
+    (event,) = log.events
+    assert event["iteration"] == 0
+    assert {event["parent1"], event["parent2"]} == {id1, id2}
+    assert event["mass1"] + event["mass2"] == 4e6
+    merged = automaton.get_body(id1)
+    assert event["child"] == merged.id
+    assert log.progenitors(merged.id).tolist() == [id1, id2]
+
+
+def test_headless_merge_log(tmp_path, capsys):
+    path = tmp_path / "mergers.bin"
+    headless.main(["--scene=random", "--steps=20", "--sample-every=0", f"--merge-log={path}"])
+    out = capsys.readouterr().out
+    assert f"logged {len(MergeLog.load(path))} mergers" in out
@@ -0,0 +1,86 @@
+import numpy
+import pytest
+
+from gravity import benchmark
+from gravity.dataframe import GravityAutomatonDataFrame
+from gravity.morton import morton_codes, morton_order, spread_bits
+
+
+def test_spread_bits():
+    assert spread_bits(numpy.array([0b1011, 0])).tolist() == [0b1000101, 0]
+    assert spread_bits(numpy.array([2**32 - 1])).tolist() == [0x5555555555555555]
+
+
+@pytest.mark.parametrize(
+    "x, y, expected",
+    [
+        ([0, 1, 0, 1], [0, 0, 1, 1], [0, 1, 2, 3]),
+        ([5, 5, 5], [2, 2, 2], [0, 0, 0]),  # no extent
+        ([], [], []),
+    ],
+)
+def test_morton_codes(x, y, expected):
+    codes = morton_codes(numpy.array(x, dtype=float), numpy.array(y, dtype=float), bits=1)
+    assert codes.tolist() == expected
+
+
+def test_morton_order_keeps_neighbours_together():
+    rng = numpy.random.default_rng(0)
+    centres = numpy.array([[0, 0], [1000, 0], [0, 1000], [1000, 1000]])
+    cluster = rng.permutation(numpy.repeat(numpy.arange(4), 25))
+    x, y = (centres[cluster] + rng.uniform(-10, 10, (100, 2))).T
+    sorted_clusters = cluster[morton_order(x, y)]
+    assert (numpy.diff(sorted_clusters) != 0).sum() == 3  # each cluster is one run
+
+
+def spread_out_bodies(**kwargs) -> GravityAutomatonDataFrame:
+    automaton = GravityAutomatonDataFrame(solver="matrix", **kwargs)
+    for x, y, name in [(900, 0, "a"), (-900, 40, "b"), (0, 900, None), (30, -900, "d")]:
+        automaton.add_body(x=x, y=y, mass=1e6, radius=1, name=name)
+    automaton.add_bodies(
+        x=numpy.array([500.0, -500]), y=numpy.array([-500.0, 500]), mass=1e6, radius=1
+    )
+    return automaton
+
+
+def test_reorder_keeps_ids_and_names():
+    automaton = spread_out_bodies()
+    before = automaton.bodies()
+    version = automaton.version
+    automaton.reorder()
+    assert automaton.version > version
+    assert automaton.contents.id.tolist() != sorted(before)  # the order did change
+    assert automaton.bodies() == before
+    for body_id, body in before.items():
+        assert automaton.get_body(body_id) == body
+        assert automaton.arrays().id[automaton.slot(body_id)] == body_id
+
+
+def test_reordering_does_not_change_the_physics():
+    plain = spread_out_bodies()
+    reordered = spread_out_bodies(reorder_every=2)
+    for _ in range(5):
+        plain.iterate()
+        reordered.iterate()
+    assert reordered.phase_times["reorder"] > 0
+    assert "reorder" not in plain.phase_times
+    assert {"forces", "collisions"} <= plain.phase_times.keys()
+    plain_bodies, reordered_bodies = plain.bodies(), reordered.bodies()
+    assert plain_bodies.keys() == reordered_bodies.keys()
+    for body_id, body in plain_bodies.items():
+        other = reordered_bodies[body_id]
+        assert (other.x, other.y) == pytest.approx((body.x, body.y))
+        assert other.name_id == body.name_id
+
+
+def test_benchmark(capsys):
+    results = benchmark.benchmark(
+        steps=2, reorder_every=[0, 1], scene="swirling", bodies=20, solver="matrix"
+    )
+    assert list(results) == [0, 1]
+    assert results[0]["reorder"] == 0 < results[1]["reorder"]
+    assert results[1]["total"] >= results[1]["forces"]
+    benchmark.main(["--bodies", "20", "--steps", "2", "--solver", "matrix"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].split() == ["reorder", "every", *benchmark.PHASES, "total"]
+    assert lines[2].split()[0] == "never"
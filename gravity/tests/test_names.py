@@ -0,0 +1,77 @@
+from redbreast.testing import parametrize, testparams
+
+from gravity.language import choose_new_name
+from gravity.names import NameTable, NO_NAME
+
+
+def test_intern_reuses_ids():
+    names = NameTable()
+    earth = names.intern("Earth")
+    assert names.intern("Earth") == earth
+    assert names.intern("Mars") != earth
+    assert names[earth] == "Earth"
+    assert names.intern("") == NO_NAME
+
+
+def test_lazy_names_are_generated_once():
+    names = NameTable()
+    name_id = names.reserve()
+    assert not names.is_materialized(name_id)
+    name = names[name_id]
+    assert name
+    assert names.is_materialized(name_id)
+    assert names[name_id] == name
+
+
+@parametrize(
+    param := testparams("name1", "name2", "mass1", "mass2"),
+    [
+        param(description="short names", name1="Zog", name2="Mat", mass1=1, mass2=2),
+        param(description="long names", name1="Zogwartio", name2="Matfrunkk", mass1=1, mass2=1),
+        param(
+            description="hyphenated names",
+            name1="Flarble-Bazbaz-10",
+            name2="Zogwartio-Foobar",
+            mass1=1,
+            mass2=2,
+        ),
+    ],
+)
+def test_merge_is_deferred(param):
+    names = NameTable()
+    left = names.intern(param.name1)
+    right = names.intern(param.name2)
+    merged = names.merge(left, right, param.mass1, param.mass2)
+    assert not names.is_materialized(merged)
+    expected = choose_new_name(param.name1, param.name2, param.mass1, param.mass2)
+    assert names[merged] == expected
+
+
+@parametrize(
+    param := testparams("mass1", "mass2", "expected"),
+    [
+        param(description="left absorbs right", mass1=10, mass2=1, expected="left"),
+        param(description="right absorbs left", mass1=1, mass2=10, expected="right"),
+    ],
+)
+def test_merge_absorbed_reuses_id(param):
+    names = NameTable()
+    ids = dict(left=names.intern("Zog"), right=names.intern("Mat"))
+    size = len(names)
+    assert names.merge(ids["left"], ids["right"], param.mass1, param.mass2) == ids[param.expected]
+    assert len(names) == size
+
+
+def test_merge_with_unnamed_body_keeps_name():
+    names = NameTable()
+    zog = names.intern("Zog")
+    assert names.merge(zog, NO_NAME, 1, 1) == zog
+    assert names.merge(NO_NAME, zog, 1, 1) == zog
+
+
+def test_long_merge_chain_does_not_recurse():
+    names = NameTable()
+    name_id = names.reserve()
+    for _ in range(5000):
+        name_id = names.merge(name_id, names.reserve(), 1, 1)
+    assert names[name_id]
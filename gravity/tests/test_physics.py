@@ -0,0 +1,120 @@
+import numpy
+import pytest
+
+from gravity import kernels, physics
+
+
+@pytest.fixture
+def random_bodies():
+    rng = numpy.random.default_rng(42)
+    n = 200
+    x, y = rng.uniform(-500, 500, (2, n))
+    mass = rng.uniform(1e9, 1e10, n)
+    radius = rng.uniform(1, 20, n)
+    return x, y, mass, radius
+
+
+def test_calculate_collisions():
+    x = numpy.array([0.0, 3.0, 100.0, 10.0])
+    y = numpy.array([0.0, 0.0, 0.0, 0.0])
+    radius = numpy.array([2.0, 2.0, 1.0, 1.0])
+    ii, jj = physics.calculate_collisions(x, y, radius)
+    assert list(zip(ii, jj)) == [(0, 1)]
+
+
+@pytest.mark.parametrize(
+    "dx, dy, du, dv, expected",
+    [
+        (30, 0, 60, 0, 0.25),  # passed straight through: touched a quarter of the way in
+        (-30, 0, -60, 0, 0.25),
+        (30, 0, -60, 0, None),  # moving apart
+        (30, 50, 60, 0, None),  # passed wide
+        (100, 0, 60, 0, None),  # hasn't got there yet
+        (5, 0, 1, 0, 0.0),  # touching at the start
+    ],
+)
+def test_contact_time(dx, dy, du, dv, expected):
+    # separation at the start of the step is (dx - du, dy - dv); they touch at distance 15
+    assert physics.contact_time(dx, dy, du, dv, distance=15) == expected
+
+
+def test_calculate_swept_collisions(random_bodies):
+    x, y, mass, radius = random_bodies
+    rng = numpy.random.default_rng(0)
+    u, v = rng.uniform(-40, 40, (2, len(x)))
+    ii, jj, t = physics.calculate_swept_collisions(x, y, u, v, radius)
+    expected = {}
+    for i in range(len(x)):
+        for j in range(i + 1, len(x)):
+            reach = radius[i] + radius[j]
+            time = physics.contact_time(x[j] - x[i], y[j] - y[i], u[j] - u[i], v[j] - v[i], reach)
+            if time is not None:
+                expected[i, j] = time
+    assert dict(zip(zip(ii.tolist(), jj.tolist()), t.tolist())) == pytest.approx(expected)
+    assert list(t) == sorted(t)
+    # everything that overlaps now was touching at some point during the step
+    overlapping = set(zip(*physics.calculate_collisions(x, y, radius)))
+    assert overlapping < set(zip(ii, jj))
+
+    kernel_ii, kernel_jj, kernel_t = kernels.calculate_swept_collisions(x, y, u, v, radius)
+    assert set(zip(kernel_ii, kernel_jj)) == set(zip(ii, jj))
+    assert kernel_t == pytest.approx(t)
+
+
+def test_gravitational_attraction_matches_matrix_solution():
+    body1 = physics.Body(mass=1e12, radius=1, x=0, y=0)
+    body2 = physics.Body(mass=1e9, radius=1, x=30, y=40)
+    physics.gravitational_attraction(body1, (body1.x, body1.y), body2, (body2.x, body2.y))
+    acc_x, acc_y = physics.calculate_x_y_acceleration(
+        numpy.array([0.0, 30.0]), numpy.array([0.0, 40.0]), numpy.array([1e12, 1e9])
+    )
+    assert [body1.u, body2.u] == pytest.approx(acc_x, rel=1e-12)
+    assert [body1.v, body2.v] == pytest.approx(acc_y, rel=1e-12)
+
+
+def test_kernels_match_physics(random_bodies):
+    x, y, mass, radius = random_bodies
+    acc_x, acc_y = kernels.calculate_x_y_acceleration(x, y, mass)
+    expected_x, expected_y = physics.calculate_x_y_acceleration(x, y, mass)
+    assert acc_x == pytest.approx(expected_x, rel=1e-6)
+    assert acc_y == pytest.approx(expected_y, rel=1e-6)
+
+    ii, jj = kernels.calculate_collisions(x, y, radius)
+    expected_ii, expected_jj = physics.calculate_collisions(x, y, radius)
+    assert list(zip(ii, jj)) == list(zip(expected_ii, expected_jj))
+
+
+@pytest.mark.parametrize("tile_size", [1, 7, 64, 512])
+def test_symmetric_acceleration_matches_matrix_solution(random_bodies, tile_size):
+    x, y, mass, _ = random_bodies
+    x[-1], y[-1] = x[0], y[0]  # coincident bodies shouldn't produce a force
+    acc_x, acc_y = physics.calculate_x_y_acceleration_symmetric(x, y, mass, tile_size)
+    expected_x, expected_y = physics.calculate_x_y_acceleration(x.copy(), y.copy(), mass)
+    assert acc_x == pytest.approx(expected_x, rel=1e-9)
+    assert acc_y == pytest.approx(expected_y, rel=1e-9)
+
+
+@pytest.mark.parametrize("tile_size", [7, 4096])
+def test_tracer_acceleration_matches_massless_bodies(random_bodies, tile_size):
+    x, y, mass, radius = random_bodies
+    tracer = numpy.arange(len(x)) % 4 == 0
+    # the symmetric kernel doesn't divide by mass, so tracers can be zero-mass bodies there
+    expected_x, expected_y = physics.calculate_x_y_acceleration_symmetric(
+        x, y, numpy.where(tracer, 0, mass)
+    )
+    source = ~tracer
+    args = x[tracer], y[tracer], x[source], y[source]
+    acc_x, acc_y = physics.calculate_tracer_acceleration(*args, mass[source], tile_size)
+    assert acc_x == pytest.approx(expected_x[tracer])
+    assert acc_y == pytest.approx(expected_y[tracer])
+    acc_x, acc_y = kernels.calculate_tracer_acceleration(*args, mass[source])
+    assert acc_x == pytest.approx(expected_x[tracer], rel=1e-6)
+
+    hits = physics.calculate_tracer_hits(*args, radius[source], tile_size)
+    assert list(kernels.calculate_tracer_hits(*args, radius[source])) == list(hits)
+    for hit, tx, ty in zip(hits, x[tracer], y[tracer]):
+        dist = numpy.hypot(x[source] - tx, y[source] - ty)
+        if hit < 0:
+            assert (dist >= radius[source]).all()
+        else:
+            assert dist[hit] < radius[source][hit]
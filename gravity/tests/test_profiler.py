@@ -0,0 +1,57 @@
+import time
+
+from gravity import headless
+from gravity.profiler import Profiler
+
+
+def work(n: int = 1000) -> list[str]:
+    return [str(i) * 3 for i in range(n)]
+
+
+def test_capture_stops_by_itself_and_writes_results(tmp_path):
+    profiler = Profiler(tmp_path, frames=3, allocations=True)
+    profiler.tick()
+    profiler.start()
+    kept = []
+    for _ in range(5):
+        kept.append(work())
+        profiler.tick()
+    assert not profiler.active
+    assert profiler.written == [tmp_path / "profile-0000001.pstats"]
+    summary = (tmp_path / "profile-0000001.txt").read_text()
+    assert summary.startswith("frames 1-3:")
+    assert "work" in summary
+    # the strings kept from work() are the biggest allocation
+    allocations = summary.split("top allocations")[1].splitlines()
+    assert "test_profiler.py" in allocations[1]
+
+
+def test_slower_than_only_keeps_slow_captures(tmp_path):
+    profiler = Profiler(tmp_path, frames=2, slower_than=0.05)
+    profiler.start()
+    for frame in range(8):
+        if frame == 5:
+            time.sleep(0.06)
+        profiler.tick()
+    assert profiler.active  # it keeps watching
+    profiler.toggle()
+    assert not profiler.active
+    assert [path.name for path in profiler.written] == ["profile-0000004.pstats"]
+
+
+def test_headless_profile_flags(tmp_path, capsys):
+    headless.main(
+        [
+            "--scene=random",
+            "--steps=12",
+            "--sample-every=0",
+            f"--profile={tmp_path}",
+            "--profile-steps=5",
+            "--profile-from=3",
+        ]
+    )
+    assert "wrote 1 profiles" in capsys.readouterr().out
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "profile-0000003.pstats",
+        "profile-0000003.txt",
+    ]
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import numpy
+import pytest
+
+from gravity import remote
+from gravity.automaton import GravityAutomatonSparseMatrix
+from gravity.backend import Backend
+from gravity.dataframe import GravityAutomatonDataFrame
+
+
+def create_backend(n: int = 200) -> Backend:
+    automaton = GravityAutomatonDataFrame()
+    rng = numpy.random.default_rng(0)
+    automaton.add_bodies(*rng.uniform(-1000, 1000, (2, n)), mass=1e6, radius=1)
+    automaton.add_body(0, 0, mass=1e9, radius=5, name="Sun")
+    return Backend(automaton)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("127.0.0.1:8765", ("127.0.0.1", 8765)),
+        ("localhost:0", ("localhost", 0)),
+        ("/tmp/gravity.sock", "/tmp/gravity.sock"),
+    ],
+)
+def test_parse_address(text, expected):
+    assert remote.parse_address(text) == expected
+
+
+def test_frame_round_trip():
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_body(1.5, -2.5, mass=3e20, radius=4, u=0.25, name="Earth")
+    automaton.add_body(10, 20, mass=0, radius=1, tracer=True)
+    bodies = automaton.arrays()
+    frame = remote.unpack_frame(remote.pack_frame(7, 3e20, bodies))
+    assert frame.iteration == 7
+    assert frame.total_mass == 3e20
+    for field in bodies._fields:
+        expected = getattr(bodies, field)
+        assert getattr(frame.bodies, field).dtype == expected.dtype
+        assert getattr(frame.bodies, field) == pytest.approx(expected, rel=1e-7)
+
+    names = {1: "Earth", 12: "Ünder"}
+    assert remote.unpack_names(remote.pack_names(names)) == names
+    assert remote.unpack_name_ids(remote.pack_name_ids([3, 1, 2**32 - 1])) == [3, 1, 2**32 - 1]
+
+
+async def receive(
+    address, fps: float, frames: list[remote.Frame], names: dict[int, str], want: list[int] = ()
+):
+    reader, writer = await remote.open_connection(address)
+    writer.write(remote.pack_message(remote.HELLO, remote.HELLO_PAYLOAD.pack(fps)))
+    if want:
+        writer.write(remote.pack_message(remote.NAME_REQUEST, remote.pack_name_ids(want)))
+    try:
+        while True:
+            kind, payload = await remote.read_message(reader)
+            if kind == remote.NAMES:
+                names.update(remote.unpack_names(payload))
+            else:
+                frames.append(remote.unpack_frame(payload))
+    finally:
+        writer.close()
+
+
+async def stall(address):
+    """A client that connects and then never reads anything"""
+    reader, writer = await remote.open_connection(address)
+    writer.write(remote.pack_message(remote.HELLO, remote.HELLO_PAYLOAD.pack(0)))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        writer.close()
+
+
+def test_slow_clients_dont_slow_down_the_simulation(tmp_path):
+    address = str(tmp_path / "gravity.sock")
+    backend = create_backend()
+    backend.automaton.add_body(2000, 0, mass=1, radius=1, name=None)  # named on first lookup
+    sun, lazy = backend.automaton.arrays().name_id[-2:].tolist()
+    server = remote.SnapshotServer(backend, max_fps=1000)
+    fast, slow = [], []
+    names = {}
+
+    async def main():
+        async with await remote.start_server(server.handle_client, address):
+            clients = [
+                asyncio.create_task(receive(address, 0, fast, names, want=[sun])),
+                asyncio.create_task(receive(address, 20, slow, {})),
+                *(asyncio.create_task(stall(address)) for _ in range(3)),
+            ]
+            await asyncio.sleep(0.1)  # let everyone connect
+            assert server.clients == 5
+            started = time.perf_counter()
+            await server.run(steps=300)
+            seconds = time.perf_counter() - started
+            await asyncio.sleep(0.1)  # let the fast client catch up
+            await server.disconnect()
+            assert server.clients == 0
+            for client in clients:
+                client.cancel()
+            return seconds
+
+    seconds = asyncio.run(main())
+    automaton = backend.automaton
+    assert automaton.iteration == 300
+    # the fast client keeps up, and ends up with the final state
+    iterations = [frame.iteration for frame in fast]
+    assert iterations == sorted(set(iterations))
+    assert iterations[-1] == 300
+    assert fast[-1].bodies.x == pytest.approx(automaton.arrays().x, rel=1e-6)
+    assert names == {sun: "Sun"}  # only what was asked for
+    assert not automaton.names.is_materialized(lazy)
+    # the slow client skips frames
+    assert len(slow) <= 20 * seconds + 2
+
+
+def test_remote_backend(tmp_path):
+    address = str(tmp_path / "gravity.sock")
+    backend = create_backend(n=20)
+    server = remote.SnapshotServer(backend)
+    stop = threading.Event()
+
+    async def serve():
+        task = asyncio.create_task(server.serve(address))
+        await asyncio.to_thread(stop.wait)
+        task.cancel()
+
+    thread = threading.Thread(target=asyncio.run, args=[serve()])
+    thread.start()
+    try:
+        while not (tmp_path / "gravity.sock").exists():
+            time.sleep(0.01)
+        client = remote.RemoteBackend(address)
+        mirror = client.automaton
+        assert mirror.version == 1
+        assert set(mirror.bodies()) == set(backend.automaton.bodies())
+        sun = mirror.arrays().name_id.max()
+        assert mirror.names[sun] == ""  # not sent until asked for
+        while mirror.names[sun] == "":
+            time.sleep(0.01)
+        first, version = mirror.iteration, mirror.version
+
+        while not mirror.has_new_frame:
+            time.sleep(0.01)
+        client.iterate()
+        assert mirror.iteration > first
+        assert mirror.version > version
+        client.back_one()
+        assert mirror.iteration == first
+        client.close()
+        assert not mirror.connected
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_max_fps_must_be_positive(capsys):
+    with pytest.raises(ValueError):
+        remote.SnapshotServer(create_backend(n=2), max_fps=0)
+    with pytest.raises(SystemExit):
+        remote.main(["serve", "--max-fps", "0"])
+    assert "--max-fps: must be greater than 0, not 0" in capsys.readouterr().err
+
+
+def test_connect_raises_the_receiver_error(tmp_path):
+    mirror = remote.RemoteAutomaton(str(tmp_path / "nobody.sock"))
+    started = time.perf_counter()
+    with pytest.raises(FileNotFoundError):
+        mirror.connect(timeout=10)
+    assert time.perf_counter() - started < 1  # not after the timeout
@@ -0,0 +1,66 @@
+import numpy
+import pytest
+
+from gravity import physics, solvers
+
+
+@pytest.fixture
+def central_mass_system():
+    rng = numpy.random.default_rng(0)
+    n = 300
+    dist = rng.uniform(300, 2000, n)
+    angle = rng.uniform(0, 2 * numpy.pi, n)
+    x = numpy.concatenate([[0], dist * numpy.cos(angle)])
+    y = numpy.concatenate([[0], dist * numpy.sin(angle)])
+    mass = numpy.concatenate([[1e15], rng.uniform(1e9, 1e10, n)])
+    return x, y, mass
+
+
+@pytest.mark.parametrize("name", solvers.SOLVERS)
+def test_solvers_agree_with_matrix_solution(name, central_mass_system):
+    solver = solvers.SOLVERS[name]
+    x, y, mass = central_mass_system
+    acc_x, acc_y = solver.accelerations(x, y, mass)
+    expected_x, expected_y = physics.calculate_x_y_acceleration(x, y, mass)
+    error = numpy.hypot(acc_x - expected_x, acc_y - expected_y) / numpy.hypot(
+        expected_x, expected_y
+    )
+    assert numpy.median(error) <= max(solver.error, 1e-9)
+
+
+def test_auto_solver_switches_with_body_count():
+    timings = {
+        "pairwise": {10: 1e-5, 100: 1e-3, 1000: 1e-1},
+        "matrix": {10: 1e-4, 100: 2e-4, 1000: 2e-2},
+        "particle-mesh": {10: 1e-2, 100: 1e-2, 1000: 1e-2},
+    }
+    exact = solvers.AutoSolver(accuracy=0, timings=timings)
+    assert exact.choose(5).name == "pairwise"
+    assert exact.choose(500).name == "matrix"
+    assert exact.choose(100_000).name == "pairwise"  # matrix is too big at this point
+    approximate = solvers.AutoSolver(accuracy=0.1, timings=timings)
+    assert approximate.choose(500).name == "matrix"
+    assert approximate.choose(5000).name == "particle-mesh"
+    crossovers = solvers.crossovers(timings, accuracy=0.1, max_n=5000)
+    assert [name for n, name in crossovers] == ["pairwise", "matrix", "particle-mesh"]
+    assert 10 < crossovers[1][0] < 100
+
+
+@pytest.mark.parametrize(
+    "n, expected",
+    [
+        (10, 1.0),
+        (100, 100.0),
+        (1000, 10000.0),  # extrapolated
+        (1, 0.01),  # extrapolated
+    ],
+)
+def test_estimate(n, expected):
+    assert solvers.estimate({10: 1.0, 100: 100.0}, n) == pytest.approx(expected)
+
+
+def test_calibrate(tmp_path):
+    path = tmp_path / "solvers.json"
+    timings = solvers.calibrate(sizes=(4, 16), path=path)
+    assert set(timings) == set(solvers.SOLVERS)
+    assert solvers.load_calibration(path) == timings
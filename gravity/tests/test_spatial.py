@@ -0,0 +1,74 @@
+import numpy
+import pytest
+
+from gravity.automaton import GravityAutomatonSparseMatrix
+from gravity.spatial import SpatialIndex, _ranges, benchmark, scan
+
+rng = numpy.random.default_rng(0)
+
+
+def brute_force(x, y, radius, rect) -> list[int]:
+    rx, ry, width, height = rect
+    overlaps = (x + radius > rx) & (x - radius < rx + width)
+    overlaps &= (y + radius > ry) & (y - radius < ry + height)
+    return overlaps.nonzero()[0].tolist()
+
+
+def test_ranges():
+    assert _ranges(numpy.array([0, 5, 3]), numpy.array([2, 8, 3])).tolist() == [0, 1, 5, 6, 7]
+    assert _ranges(numpy.array([4]), numpy.array([4])).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "x, y",
+    [
+        (rng.normal(0, 1000, 500), rng.normal(0, 1000, 500)),
+        (numpy.linspace(-100, 100, 50), numpy.zeros(50)),  # all in a line
+        (numpy.zeros(10), numpy.zeros(10)),  # all in one place
+        (numpy.array([5.0]), numpy.array([-5.0])),
+        (numpy.zeros(0), numpy.zeros(0)),
+    ],
+)
+@pytest.mark.parametrize(
+    "rect",
+    [
+        (-50, -50, 100, 100),
+        (-1e6, -1e6, 2e6, 2e6),  # the whole world
+        (300, 200, 0.5, 0.5),  # deep zoom
+        (1e5, 1e5, 10, 10),  # nowhere near anything
+    ],
+)
+def test_query_rect_matches_brute_force(x, y, rect):
+    radius = numpy.random.default_rng(1).uniform(0.1, 3, len(x))
+    radius[:3] = [400, 50, 0][: len(radius[:3])]  # a few bodies much bigger than a cell
+    index = SpatialIndex()
+    index.build(x, y, radius, version=0)
+    assert index.query_rect(rect).tolist() == brute_force(x, y, radius, rect)
+    assert scan(x, y, radius, rect).tolist() == brute_force(x, y, radius, rect)
+
+
+def test_automaton_rebuilds_index_when_bodies_change():
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_body(0, 0, mass=1, radius=1)
+    automaton.add_body(100, 0, mass=1, radius=1)
+    rect = (90, -10, 20, 20)
+    assert automaton.query_rect(rect).tolist() == [1]
+    automaton.add_body(95, 5, mass=1, radius=1)
+    assert automaton.query_rect(rect).tolist() == [1, 2]
+
+
+def test_index_is_only_built_for_repeated_queries():
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_body(0, 0, mass=1, radius=1)
+    automaton.add_body(100, 0, mass=1, radius=1)
+    index = automaton._spatial_index
+    rect = (90, -10, 20, 20)
+    assert automaton.query_rect(rect).tolist() == [1]
+    assert index.version is None  # one query per version (e.g. running) only scans
+    assert automaton.query_rect(rect).tolist() == [1]
+    assert index.version == automaton.version  # queried again (e.g. paused), so built
+
+
+def test_benchmark():
+    times = benchmark(1000, frames=2)
+    assert set(times) == {"running", "rebuilding", "paused"}
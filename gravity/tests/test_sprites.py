@@ -0,0 +1,45 @@
+import numpy
+import pytest
+from pygame import Surface
+
+from gravity import colormaps
+from gravity.automaton import GravityAutomatonSparseMatrix
+from gravity.frontend import GravityFrontend
+from gravity.sprites import SpriteCache
+
+
+def test_sprite_cache_evicts_least_recently_used():
+    sprites = SpriteCache(colormaps.cividis, maxsize=2)
+    small = sprites.get(3, 10)
+    sprites.get(4, 10)
+    assert sprites.get(3, 10) is small  # now the most recently used
+    sprites.get(5, 200)
+    assert len(sprites) == 2
+    assert sprites.get(3, 10) is small
+    assert (sprites.hits, sprites.misses) == (2, 3)
+    sprites.get(4, 10)
+    assert sprites.misses == 4  # it was evicted
+
+
+@pytest.mark.parametrize("radius", [2, 5, 20])
+def test_sprite_is_a_disc(radius):
+    sprite = SpriteCache(colormaps.cividis).get(radius, 255)
+    assert sprite.get_size() == (2 * radius + 1, 2 * radius + 1)
+    assert tuple(sprite.get_at((radius, radius))) == (*colormaps.cividis.table[255], 255)
+    assert sprite.get_at((0, 0)).a == 0
+
+
+def test_frontend_blits_bodies_from_the_cache():
+    automaton = GravityAutomatonSparseMatrix()
+    automaton.add_bodies(x=numpy.array([10.0, 30.0, 50.0]), y=20.0, mass=1.0, radius=5)
+    automaton.add_body(x=70, y=1030, mass=1.0, radius=1e3)  # pokes into the bottom of the view
+    automaton.iterate()
+    frontend = GravityFrontend()
+    surface = Surface((80, 40))
+    frontend.draw(surface, automaton, viewport=(0, 0, 80, 40))
+    # three equal bodies share a sprite; the huge one is too big for the cache
+    assert len(frontend.sprites) == 1
+    frontend.draw(surface, automaton, viewport=(0, 0, 80, 40))
+    assert (frontend.sprites.misses, frontend.sprites.hits) == (1, 1)
+    assert surface.get_at((30, 20)) != surface.get_at((30, 2))
+    assert surface.get_at((70, 39)) != surface.get_at((30, 2))
@@ -0,0 +1,69 @@
+import json
+
+from gravity import sweep
+
+
+def test_grid():
+    assert sweep.grid(a=[1, 2], b=["x"]) == [dict(a=1, b="x"), dict(a=2, b="x")]
+
+
+def test_parse_param():
+    assert sweep._parse_param("speed-coeff=4,6.5,x") == ("speed_coeff", [4, 6.5, "x"])
+
+
+def test_sweep_resumes(tmp_path):
+    path = tmp_path / "results.jsonl"
+    param_grid = sweep.grid(bodies=[10], speed_coeff=[4, 8], solver=["matrix"])
+    first = list(sweep.sweep(param_grid[:1], path, steps=5, workers=2))
+    assert len(first) == 1
+    with path.open("a") as file:
+        file.write('{"key": "cut short')  # killed mid-write
+
+    second = list(sweep.sweep(param_grid, path, steps=5, seeds=[0], workers=2))
+    assert [summary["params"] for summary in second] == param_grid[1:]
+    assert list(sweep.sweep(param_grid, path, steps=5, workers=2)) == []
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3
+    summaries = [json.loads(line) for line in lines if line.endswith("}")]
+    assert len(summaries) == 2
+    assert summaries[0]["initial_bodies"] == 11
+    assert summaries[0]["final_bodies"] + summaries[0]["merges"] == 11
+
+
+def test_failed_runs_are_recorded(tmp_path):
+    path = tmp_path / "results.jsonl"
+    param_grid = sweep.grid(bodies=[10], solver=["matrix", "no-such-solver"])
+    summaries = list(sweep.sweep(param_grid, path, steps=2, workers=2))
+    assert len(summaries) == 2
+    (failed,) = [summary for summary in summaries if "error" in summary]
+    assert failed["params"]["solver"] == "no-such-solver"
+    assert failed["error"].startswith("KeyError")
+    assert list(sweep.sweep(param_grid, path, steps=2, workers=2)) == []  # both are done
+
+
+def test_bodies_lost_are_broken_down_by_cause():
+    params = dict(scene="dusty-disk", bodies=100, n_dust=300, solver="matrix", escape_every=1)
+    summary = sweep.run_one(params, steps=100)
+    lost = summary["initial_bodies"] - summary["final_bodies"]
+    assert lost == summary["merges"] + summary["escapes"] + summary["absorptions"]
+    assert 0 < summary["merges"] < lost  # the dust absorbed by the planets is not a merger
+
+
+def test_main_prints_failures_and_missing_rates(monkeypatch, capsys):
+    ok = dict(
+        params={},
+        seed=0,
+        final_bodies=5,
+        merges=1,
+        escapes=0,
+        absorptions=0,
+        steps_per_second=None,
+        energy_error=0.0,
+    )
+    failed = dict(params={}, seed=1, error="ValueError: nope")
+    monkeypatch.setattr(sweep, "sweep", lambda *args: iter([ok, failed]))
+    sweep.main([])
+    out = capsys.readouterr().out.splitlines()
+    assert "- steps/s" in out[0]
+    assert out[1] == "{} seed=1: failed with ValueError: nope"
@@ -0,0 +1,33 @@
+import numpy
+import pytest
+
+from gravity.automaton import GravityAutomatonDataFrame
+from gravity.trails import Trails
+
+
+def test_trails_follow_bodies():
+    automaton = GravityAutomatonDataFrame()
+    body_id = automaton.add_body(0, 0, mass=1, radius=1, u=1)
+    trails = Trails(length=3, stride=2)
+    for _ in range(10):
+        automaton.iterate()
+        trails.record(automaton.arrays(), automaton.iteration)
+    assert trails.trail(body_id).tolist() == [[6, 0], [8, 0], [10, 0]]
+    assert len(trails.trail(12345)) == 0
+
+
+def test_trails_are_compacted_after_merges():
+    automaton = GravityAutomatonDataFrame()
+    far = automaton.add_body(-1000, 0, mass=1, radius=1, v=1)
+    automaton.add_bodies(x=numpy.arange(0, 200, 2.0), y=numpy.zeros(100), mass=1, radius=1.5)
+    trails = Trails(length=4, capacity=8)
+    trails.record(automaton.arrays(), automaton.iteration)
+    assert len(trails.positions) == 128
+
+    for _ in range(3):
+        automaton.iterate()  # neighbours merge
+        trails.record(automaton.arrays(), automaton.iteration)
+    assert len(automaton.bodies()) < 50
+    assert trails._used <= 2 * len(automaton.bodies())
+    assert len(trails.positions) == 128  # reclaimed rather than grown
+    assert trails.trail(far) == pytest.approx(numpy.array([[-1000, y] for y in range(4)]))
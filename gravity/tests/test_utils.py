@@ -1,6 +1,9 @@
+import random
+
 from redbreast.testing import parametrize, testparams
 
-from gravity.utils import overlap
+from gravity.dataframe import GravityAutomatonDataFrame
+from gravity.utils import overlap, spawn_dusty_disk
 
 
 @parametrize(
@@ -52,3 +55,13 @@ from gravity.utils import overlap
 )
 def test_overlap(param):
     assert overlap(param.a, param.b) == param.expected
+
+
+def test_dusty_disk_is_reproducible():
+    disks = []
+    for _ in range(2):
+        random.seed(3)
+        automaton = GravityAutomatonDataFrame()
+        spawn_dusty_disk(automaton, n=5, n_dust=50)
+        disks.append(automaton.contents)
+    assert disks[0].equals(disks[1])
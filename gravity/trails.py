@@ -0,0 +1,110 @@
+"""
+Orbit trails. Past positions of every body are kept in one preallocated (rows, length, 2) ring
+buffer, so recording a step is a single vectorised write, and memory use is fixed by the number
+of bodies and the trail length.
+"""
+
+import numpy
+
+from .automaton import BodyArrays, BodyID
+
+
+class Trails:
+    """
+    Ring buffer of the last `length` positions of each body, sampled every `stride` iterations.
+    Each body gets a row, looked up by its ID. Rows of bodies that have gone (e.g. merged) are
+    reclaimed by compacting the buffer once they make up half of it.
+    """
+
+    def __init__(self, length: int = 50, stride: int = 1, capacity: int = 1024):
+        """
+        :param length: number of positions to keep per body
+        :param stride: record a position every this many iterations
+        :param capacity: initial number of rows; doubles when needed
+        """
+        self.length = length
+        self.stride = stride
+        self.positions = numpy.zeros((capacity, length, 2))
+        self.samples = numpy.zeros(capacity, dtype=int)  # number of valid positions per row
+        self.head = 0  # position index that the next sample will be written to
+        self._rows = numpy.full(0, -1)  # id -> row; -1 if the body has no row
+        self._ids = numpy.full(capacity, -1)  # row -> id
+        self._used = 0  # rows [0, _used) have been handed out
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.samples.nbytes + self._rows.nbytes + self._ids.nbytes
+
+    def clear(self):
+        self.samples[:] = 0
+        self._rows[:] = -1
+        self._ids[:] = -1
+        self._used = 0
+
+    def record(self, bodies: BodyArrays, iteration: int):
+        """
+        Append the current position of every body to its trail.
+        """
+        if iteration % self.stride:
+            return
+        ids = bodies.id
+        if len(ids) and ids.max() >= len(self._rows):
+            rows = numpy.full(max(ids.max() + 1, 2 * len(self._rows)), -1)
+            rows[: len(self._rows)] = self._rows
+            self._rows = rows
+        rows = self._rows[ids]
+        new = rows < 0
+        if new.any():
+            rows[new] = self._allocate(ids[new])
+        self.positions[rows, self.head, 0] = bodies.x
+        self.positions[rows, self.head, 1] = bodies.y
+        self.samples[rows] = numpy.minimum(self.samples[rows] + 1, self.length)
+        self.head = (self.head + 1) % self.length
+
+        if self._used - len(ids) > self._used // 2:
+            self._compact(ids, rows)
+
+    def trail(self, body_id: BodyID) -> numpy.array:
+        """
+        :return: (samples, 2) array of past positions of a body, oldest first
+        """
+        row = self._rows[body_id] if 0 <= body_id < len(self._rows) else -1
+        if row < 0:
+            return numpy.zeros((0, 2))
+        samples = self.samples[row]
+        order = numpy.arange(self.head - samples, self.head) % self.length
+        return self.positions[row, order]
+
+    def _allocate(self, ids: numpy.array) -> numpy.array:
+        """Hand out rows for new bodies, growing the buffer if needed"""
+        needed = self._used + len(ids)
+        capacity = len(self.positions)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self.positions = _resize(self.positions, capacity)
+            self.samples = _resize(self.samples, capacity)
+            self._ids = _resize(self._ids, capacity, fill=-1)
+        rows = numpy.arange(self._used, needed)
+        self._used = needed
+        self.samples[rows] = 0
+        self._ids[rows] = ids
+        self._rows[ids] = rows
+        return rows
+
+    def _compact(self, ids: numpy.array, rows: numpy.array):
+        """Move the rows of the given (live) bodies to the front, and forget all other rows"""
+        self._rows[self._ids[: self._used]] = -1
+        n = len(ids)
+        self.positions[:n] = self.positions[rows]
+        self.samples[:n] = self.samples[rows]
+        self._ids[:n] = ids
+        self._ids[n:] = -1
+        self._rows[ids] = numpy.arange(n)
+        self._used = n
+
+
+def _resize(array: numpy.array, length: int, fill=0) -> numpy.array:
+    resized = numpy.full((length, *array.shape[1:]), fill, dtype=array.dtype)
+    resized[: len(array)] = array
+    return resized
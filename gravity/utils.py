@@ -1,10 +1,10 @@
 import math
+import random
+from random import uniform as random_float  # robingame.utils would import pygame
 
 import numpy
-from robingame.utils import random_float
 
 from gravity.automaton import Automaton
-from gravity.language import generate_syllable
 
 
 def create_solar_system(automaton: Automaton):
@@ -41,33 +41,63 @@ def spawn_random(automaton: Automaton, n: int = 500):
         v = random_float(-2, 2)
         radius = random_float(1, 10)
         mass = radius * 9999999999
-        name = generate_syllable()
-        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=name)
+        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=None)
 
 
-def spawn_swirling(automaton: Automaton, n: int = 400):
-    SUN_RADIUS = 200
-    DENSITY = 9999999999
-    SPEED_COEFF = 6
-    automaton.add_body(0, 0, radius=SUN_RADIUS, mass=SUN_RADIUS * DENSITY, name=generate_syllable())
+def spawn_swirling(
+    automaton: Automaton,
+    n: int = 400,
+    sun_radius: float = 200,
+    density: float = 9999999999,
+    speed_coeff: float = 6,
+):
+    automaton.add_body(0, 0, radius=sun_radius, mass=sun_radius * density, name=None)
     for _ in range(n):
-        dist = random_float(SUN_RADIUS + 20, SUN_RADIUS * 10)
+        dist = random_float(sun_radius + 20, sun_radius * 10)
         angle = random_float(0, 2 * math.pi)
         x = dist * math.cos(angle)
         y = dist * math.sin(angle)
-        speed = SPEED_COEFF / dist**0.35
+        speed = speed_coeff / dist**0.35
         u = -speed * math.sin(angle)
         v = speed * math.cos(angle)
         radius = random_float(1, 3)
-        mass = radius * DENSITY
-        name = generate_syllable()
-        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=name)
+        mass = radius * density
+        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=None)
+
+
+def spawn_dusty_disk(
+    automaton: Automaton,
+    n: int = 200,
+    n_dust: int = 100000,
+    sun_radius: float = 200,
+    density: float = 9999999999,
+    speed_coeff: float = 6,
+):
+    """
+    Like spawn_swirling, plus a disk of dust. The dust particles are tracers: they orbit the
+    massive bodies, but don't attract anything, so they are cheap to simulate. The dust is
+    drawn from a numpy generator seeded from `random`, so seeding `random` reproduces the disk.
+    """
+    spawn_swirling(automaton, n, sun_radius, density, speed_coeff)
+    rng = numpy.random.default_rng(random.getrandbits(64))
+    dist = rng.uniform(sun_radius + 20, sun_radius * 10, n_dust)
+    angle = rng.uniform(0, 2 * math.pi, n_dust)
+    speed = speed_coeff / dist**0.35
+    automaton.add_bodies(
+        x=dist * numpy.cos(angle),
+        y=dist * numpy.sin(angle),
+        mass=0,
+        radius=0.5,
+        u=-speed * numpy.sin(angle),
+        v=speed * numpy.cos(angle),
+        tracer=True,
+    )
 
 
 def spawn_line(automaton: Automaton, n: int = 100):
     SUN_RADIUS = 200
     DENSITY = 9999999999
-    automaton.add_body(0, 0, radius=SUN_RADIUS, mass=SUN_RADIUS * DENSITY, name=generate_syllable())
+    automaton.add_body(0, 0, radius=SUN_RADIUS, mass=SUN_RADIUS * DENSITY, name=None)
     SPEED_COEFF = 6
     distances = numpy.linspace(SUN_RADIUS + 10, SUN_RADIUS * 10, n)
     for dist in distances:
@@ -79,8 +109,7 @@ def spawn_line(automaton: Automaton, n: int = 100):
         v = speed * math.cos(angle)
         radius = random_float(1, 3)
         mass = radius  # * DENSITY
-        name = generate_syllable()
-        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=name)
+        automaton.add_body(x, y, radius=radius, mass=mass, u=u, v=v, name=None)
 
 
 def overlap(a: tuple[float, float], b: tuple[float, float]) -> float:
@@ -46,6 +46,7 @@ class Viewer(Entity):
         self.backend = backend
         self.frontend = frontend
         self.controller = controller
+        self._drawn = None  # what self.image currently shows
         self.viewport_handler = viewport_handler or DefaultViewportHandler(
             x=0,
             y=0,
@@ -66,24 +67,44 @@ class Viewer(Entity):
         with Timer() as draw_timer:
             super().draw(surface, debug)
             pygame.draw.rect(surface, Color("white"), self.rect.inflate(2, 2), 1)
-            self.frontend.draw(
-                surface=self.image,
-                automaton=self.backend.automaton,
-                viewport=self.viewport_handler.viewport,
-                debug=debug,
+            # if neither the bodies nor the viewport have changed (e.g. while paused), the last
+            # image is still correct
+            automaton = self.backend.automaton
+            interpolation = self.backend.interpolation
+            fraction = interpolation.fraction if interpolation else None
+            drawn = (
+                id(automaton),
+                automaton.version,
+                fraction,
+                self.viewport_handler.viewport,
+                debug,
             )
+            redrawn = drawn != self._drawn
+            if redrawn:
+                self.frontend.draw(
+                    surface=self.image,
+                    automaton=automaton,
+                    viewport=self.viewport_handler.viewport,
+                    debug=debug,
+                    interpolation=interpolation,
+                )
+                self._drawn = drawn
             surface.blit(self.image, self.rect)
         if debug:
             text = "\n".join(
                 [
                     f"tick: {self.tick}",  # more introspection could be a problem...
-                    f"draw time: {draw_timer.time:0.5f}",
+                    f"draw time: {draw_timer.time:0.5f}{'' if redrawn else ' (cached)'}",
                     f"update time: {self.backend._update_time:0.5f}",
                     f"ticks_per_update: {self.backend.ticks_per_update}",
                     f"iterations_per_update: {self.backend.iterations_per_update}",
                     f"world size: {self.backend.automaton.world_size()}",
                     f"world limits: {self.backend.automaton.world_limits()}",
-                    f"matrix len: {len(self.backend.automaton.contents)}",
+                    f"matrix len: {len(self.backend.automaton.arrays().id)}",
+                    self.backend.automaton.telemetry.summary(),
                 ]
             )
+            profiler = self.backend.profiler
+            if profiler and profiler.active:
+                text += f"\nprofiling: {profiler.frames_left} frames left"
             fonts.cellphone_white.render(surface, text, x=self.rect.x, y=self.rect.y, scale=1.5)